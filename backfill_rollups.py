@@ -0,0 +1,26 @@
+"""
+ପୁରୁଣା payments ରୁ /stats rollups ତିଆରି କରନ୍ତୁ (ଥରେ ଚଲାନ୍ତୁ)
+
+Recomputes every hour/day rollup document with one aggregation
+pipeline on the server and replaces what is there. Run it once after
+deploying rollups, at a quiet time: increments flushed while the
+pipeline runs are overwritten.
+
+    python backfill_rollups.py
+"""
+import asyncio
+import time
+from database import db
+
+async def main():
+    await db.connect()
+    await db.migrate_amounts()
+    start = time.perf_counter()
+    try:
+        count = await db.backfill_rollups()
+    finally:
+        await db.close()
+    print(f"✅ {count} rollup documents backfilled in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Upstream Razorpay calls saved by fetch_order coalescing, caching and throttling.
+
+Simulates "✅ Check Payment" storms against a local fake: each of --users
+users taps the button --clicks times in quick succession, and groups of
+--group users share one order. Reports how many requests actually reached
+Razorpay and the processor's issued/coalesced/cached/throttled counters.
+
+    python -m benchmarks.bench_check_coalescing --users 200 --clicks 5 --group 4
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import config
+from benchmarks.fake_razorpay import FakeRazorpay
+from payments import PaymentProcessor
+
+
+async def run(args, fake):
+    # Measure the client itself, not the account rate limit
+    config.RAZORPAY_RATE_LIMIT = 0
+    processor = PaymentProcessor()
+    processor.base_url = fake.base_url
+    try:
+        orders = [
+            (await processor.create_order(100))["id"]
+            for _ in range(max(1, args.users // args.group))
+        ]
+        before = fake.requests
+
+        async def user(user_id):
+            order_id = orders[user_id % len(orders)]
+            for _ in range(args.clicks):
+                await processor.fetch_order(order_id, user_id)
+                # Rapid taps, well inside CHECK_THROTTLE
+                await asyncio.sleep(random.uniform(0, args.tap_gap))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(u) for u in range(args.users)))
+        elapsed = time.perf_counter() - start
+        return fake.requests - before, dict(processor.stats), elapsed
+    finally:
+        await processor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--clicks", type=int, default=5)
+    parser.add_argument("--group", type=int, default=4, help="users sharing one order")
+    parser.add_argument("--tap-gap", type=float, default=0.2, help="max seconds between taps")
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    fake = FakeRazorpay(latency=args.latency).start()
+    try:
+        upstream, stats, elapsed = asyncio.run(run(args, fake))
+    finally:
+        fake.stop()
+
+    checks = args.users * args.clicks
+    print(f"check clicks           {checks:8d}")
+    print(f"Razorpay fetch calls   {upstream:8d} ({upstream / checks:.1%} of clicks)")
+    print(f"processor counters     {stats}")
+    print(f"wall time              {elapsed:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
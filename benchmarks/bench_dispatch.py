@@ -0,0 +1,127 @@
+"""
+Dispatcher throughput with synthetic Telegram updates.
+
+Compares three layouts for a growing number of states:
+
+- baseline: the original bot, no FSM storage, states in a plain dict and
+  one `lambda message: user_states...` filtered handler per state
+- filter chain: FSM storage with one `state=` filtered handler per state
+- StateRouter: FSM storage with a single dispatch table
+
+Handlers are no-ops so only routing cost is measured. Each layout is run
+--repeat times and the best run is kept, so the ratios are not noise.
+
+    python -m benchmarks.bench_dispatch --updates 20000 --states 3
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher, types
+
+from router import StateRouter
+from storage import MemoryStateStore
+
+USERS = 1000
+
+
+async def noop(message, state=None):
+    pass
+
+
+def make_dispatcher(states, layout, user_states):
+    bot = Bot(token="123456:BENCHMARK-TOKEN")
+    if layout == "baseline":
+        # As the original bot.py registered its handlers
+        dp = Dispatcher(bot)
+        for command in ("start", "help", "pay", "history"):
+            dp.register_message_handler(noop, commands=[command])
+        for name in states:
+            dp.register_message_handler(
+                noop, lambda message, name=name: user_states.get(message.from_user.id, {}).get("state") == name
+            )
+        dp.register_message_handler(noop)
+        return dp
+    dp = Dispatcher(bot, storage=MemoryStateStore(ttl=3600, max_size=USERS * 2))
+    for command in ("start", "help", "pay", "history"):
+        dp.register_message_handler(noop, commands=[command], state="*")
+    if layout == "router":
+        router = StateRouter()
+        for name in states:
+            router.handler(name)(noop)
+        router.handler()(noop)
+        router.setup(dp)
+    else:
+        for name in states:
+            dp.register_message_handler(noop, state=name)
+        dp.register_message_handler(noop, state="*")
+    return dp
+
+
+def make_updates(count):
+    updates = []
+    for update_id in range(count):
+        user_id = update_id % USERS + 1
+        updates.append(types.Update(**{
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                "text": "100",
+            },
+        }))
+    return updates
+
+
+async def run(states, layout, updates):
+    user_states = {}
+    dp = make_dispatcher(states, layout, user_states)
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    # Spread users over every state plus "no state"
+    for user_id in range(1, USERS + 1):
+        index = user_id % (len(states) + 1)
+        if not index:
+            continue
+        if layout == "baseline":
+            user_states[user_id] = {"state": states[index - 1]}
+        else:
+            await dp.storage.set_state(user=user_id, state=states[index - 1])
+
+    start = time.perf_counter()
+    batch = 200
+    for i in range(0, len(updates), batch):
+        # One task per update, like the polling/webhook executors
+        await asyncio.gather(*(dp.process_update(u) for u in updates[i:i + batch]))
+    elapsed = time.perf_counter() - start
+    session = await dp.bot.get_session()
+    await session.close()
+    return len(updates) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--states", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per layout, best kept")
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates)
+    for count in args.states:
+        states = [f"PaymentStates:step_{i}" for i in range(count)]
+        rates = {}
+        # Interleaved, so drift in machine load hits every layout alike
+        for _ in range(args.repeat):
+            for layout in ("baseline", "chain", "router"):
+                rate = asyncio.run(run(states, layout, updates))
+                rates[layout] = max(rates.get(layout, 0), rate)
+        print(f"{count:3} states  baseline {rates['baseline']:8.0f}/s  "
+              f"filter chain {rates['chain']:8.0f}/s  StateRouter {rates['router']:8.0f}/s  "
+              f"(router {rates['router'] / rates['baseline']:.2f}x baseline, "
+              f"{rates['router'] / rates['chain']:.2f}x chain)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+End-to-end load test: scripted payment flows through the webhook bot.
+
+Starts `python bot_webhook.py` against a fake Telegram Bot API and a fake
+Razorpay API (with configurable latency and error rate). By default the
+bot uses the embedded SQLite backend in a temporary directory instead of
+MongoDB; pass --mongo-uri to run it against a real mongod instead. --users
+simulated users, --concurrency at a time, each run --rounds of
+
+    /pay -> amount -> [Razorpay order.paid webhook] -> Check Payment -> /history
+
+where --paid of the flows get the signed webhook before checking. Every
+step is a POST to the bot that is handled inside the request
+(UPDATE_QUEUE=0), so its latency is the handler's, outbound calls included.
+The report gives p50/p99 latency and steps per second for each handler.
+It also shows the bot's own event loop lag and slow-callback counts, read
+from /metrics.
+
+The bot keeps its production outbound limits (Telegram send scheduler,
+Razorpay client rate limit); --no-limits turns them off to measure the
+bot alone.
+
+    python -m benchmarks.bench_e2e --users 200 --concurrency 20
+    python -m benchmarks.bench_e2e --razorpay-latency 0.3 --razorpay-error-rate 0.05 --no-limits
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import aiohttp
+
+from benchmarks.bench_startup import ROOT, TOKEN, free_port
+from benchmarks.bench_webhook_workers import wait_until_up
+from benchmarks.fake_razorpay import FakeRazorpay
+from benchmarks.fake_telegram import FakeTelegram
+
+WEBHOOK_SECRET = "benchmark-webhook-secret"
+METRICS_TOKEN = "benchmark-metrics-token"
+# Step -> bot handler that serves it
+STEPS = {
+    "/pay": "pay_command",
+    "amount": "process_amount",
+    "order.paid": "razorpay_webhook",
+    "check": "check_payment",
+    "/history": "history_command",
+}
+FIRST_USER = 100000
+
+update_ids = itertools.count(1)
+
+
+def message(user_id, text):
+    update = {
+        "update_id": next(update_ids),
+        "message": {
+            "message_id": next(update_ids), "date": int(time.time()), "text": text,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        },
+    }
+    if text.startswith("/"):
+        update["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return update
+
+
+def callback(user_id, data):
+    return {
+        "update_id": next(update_ids),
+        "callback_query": {
+            "id": str(next(update_ids)), "chat_instance": "1", "data": data,
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+            "message": {
+                "message_id": next(update_ids), "date": int(time.time()), "caption": "🔗 link",
+                "chat": {"id": user_id, "type": "private"},
+            },
+        },
+    }
+
+
+def paid_event(order_id):
+    """Signed order.paid webhook body and headers, as Razorpay sends it"""
+    body = json.dumps({
+        "event": "order.paid",
+        "payload": {
+            "order": {"entity": {"id": order_id, "status": "paid"}},
+            "payment": {"entity": {
+                "id": f"pay_{order_id[6:]}", "order_id": order_id,
+                "status": "captured", "method": "upi",
+            }},
+        },
+    })
+    signature = hmac.new(WEBHOOK_SECRET.encode(), body.encode(), hashlib.sha256).hexdigest()
+    return body, {"Content-Type": "application/json", "X-Razorpay-Signature": signature}
+
+
+class Driver:
+    def __init__(self, bot_url, telegram, args):
+        self.telegram_url = f"{bot_url}/webhook/{TOKEN}"
+        self.razorpay_url = f"{bot_url}/razorpay/webhook"
+        self.telegram = telegram
+        self.args = args
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.failed_flows = 0
+
+    async def post(self, session, step, url, body, headers):
+        start = time.perf_counter()
+        try:
+            async with session.post(url, data=body, headers=headers) as response:
+                await response.read()
+                ok = response.status == 200
+        except aiohttp.ClientError:
+            ok = False
+        self.latencies[step].append(time.perf_counter() - start)
+        if not ok:
+            self.errors[step] += 1
+        return ok
+
+    async def update(self, session, step, update):
+        return await self.post(session, step, self.telegram_url, json.dumps(update),
+                               {"Content-Type": "application/json"})
+
+    async def flow(self, session, user_id, round_):
+        await self.update(session, "/pay", message(user_id, "/pay"))
+        # A new amount every round, so the order dedupe window does not reuse it
+        self.telegram.buttons.pop(user_id, None)
+        await self.update(session, "amount", message(user_id, str(100 + round_)))
+        buttons = self.telegram.buttons.get(user_id) or []
+        order_id = next((b[6:] for b in buttons if b and b.startswith("check_")), None)
+        if order_id is None:
+            # No QR/keyboard came back: order creation failed
+            self.failed_flows += 1
+        else:
+            if random.random() < self.args.paid:
+                body, headers = paid_event(order_id)
+                await self.post(session, "order.paid", self.razorpay_url, body, headers)
+            await self.update(session, "check", callback(user_id, f"check_{order_id}"))
+        await self.update(session, "/history", message(user_id, "/history"))
+
+    async def run(self):
+        users = iter(range(FIRST_USER, FIRST_USER + self.args.users))
+
+        async def client():
+            connector = aiohttp.TCPConnector(limit=1)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                for user_id in users:
+                    for round_ in range(self.args.rounds):
+                        await self.flow(session, user_id, round_)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(self.args.concurrency)))
+        return time.perf_counter() - start
+
+
+async def scrape_metrics(bot_url):
+    """{metric line name: value} from the bot's /metrics"""
+    async with aiohttp.ClientSession() as session:
+        headers = {"Authorization": f"Bearer {METRICS_TOKEN}"}
+        async with session.get(f"{bot_url}/metrics", headers=headers) as response:
+            text = await response.text()
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            values[name] = float(value)
+    return values
+
+
+def report(driver, elapsed, telegram, razorpay, metrics):
+    updates = sum(len(v) for v in driver.latencies.values())
+    print(f"{updates} requests in {elapsed:.1f} s ({updates / elapsed:.0f}/s), "
+          f"{driver.failed_flows} flows without an order")
+    print(f"  {'step':11s} {'handler':17s} {'count':>6s} {'per s':>7s} "
+          f"{'p50 ms':>8s} {'p99 ms':>8s} {'errors':>6s}")
+    for step, handler in STEPS.items():
+        latencies = driver.latencies.get(step)
+        if not latencies:
+            continue
+        p50 = statistics.median(latencies) * 1000
+        p99 = statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else p50
+        print(f"  {step:11s} {handler:17s} {len(latencies):6d} {len(latencies) / elapsed:7.1f} "
+              f"{p50:8.1f} {p99:8.1f} {driver.errors[step]:6d}")
+
+    confirmations = sum(1 for _, _, text in telegram.sent if text.startswith("✅ Payment successful"))
+    print(f"Razorpay: {razorpay.requests} requests, {razorpay.responses[502]} injected 502s, "
+          f"{len(razorpay.orders)} orders; Telegram: {sum(telegram.calls.values())} calls, "
+          f"{confirmations} payment confirmations")
+    lag_count = metrics.get("event_loop_lag_seconds_count")
+    if lag_count:
+        print(f"Bot event loop: mean lag {metrics['event_loop_lag_seconds_sum'] / lag_count * 1000:.1f} ms, "
+              f"{metrics.get('event_loop_slow_callbacks_total', 0):.0f} slow callbacks")
+
+
+def bot_env(args, port, telegram, razorpay, tmp):
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        PORT=str(port),
+        RENDER_EXTERNAL_URL="https://example.invalid",
+        TELEGRAM_API_URL=telegram.url,
+        RAZORPAY_BASE_URL=razorpay.base_url,
+        RAZORPAY_KEY_ID="rzp_test_benchmark",
+        RAZORPAY_KEY_SECRET="benchmark",
+        RAZORPAY_WEBHOOK_SECRET=WEBHOOK_SECRET,
+        WEB_WORKERS="1",
+        METRICS_ENABLED="1",
+        METRICS_TOKEN=METRICS_TOKEN,
+        # Handle in the request so each 200 means the update was processed
+        UPDATE_QUEUE="0",
+    )
+    if args.mongo_uri:
+        env.update(DATABASE_BACKEND="mongo", MONGODB_URI=args.mongo_uri, DATABASE_NAME="payment_bot_e2e")
+    else:
+        env.update(DATABASE_BACKEND="sqlite", SQLITE_PATH=os.path.join(tmp, "payments.db"))
+    if args.no_limits:
+        env.update(TELEGRAM_SEND_SCHEDULER="0", RAZORPAY_RATE_LIMIT="0")
+    return env
+
+
+async def run(args, bot_url, telegram, razorpay):
+    await asyncio.wait_for(wait_until_up(f"{bot_url}/webhook/{TOKEN}"), 30)
+    # Let startup (database, leader lease) finish before measuring
+    await asyncio.sleep(1)
+    driver = Driver(bot_url, telegram, args)
+    elapsed = await driver.run()
+    report(driver, elapsed, telegram, razorpay, await scrape_metrics(bot_url))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20, help="users running a flow at once")
+    parser.add_argument("--rounds", type=int, default=1, help="flows per user")
+    parser.add_argument("--paid", type=float, default=0.5, help="fraction of orders paid before checking")
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--razorpay-latency", type=float, default=0.1)
+    parser.add_argument("--razorpay-error-rate", type=float, default=0.0, help="fraction answered 502")
+    parser.add_argument("--no-limits", action="store_true",
+                        help="turn off the Telegram send scheduler and Razorpay client rate limit")
+    parser.add_argument("--mongo-uri", default=None, help="use MongoDB instead of SQLite")
+    parser.add_argument("--bot-log", default=None, help="write the bot's output to this file")
+    args = parser.parse_args()
+
+    telegram = FakeTelegram(latency=args.telegram_latency).start()
+    razorpay = FakeRazorpay(latency=args.razorpay_latency, error_rate=args.razorpay_error_rate).start()
+    port = free_port()
+    log = open(args.bot_log, "w") if args.bot_log else subprocess.DEVNULL
+    print(f"{os.cpu_count()} CPUs, {args.users} users x {args.rounds} flows, "
+          f"{args.concurrency} concurrent, {'MongoDB' if args.mongo_uri else 'SQLite'} backend")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = subprocess.Popen(
+            [sys.executable, "bot_webhook.py"], cwd=ROOT,
+            env=bot_env(args, port, telegram, razorpay, tmp),
+            stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            asyncio.run(run(args, f"http://127.0.0.1:{port}", telegram, razorpay))
+        finally:
+            proc.terminate()
+            proc.wait()
+            telegram.stop()
+            razorpay.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+RSS after N abandoned /pay sessions: plain dict vs MemoryStateStore.
+
+Every simulated user types /pay (state set to awaiting_amount) and never
+answers. The old module-level dict keeps every entry; the TTL/LRU store
+stays flat once it reaches its cap.
+
+    python -m benchmarks.bench_fsm_memory --sessions 1000000
+"""
+import argparse
+import asyncio
+import gc
+
+from states import PaymentStates
+from storage import MemoryStateStore
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def run_store(sessions, checkpoints, max_size, ttl):
+    store = MemoryStateStore(ttl=ttl, max_size=max_size)
+    state = PaymentStates.awaiting_amount.state
+    report = []
+    for user_id in range(1, sessions + 1):
+        await store.set_state(chat=user_id, user=user_id, state=state)
+        if user_id in checkpoints:
+            report.append((user_id, rss_mb(), len(store.records)))
+    return report
+
+
+def run_dict(sessions, checkpoints):
+    user_states = {}
+    report = []
+    for user_id in range(1, sessions + 1):
+        user_states[user_id] = {"state": "awaiting_amount"}
+        if user_id in checkpoints:
+            report.append((user_id, rss_mb(), len(user_states)))
+    return report
+
+
+def print_report(name, report):
+    print(name)
+    for sessions, rss, live in report:
+        print(f"  {sessions:>9} sessions  RSS {rss:8.1f} MB  live states {live:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--max-size", type=int, default=10_000)
+    parser.add_argument("--ttl", type=float, default=900)
+    args = parser.parse_args()
+
+    step = args.sessions // 5
+    checkpoints = {step * i for i in range(1, 6)}
+
+    print_report(
+        f"MemoryStateStore (max_size={args.max_size}, ttl={args.ttl:g}s)",
+        asyncio.run(run_store(args.sessions, checkpoints, args.max_size, args.ttl)),
+    )
+    gc.collect()
+    # Runs second so its growth is not hidden by memory the store freed
+    print_report("plain dict (old user_states)", run_dict(args.sessions, checkpoints))
+
+
+if __name__ == "__main__":
+    main()
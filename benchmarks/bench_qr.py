@@ -0,0 +1,58 @@
+"""
+QR rendering throughput: images per second per core.
+
+Compares the original inline render with the fast 1-bit path, and shows
+the effect of the per-link LRU cache on re-sends.
+
+    python -m benchmarks.bench_qr --count 500
+"""
+import argparse
+import asyncio
+import time
+
+import config
+from payments import PaymentProcessor, render_qr_png
+
+
+def links(count):
+    return [f"https://rzp.io/i/order_{i:014d}" for i in range(count)]
+
+
+def bench_render(count, fast):
+    start = time.perf_counter()
+    for link in links(count):
+        render_qr_png(link, fast=fast)
+    return count / (time.perf_counter() - start)
+
+
+async def bench_cached(count):
+    config.QR_CACHE_SIZE = count
+    processor = PaymentProcessor()
+    try:
+        for link in links(count):
+            await processor.generate_qr_code(link)
+        start = time.perf_counter()
+        for link in links(count):
+            await processor.generate_qr_code(link)
+        return count / (time.perf_counter() - start)
+    finally:
+        await processor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+
+    # Single thread, so these are per-core numbers
+    classic = bench_render(args.count, fast=False)
+    fast = bench_render(args.count, fast=True)
+    cached = asyncio.run(bench_cached(args.count))
+
+    print(f"classic PIL render   {classic:10.1f} images/s/core")
+    print(f"fast 1-bit render    {fast:10.1f} images/s/core  ({fast / classic:.1f}x)")
+    print(f"LRU cache hit        {cached:10.1f} images/s")
+
+
+if __name__ == "__main__":
+    main()
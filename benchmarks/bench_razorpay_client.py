@@ -0,0 +1,84 @@
+"""
+Blocking razorpay.Client vs async PaymentProcessor against a local fake.
+
+Simulates N users hitting /pay at once and reports wall time, throughput
+and the worst event-loop stall seen while the calls were in flight.
+
+    python -m benchmarks.bench_razorpay_client --users 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+
+import razorpay
+
+import config
+from benchmarks.fake_razorpay import FakeRazorpay
+from payments import PaymentProcessor
+
+
+async def watch_loop_lag(stop, interval=0.005):
+    """Return the largest delay between expected and actual wake-ups."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_sync(base_url, users):
+    client = razorpay.Client(auth=("key", "secret"), base_url=base_url)
+
+    async def user():
+        # What the handlers used to do: a blocking call on the loop
+        client.order.create(data={"amount": 100, "currency": "INR", "payment_capture": 1})
+
+    return await measure(user, users)
+
+
+async def run_async(base_url, users):
+    # Measure the client itself, not the account rate limit
+    config.RAZORPAY_RATE_LIMIT = 0
+    processor = PaymentProcessor()
+    processor.base_url = base_url
+
+    async def user():
+        await processor.create_order(100)
+
+    try:
+        return await measure(user, users)
+    finally:
+        await processor.close()
+
+
+async def measure(user, users):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(watch_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await lag_task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = FakeRazorpay(latency=args.latency).start()
+    try:
+        for name, runner in (("sync razorpay.Client", run_sync),
+                             ("async PaymentProcessor", run_async)):
+            elapsed, lag = asyncio.run(runner(server.base_url, args.users))
+            print(f"{name:24} {args.users} orders in {elapsed:6.2f}s  "
+                  f"{args.users / elapsed:8.1f} orders/s  "
+                  f"max loop stall {lag * 1000:7.1f} ms")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
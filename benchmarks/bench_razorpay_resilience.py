@@ -0,0 +1,158 @@
+"""
+Razorpay client under 429s, 5xx and an outage, against a local fake.
+
+Scenario checks for the token-bucket limiter, jittered retries and the
+circuit breaker in PaymentProcessor. Exits non-zero if one fails.
+
+  rate-limit  A /pay burst against a fake that allows --rate requests/s,
+              with the client limiter off and then sized to that rate.
+  flaky       fetch_order against a fake that 502s --error-rate of calls.
+  outage      The fake answers 503 for --outage seconds: checks fail fast
+              once the breaker opens, queued order creation waits, and
+              everything recovers after the outage.
+
+    python -m benchmarks.bench_razorpay_resilience --users 200 --rate 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import config
+from benchmarks.fake_razorpay import FakeRazorpay
+from payments import CircuitOpenError, PaymentProcessor
+
+
+def make_processor(fake, rate_limit):
+    config.RAZORPAY_RATE_LIMIT = rate_limit
+    config.RAZORPAY_BURST = max(1, int(rate_limit))
+    processor = PaymentProcessor()
+    processor.base_url = fake.base_url
+    return processor
+
+
+async def create_orders(processor, users):
+    async def user():
+        try:
+            await processor.create_order(100)
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(user() for _ in range(users)))
+    return sum(results), time.perf_counter() - start
+
+
+async def rate_limit(args):
+    rows = []
+    for limit in (0, args.rate):
+        fake = FakeRazorpay(latency=args.latency, rate_limit=args.rate).start()
+        processor = make_processor(fake, limit)
+        try:
+            created, elapsed = await create_orders(processor, args.users)
+        finally:
+            await processor.close()
+            fake.stop()
+        rows.append((limit, created, fake.responses[429], processor.stats["retried"], elapsed))
+
+    print(f"rate-limit: {args.users} orders, Razorpay allows {args.rate}/s")
+    for limit, created, throttled, retried, elapsed in rows:
+        label = f"limiter {limit:g}/s" if limit else "no limiter"
+        print(f"  {label:14s} created {created:4d}  429s {throttled:4d}  "
+              f"retries {retried:4d}  {elapsed:6.2f} s")
+    return [
+        ("limiter creates every order", rows[1][1] == args.users),
+        ("limiter sees fewer 429s", rows[1][2] < rows[0][2]),
+    ]
+
+
+async def flaky(args):
+    fake = FakeRazorpay(latency=args.latency, error_rate=args.error_rate).start()
+    processor = make_processor(fake, 0)
+    config.RAZORPAY_BREAKER_THRESHOLD = 1000  # measure retries alone
+    try:
+        fake.error_rate = 0
+        orders = [(await processor.create_order(100))["id"] for _ in range(50)]
+        fake.error_rate = args.error_rate
+        results = await asyncio.gather(
+            *(processor.fetch_order(order_id) for order_id in orders), return_exceptions=True
+        )
+    finally:
+        await processor.close()
+        fake.stop()
+    ok = sum(not isinstance(r, Exception) for r in results)
+    print(f"flaky: {args.error_rate:.0%} 502s -> {ok}/{len(results)} fetches ok, "
+          f"{processor.stats['retried']} retries")
+    return [("retries hide transient 5xx", ok >= len(results) * 0.95)]
+
+
+async def outage(args):
+    config.RAZORPAY_BREAKER_THRESHOLD = 5
+    config.RAZORPAY_BREAKER_RESET = 0.5
+    config.RAZORPAY_QUEUE_TIMEOUT = args.outage + 5
+    fake = FakeRazorpay(latency=args.latency).start()
+    processor = make_processor(fake, 0)
+    try:
+        order_id = (await processor.create_order(100))["id"]
+        fake.outage(args.outage)
+        before = fake.requests
+
+        # Checks during the outage: the first few fail slowly, then fast
+        failed_fast = 0
+        check_start = time.perf_counter()
+        for _ in range(50):
+            start = time.perf_counter()
+            try:
+                processor.order_cache.clear()
+                await processor.fetch_order(order_id)
+            except CircuitOpenError:
+                failed_fast += time.perf_counter() - start < 0.01
+            except Exception:
+                pass
+        check_time = time.perf_counter() - check_start
+        during = fake.requests - before
+
+        # Orders placed while degraded queue up and go through afterwards
+        created, elapsed = await create_orders(processor, 20)
+    finally:
+        await processor.close()
+        fake.stop()
+
+    print(f"outage: {args.outage:g} s of 503s")
+    print(f"  50 checks in {check_time:.2f} s, {failed_fast} failed fast, "
+          f"{during} reached Razorpay")
+    print(f"  20 queued orders -> {created} created after {elapsed:.2f} s")
+    print(f"  counters {dict(processor.stats)}")
+    return [
+        ("breaker fails checks fast", failed_fast >= 40),
+        ("queued orders succeed after recovery", created == 20),
+    ]
+
+
+async def run(args):
+    checks = []
+    checks += await rate_limit(args)
+    checks += await flaky(args)
+    checks += await outage(args)
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--outage", type=float, default=2)
+    args = parser.parse_args()
+
+    checks = asyncio.run(run(args))
+    print()
+    for name, passed in checks:
+        print(f"{'PASS' if passed else 'FAIL'}  {name}")
+    sys.exit(0 if all(passed for _, passed in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Mass sends through plain aiogram Bot vs the SendScheduler, against flood limits.
+
+A fake Telegram API enforces --global-limit sends/s and --chat-limit
+sends/s per chat, answering 429 RetryAfter above that. The scenario is a
+reconciliation pass: --confirmations payment confirmations (transactional)
+to distinct chats, fired together with --info informational messages
+(/history pages, 3 per chat). Reports delivered/failed sends and send
+latency per priority.
+
+    python -m benchmarks.bench_send_scheduler --confirmations 150 --info 150
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from aiogram import Bot
+from aiogram.bot.api import TelegramAPIServer
+
+from benchmarks.fake_telegram import FakeTelegram
+from sender import ScheduledBot, SendScheduler, transactional
+
+TOKEN = "123456:BENCHMARK-TOKEN"
+
+
+async def run(bot, args):
+    latencies = {"confirmation": [], "info": []}
+    failed = 0
+
+    async def send(kind, chat_id, text):
+        nonlocal failed
+        start = time.perf_counter()
+        try:
+            if kind == "confirmation":
+                with transactional():
+                    await bot.send_message(chat_id, text)
+            else:
+                await bot.send_message(chat_id, text)
+        except Exception:
+            failed += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    sends = [send("info", 100000 + i // 3, f"history page {i % 3}") for i in range(args.info)]
+    sends += [send("confirmation", 1 + i, "✅ Payment successful!") for i in range(args.confirmations)]
+    start = time.perf_counter()
+    await asyncio.gather(*sends)
+    elapsed = time.perf_counter() - start
+    session = await bot.get_session()
+    await session.close()
+    return latencies, failed, elapsed
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def report(name, latencies, failed, elapsed, fake):
+    print(f"{name}: {elapsed:.2f} s, {failed} failed, {sum(fake.flooded.values())} 429s")
+    for kind, values in latencies.items():
+        print(f"  {kind:13s} delivered {len(values):4d}  "
+              f"p50 {percentile(values, 50):6.2f} s  p95 {percentile(values, 95):6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--confirmations", type=int, default=150)
+    parser.add_argument("--info", type=int, default=150)
+    parser.add_argument("--global-limit", type=int, default=30)
+    parser.add_argument("--chat-limit", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    for name in ("plain Bot", "SendScheduler"):
+        fake = FakeTelegram(latency=args.latency, global_limit=args.global_limit,
+                            chat_limit=args.chat_limit).start()
+        server = TelegramAPIServer.from_base(fake.url)
+        if name == "plain Bot":
+            bot = Bot(token=TOKEN, server=server)
+        else:
+            # Stay just under the fake's limits, as in production config
+            scheduler = SendScheduler(args.global_limit * 0.9, 1, args.chat_limit, 3)
+            bot = ScheduledBot(token=TOKEN, server=server, scheduler=scheduler)
+        try:
+            latencies, failed, elapsed = asyncio.run(run(bot, args))
+        finally:
+            fake.stop()
+        report(name, latencies, failed, elapsed, fake)
+        if name == "SendScheduler":
+            print(f"  scheduler stats {dict(scheduler.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+SQLite storage for simple_bot at --orders stored orders, vs the old dict.
+
+Loads --orders payments spread over --users users into a fresh WAL
+database, then times the bot's hot operations through SQLiteDatabase
+(history page, status check, order insert, status update) and the
+old `payments_db` dict's linear history scan at the same size. Finally
+a child process inserts orders until it is SIGKILLed; the database is
+reopened to time WAL recovery and check that every acknowledged order
+survived.
+
+    python -m benchmarks.bench_sqlite_store --orders 1000000 --users 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlite_database import SQLiteDatabase, to_millis
+
+
+async def load(db, args):
+    """Bulk-load orders straight through the database thread"""
+    start_at = datetime.utcnow() - timedelta(days=365)
+
+    def rows(first, count):
+        for i in range(first, first + count):
+            created = to_millis(start_at + timedelta(seconds=i * 30))
+            yield (f"order_{i:08d}", random.randrange(args.users), random.randint(100, 10000000),
+                   "SUCCESS" if i % 3 else "PENDING", created, created)
+
+    def insert(first, count):
+        with db.conn:
+            db.conn.executemany(
+                "INSERT INTO payments (order_id, user_id, amount_paise, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows(first, count)
+            )
+
+    start = time.perf_counter()
+    for first in range(0, args.orders, 100000):
+        await db._run(insert, first, min(100000, args.orders - first))
+    await db.ensure_indexes()
+    return time.perf_counter() - start
+
+
+async def timed(func, count):
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        await func(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name, latencies):
+    p50 = statistics.median(latencies) * 1e6
+    p99 = statistics.quantiles(latencies, n=100)[98] * 1e6
+    print(f"  {name:24s} p50 {p50:9.0f} us  p99 {p99:9.0f} us")
+
+
+async def run(args, path):
+    db = SQLiteDatabase(path)
+    await db.connect()
+    elapsed = await load(db, args)
+    size = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+    print(f"loaded {args.orders} orders in {elapsed:.1f} s "
+          f"({args.orders / elapsed:,.0f}/s), {size / 2**20:.0f} MiB on disk")
+
+    users = [random.randrange(args.users) for _ in range(args.ops)]
+    orders = [f"order_{random.randrange(args.orders):08d}" for _ in range(args.ops)]
+    print(f"SQLiteDatabase, {args.ops} ops each:")
+    report("history page (10)", await timed(lambda i: db.get_user_payments(users[i], limit=10), args.ops))
+    report("status check", await timed(lambda i: db.is_payment_completed(orders[i]), args.ops))
+    report("create_payment", await timed(
+        lambda i: db.create_payment(users[i], f"new_{i}", 49900), args.ops))
+    report("update_payment_status", await timed(
+        lambda i: db.update_payment_status(f"new_{i}", "SUCCESS", expected_status="PENDING"), args.ops))
+    await db.close()
+
+    # Old in-memory dict, same orders
+    payments_db = {
+        f"order_{i:08d}": {"user_id": random.randrange(args.users), "amount_paise": 49900, "status": "SUCCESS"}
+        for i in range(args.orders)
+    }
+    scans = min(args.ops, 50)
+
+    async def scan(i):
+        [p for p in payments_db.values() if p["user_id"] == users[i]]
+
+    print(f"dict payments_db, {scans} ops:")
+    report("history (linear scan)", await timed(scan, scans))
+
+
+CHILD = """
+import asyncio, sys
+from sqlite_database import SQLiteDatabase
+
+async def main():
+    db = SQLiteDatabase(sys.argv[1])
+    await db.connect()
+    i = 0
+    while True:
+        await db.create_payment(1, f"crash_{i}", 100)
+        i += 1
+        # Acknowledged (committed) orders
+        print(i, flush=True)
+
+asyncio.run(main())
+"""
+
+
+async def crash(args, path):
+    child = subprocess.Popen([sys.executable, "-c", CHILD, path], stdout=subprocess.PIPE, text=True)
+    await asyncio.sleep(args.crash_after)
+    child.send_signal(signal.SIGKILL)
+    output = child.communicate()[0].split()
+    acknowledged = int(output[-1]) if output else 0
+    wal = os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0
+
+    start = time.perf_counter()
+    db = SQLiteDatabase(path)
+    await db.connect()
+    found = (await db._run(lambda: db.conn.execute(
+        "SELECT count(*) FROM payments WHERE order_id LIKE 'crash_%'").fetchone()))[0]
+    recovered = time.perf_counter() - start
+    check = (await db._run(lambda: db.conn.execute("PRAGMA quick_check").fetchone()))[0]
+    await db.close()
+    print(f"SIGKILL after {acknowledged} acknowledged inserts ({wal / 2**20:.1f} MiB WAL): "
+          f"reopened in {recovered * 1000:.0f} ms, {found} orders found, quick_check {check}")
+    return found >= acknowledged and check == "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--crash-after", type=float, default=2.0, help="seconds before SIGKILL")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payments.db")
+        asyncio.run(run(args, path))
+        ok = asyncio.run(crash(args, path))
+    if not ok:
+        print("FAIL: acknowledged orders lost after crash")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
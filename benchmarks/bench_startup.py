@@ -0,0 +1,104 @@
+"""
+Cold start of the webhook entry point: import time and time to first 200.
+
+Starts `python bot_webhook.py` against a fake Telegram API (with a slow
+setWebhook) and an unreachable MongoDB, then posts a Telegram update to
+the webhook path until it gets HTTP 200.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.fake_telegram import FakeTelegram
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:BENCHMARK-TOKEN"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time(module):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def time_to_first_200(telegram):
+    port = free_port()
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        PORT=str(port),
+        RENDER_EXTERNAL_URL="https://example.invalid",
+        TELEGRAM_API_URL=telegram.url,
+        MONGODB_URI="mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200",
+    )
+    update = json.dumps({
+        "update_id": 1,
+        "message": {
+            "message_id": 1, "date": 0, "text": "/start",
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "u"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }).encode()
+    url = f"http://127.0.0.1:{port}/webhook/{TOKEN}"
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "bot_webhook.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            request = urllib.request.Request(
+                url, data=update, headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                if proc.poll() is not None:
+                    raise RuntimeError("bot_webhook.py exited during startup")
+                time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--set-webhook-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    baseline = statistics.median(import_time("sys") for _ in range(args.runs))
+    imports = statistics.median(import_time("bot_webhook") for _ in range(args.runs))
+    print(f"interpreter start      {baseline * 1000:8.1f} ms")
+    print(f"import bot_webhook     {(imports - baseline) * 1000:8.1f} ms (over interpreter start)")
+
+    telegram = FakeTelegram(latency=args.set_webhook_latency).start()
+    try:
+        first = statistics.median(time_to_first_200(telegram) for _ in range(args.runs))
+    finally:
+        telegram.stop()
+    print(f"time to first 200      {first * 1000:8.1f} ms "
+          f"(setWebhook takes {args.set_webhook_latency * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
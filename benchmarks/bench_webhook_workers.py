@@ -0,0 +1,146 @@
+"""
+Webhook throughput as worker processes are added.
+
+Starts `python bot_webhook.py` with WEB_WORKERS=1, 2, 4, ... against a
+fake Telegram API (in its own process, so it is not the bottleneck) and
+drives synthetic /start updates at the webhook path from many
+connections. Each update makes the bot call sendMessage once.
+
+MongoDB is not needed: the workers use the in-memory FSM store and the
+leader election just logs that it cannot reach the database. Pass
+--mongo-uri to run them against a real shared backend instead.
+
+The Telegram send scheduler is off, since its bot-wide rate limit
+(TELEGRAM_GLOBAL_RATE, split across workers) would cap every run at the
+same updates/s; --send-scheduler turns it back on.
+
+    python -m benchmarks.bench_webhook_workers --workers 1 2 4 --updates 5000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import aiohttp
+
+from benchmarks.bench_startup import ROOT, TOKEN, free_port
+from benchmarks.fake_telegram import FakeTelegram
+
+
+def run_fake_telegram(port):
+    FakeTelegram(port=port).start()
+    threading.Event().wait()
+
+
+def make_update(update_id):
+    chat_id = 1000 + update_id % 10000
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "/start",
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "u"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    })
+
+
+async def wait_until_up(url):
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.post(url, data=make_update(0),
+                                        headers={"Content-Type": "application/json"}) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.05)
+
+
+async def drive(url, updates, concurrency):
+    """Post `updates` updates over `concurrency` connections; return updates/s."""
+    ids = iter(range(1, updates + 1))
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        # One connection per client so SO_REUSEPORT can spread them
+        connector = aiohttp.TCPConnector(limit=1)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for update_id in ids:
+                async with session.post(url, data=make_update(update_id),
+                                        headers={"Content-Type": "application/json"}) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return updates / elapsed, errors
+
+
+def run(workers, args, telegram_url):
+    port = free_port()
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        PORT=str(port),
+        RENDER_EXTERNAL_URL="https://example.invalid",
+        TELEGRAM_API_URL=telegram_url,
+        WEB_WORKERS=str(workers),
+        MONGODB_URI=args.mongo_uri or "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200",
+        FSM_STORAGE="mongo" if args.mongo_uri else "memory",
+        # Handle in the request so each 200 means the update was processed
+        UPDATE_QUEUE="0",
+        TELEGRAM_SEND_SCHEDULER="1" if args.send_scheduler else "0",
+    )
+    url = f"http://127.0.0.1:{port}/webhook/{TOKEN}"
+    proc = subprocess.Popen(
+        [sys.executable, "bot_webhook.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(asyncio.wait_for(wait_until_up(url), 30))
+        # Let every worker finish starting before measuring
+        time.sleep(1)
+        return asyncio.run(drive(url, args.updates, args.concurrency))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--send-scheduler", action="store_true",
+                        help="keep the Telegram send rate limit on (measures the limiter, not the workers)")
+    args = parser.parse_args()
+
+    telegram_port = free_port()
+    telegram = multiprocessing.Process(target=run_fake_telegram, args=(telegram_port,), daemon=True)
+    telegram.start()
+    telegram_url = f"http://127.0.0.1:{telegram_port}"
+
+    print(f"{os.cpu_count()} CPUs, {args.updates} updates over {args.concurrency} connections")
+    baseline = None
+    for workers in args.workers:
+        rate, errors = run(workers, args, telegram_url)
+        baseline = baseline or rate
+        print(f"{workers:2d} workers  {rate:8.0f} updates/s  "
+              f"x{rate / baseline:4.2f}  ({errors} errors)")
+
+    telegram.terminate()
+
+
+if __name__ == "__main__":
+    main()
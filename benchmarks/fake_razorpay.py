@@ -0,0 +1,128 @@
+"""
+Local fake Razorpay API server for benchmarks.
+
+Implements just enough of the v1 REST API (create, fetch and list orders)
+for PaymentProcessor, with optional fault injection (429 rate limiting,
+random 5xx, a timed outage) and
+with configurable latency.
+"""
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter, deque
+
+from aiohttp import web
+
+from benchmarks.server import BackgroundServer
+
+
+class FakeRazorpay(BackgroundServer):
+    def __init__(self, latency=0.05, rate_limit=0, error_rate=0.0, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.latency = latency
+        # Requests per second before answering 429 (0 = unlimited)
+        self.rate_limit = rate_limit
+        # Fraction of requests answered with a 502
+        self.error_rate = error_rate
+        self.outage_until = 0.0
+        self.window = deque()
+        self.orders = {}
+        self.requests = 0
+        self.responses = Counter()
+
+    def outage(self, seconds):
+        """Answer every request with 503 for the next `seconds`."""
+        self.outage_until = time.monotonic() + seconds
+
+    @property
+    def base_url(self):
+        return f"{self.url}/v1"
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post("/v1/orders", self.create_order)
+        app.router.add_get("/v1/orders", self.list_orders)
+        app.router.add_get("/v1/orders/{order_id}", self.fetch_order)
+        return app
+
+    async def _delay(self):
+        """Count and delay the request; return an error response to inject, if any."""
+        self.requests += 1
+        now = time.monotonic()
+        if now < self.outage_until:
+            return self._error(503, "SERVER_ERROR", "Service unavailable")
+        if self.rate_limit:
+            while self.window and self.window[0] <= now - 1:
+                self.window.popleft()
+            if len(self.window) >= self.rate_limit:
+                return self._error(429, "BAD_REQUEST_ERROR", "Too many requests",
+                                   headers={"Retry-After": "1"})
+            self.window.append(now)
+        if self.latency:
+            # Small jitter so responses don't arrive in lock-step
+            await asyncio.sleep(self.latency * random.uniform(0.9, 1.1))
+        if self.error_rate and random.random() < self.error_rate:
+            return self._error(502, "SERVER_ERROR", "Bad gateway")
+        self.responses[200] += 1
+        return None
+
+    def _error(self, status, code, description, headers=None):
+        self.responses[status] += 1
+        return web.json_response(
+            {"error": {"code": code, "description": description}},
+            status=status, headers=headers,
+        )
+
+    async def create_order(self, request):
+        error = await self._delay()
+        if error is not None:
+            return error
+        body = await request.json()
+        order_id = f"order_{uuid.uuid4().hex[:14]}"
+        order = {
+            "id": order_id,
+            "entity": "order",
+            "amount": body["amount"],
+            "amount_paid": 0,
+            "amount_due": body["amount"],
+            "currency": body.get("currency", "INR"),
+            "receipt": body.get("receipt"),
+            "status": "created",
+            "attempts": 0,
+            "created_at": int(time.time()),
+        }
+        self.orders[order_id] = order
+        return web.json_response(order)
+
+    async def fetch_order(self, request):
+        error = await self._delay()
+        if error is not None:
+            return error
+        order = self.orders.get(request.match_info["order_id"])
+        if order is None:
+            return web.json_response(
+                {"error": {"code": "BAD_REQUEST_ERROR",
+                           "description": "The id provided does not exist"}},
+                status=400,
+            )
+        return web.json_response(order)
+
+    async def list_orders(self, request):
+        error = await self._delay()
+        if error is not None:
+            return error
+        query = request.query
+        from_ts = int(query.get("from", 0))
+        to_ts = int(query.get("to", 2 ** 62))
+        count = min(int(query.get("count", 10)), 100)
+        skip = int(query.get("skip", 0))
+        items = [o for o in self.orders.values() if from_ts <= o["created_at"] <= to_ts]
+        items = items[skip:skip + count]
+        return web.json_response({"entity": "collection", "count": len(items), "items": items})
+
+    def mark_paid(self, order_id):
+        order = self.orders[order_id]
+        order["status"] = "paid"
+        order["amount_paid"] = order["amount"]
+        order["amount_due"] = 0
@@ -0,0 +1,103 @@
+"""
+Local fake Telegram Bot API server for benchmarks.
+
+Point the bot at it with TELEGRAM_API_URL. Every method succeeds after
+an optional delay; sendMessage/sendPhoto return a plausible Message so
+handlers can read message ids and photo file_ids. Optional flood control
+answers chat sends over a global or per-chat rate with 429 RetryAfter.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict, deque
+
+from aiohttp import web
+
+from benchmarks.server import BackgroundServer
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Payment Bot", "username": "payment_bot"}
+
+
+class FakeTelegram(BackgroundServer):
+    def __init__(self, latency=0.0, global_limit=0, chat_limit=0, retry_after=1,
+                 host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.latency = latency
+        # Sends per second before answering 429 (0 = unlimited)
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.flooded = Counter()
+        self.sent = []  # (monotonic time, chat_id, text/caption) of delivered sends
+        self.buttons = {}  # chat_id -> callback_data of the last inline keyboard sent
+        self._sends = deque()
+        self._chat_sends = defaultdict(deque)
+        self._message_ids = itertools.count(1)
+
+    def _flood(self, chat_id):
+        """Return True if this send is over the global or per-chat rate."""
+        now = time.monotonic()
+        for window, limit in ((self._sends, self.global_limit),
+                              (self._chat_sends[chat_id], self.chat_limit)):
+            while window and window[0] <= now - 1:
+                window.popleft()
+            if limit and len(window) >= limit:
+                return True
+        self._sends.append(now)
+        self._chat_sends[chat_id].append(now)
+        return False
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    def _message(self, chat_id, **extra):
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": BOT_USER,
+            **extra,
+        }
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in ("sendMessage", "sendPhoto"):
+            chat_id = params.get("chat_id", "0")
+            if self._flood(chat_id):
+                self.flooded[method] += 1
+                return web.json_response({
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, status=429)
+            self.sent.append((time.monotonic(), chat_id,
+                              params.get("text") or params.get("caption", "")))
+            if params.get("reply_markup"):
+                keyboard = json.loads(params["reply_markup"]).get("inline_keyboard", [])
+                self.buttons[int(chat_id)] = [
+                    button.get("callback_data") for row in keyboard for button in row
+                ]
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "sendMessage":
+            result = self._message(params.get("chat_id", 0), text=params.get("text", ""))
+        elif method == "sendPhoto":
+            file_id = f"photo_{self.calls[method]}"
+            result = self._message(params.get("chat_id", 0), photo=[
+                {"file_id": file_id, "file_unique_id": file_id, "width": 350, "height": 350},
+            ])
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
@@ -0,0 +1,378 @@
+"""
+Replay captured production traffic against this build.
+
+Reads the capture files written with CAPTURE_DIR (see capture.py) and
+feeds the Telegram updates into bot_webhook's dispatcher, and the
+Razorpay webhook events into its webhook handling, at their recorded
+pace (--speed 1), N times faster (--speed N) or as fast as possible
+(--speed 0). Updates from one user are kept in order. Nothing leaves the
+machine:
+
+- Razorpay answers come from the recording, each after its recorded
+  latency. Order creations get the recorded orders of the same amount,
+  in order, so recorded "Check Payment" taps find their orders.
+- Telegram is the local fake (--telegram-latency). The bot's send
+  scheduler stays on unless --no-limits.
+- The database is a fresh SQLite file, or a scratch MongoDB with
+  --mongo-uri. Every call is padded to a recorded latency of the same
+  method (--db-latency none leaves the real latency).
+
+The whole replay window is loaded into memory first; pick a peak with
+--skip and --duration (seconds from the start of the capture). The
+report gives p50/p99 and updates per second per handler, and how far the
+replay fell behind the recorded schedule. --json saves the report and
+--baseline compares against a saved one.
+
+    python -m benchmarks.replay captures/ --speed 10
+    python -m benchmarks.replay captures/ --skip 3600 --duration 600 --speed 0 \\
+        --json new.json --baseline old.json
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict, deque
+
+from benchmarks.bench_startup import TOKEN
+from benchmarks.fake_telegram import FakeTelegram
+
+
+def percentiles(latencies):
+    """(p50, p99) in ms"""
+    p50 = statistics.median(latencies) * 1000
+    p99 = statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else p50
+    return p50, p99
+
+
+def load(paths, skip, duration):
+    """Updates and webhooks (recorded time, kind, JSON) and Razorpay/database records in the window"""
+    from capture import read_capture
+
+    updates, razorpay, db_latency = [], [], defaultdict(list)
+    start = until = None
+    for record in read_capture(paths):
+        if start is None:
+            start = record["t"] + skip
+            until = start + duration if duration else float("inf")
+        if record["t"] < start:
+            continue
+        if record["k"] == "update":
+            if record["t"] < until:
+                updates.append((record["t"], "update", record["u"]))
+        elif record["k"] == "webhook":
+            if record["t"] < until:
+                updates.append((record["t"], "webhook", record["e"]))
+        elif record["t"] > until + 60:
+            # Calls finishing well after the last update cannot answer it
+            break
+        elif record["k"] == "razorpay":
+            razorpay.append(record)
+        elif record["k"] == "db":
+            db_latency[record["m"]].append(record["ms"] / 1000)
+    return updates, razorpay, db_latency
+
+
+class RecordedRazorpay:
+    """
+    Stands in for PaymentProcessor._request with recorded answers.
+
+    Retries, the rate limiter and the circuit breaker all ran inside the
+    recorded call, so its latency already includes them.
+    """
+
+    def __init__(self, records):
+        self.creates = defaultdict(deque)  # amount -> recorded POST /orders
+        self.paths = defaultdict(deque)  # (method, path) -> recorded answers
+        for record in records:
+            if (record["m"], record["p"]) == ("POST", "/orders"):
+                self.creates[(record.get("q") or {}).get("amount")].append(record)
+            else:
+                self.paths[(record["m"], record["p"])].append(record)
+        self.answered = 0
+        self.missing = 0
+        self.synthetic = itertools.count(1)
+
+    def error(self, name):
+        import razorpay.errors
+        import payments
+
+        error = getattr(razorpay.errors, name, None) or getattr(payments, name, None)
+        if not (isinstance(error, type) and issubclass(error, Exception)):
+            error = razorpay.errors.ServerError
+        return error(f"recorded {name}")
+
+    def _next(self, method, path, body):
+        if (method, path) == ("POST", "/orders"):
+            answers = self.creates[body.get("amount")]
+            return answers.popleft() if answers else None
+        answers = self.paths[(method, path)]
+        # Asked more often than recorded (cache misses): repeat the last answer
+        return answers.popleft() if len(answers) > 1 else (answers[0] if answers else None)
+
+    async def request(self, method, path, queue=False, **kwargs):
+        body = kwargs.get("json") or {}
+        record = self._next(method, path, body)
+        if record is None:
+            self.missing += 1
+            await asyncio.sleep(0.1)
+            if method == "POST":
+                return {"id": f"order_replay{next(self.synthetic):08d}", "entity": "order",
+                        "amount": body.get("amount"), "status": "created"}
+            if path.startswith("/orders/"):
+                return {"id": path.rsplit("/", 1)[1], "entity": "order", "status": "created"}
+            raise self.error("ServerError")
+        self.answered += 1
+        await asyncio.sleep(record["ms"] / 1000)
+        if "e" in record:
+            raise self.error(record["e"])
+        return record["r"]
+
+
+def pad_latency(database, recorded):
+    """Make each database call take at least a recorded latency of its method"""
+    for name, samples in recorded.items():
+        method = getattr(database, name, None)
+        if method is None:
+            continue
+
+        def wrap(method, samples):
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                result = await method(*args, **kwargs)
+                remaining = next(samples) - (time.perf_counter() - start)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                return result
+            return wrapper
+
+        setattr(database, name, wrap(method, itertools.cycle(samples)))
+
+
+def make_timer(bot_module):
+    """Dispatcher middleware timing each handler by name"""
+    from aiogram.dispatcher.handler import current_handler
+    from aiogram.dispatcher.middlewares import BaseMiddleware
+
+    dp, router = bot_module.dp, bot_module.router
+
+    class HandlerTimer(BaseMiddleware):
+        def __init__(self):
+            super().__init__()
+            self.latencies = defaultdict(list)
+
+        async def _start(self, data):
+            # process is called again for the next handler after SkipHandler
+            if "_replay" in data:
+                return
+            handler = current_handler.get()
+            if handler == router.dispatch:
+                # Text messages: the state router's target handler
+                handler = router.handlers.get(await dp.current_state().get_state(), router.default)
+            data["_replay"] = (getattr(handler, "__name__", "unknown"), time.perf_counter())
+
+        def _finish(self, data):
+            name, start = data.pop("_replay", (None, None))
+            if name is not None:
+                self.latencies[name].append(time.perf_counter() - start)
+
+        async def on_process_message(self, message, data):
+            await self._start(data)
+
+        async def on_post_process_message(self, message, results, data):
+            self._finish(data)
+
+        async def on_process_callback_query(self, callback_query, data):
+            await self._start(data)
+
+        async def on_post_process_callback_query(self, callback_query, results, data):
+            self._finish(data)
+
+    timer = HandlerTimer()
+    dp.middleware.setup(timer)
+    return timer
+
+
+def user_of(update):
+    for kind in ("message", "callback_query", "edited_message"):
+        if kind in update:
+            return update[kind].get("from", {}).get("id")
+    return None
+
+
+async def feed(dp, updates, speed, max_pending, on_webhook):
+    """Process updates and webhooks on the recorded schedule; return (elapsed, lateness, errors)"""
+    from aiogram import types
+
+    loop = asyncio.get_running_loop()
+    chains = {}  # user -> that user's latest update task
+    pending = set()
+    lateness = []
+    errors = 0
+
+    async def process(kind, update, previous):
+        nonlocal errors
+        if previous is not None:
+            # One user's updates in order, as the update queue does
+            await asyncio.wait([previous])
+        try:
+            if kind == "webhook":
+                await on_webhook(update)
+            else:
+                await dp.process_update(types.Update(**update))
+        except Exception:
+            errors += 1
+
+    def done(task, user):
+        pending.discard(task)
+        if chains.get(user) is task:
+            del chains[user]
+
+    first = updates[0][0]
+    start = loop.time()
+    for recorded, kind, update in updates:
+        if speed:
+            delay = start + (recorded - first) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lateness.append(max(0.0, -delay))
+        if len(pending) >= max_pending:
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        user = user_of(update) if kind == "update" else None
+        task = asyncio.create_task(process(kind, update, chains.get(user)))
+        pending.add(task)
+        if user is not None:
+            chains[user] = task
+        task.add_done_callback(lambda task, user=user: done(task, user))
+    if pending:
+        await asyncio.wait(pending)
+    return loop.time() - start, lateness, errors
+
+
+def summary(timer, count, elapsed):
+    handlers = {}
+    for name, latencies in sorted(timer.latencies.items()):
+        p50, p99 = percentiles(latencies)
+        handlers[name] = {"count": len(latencies), "rate": len(latencies) / elapsed,
+                          "p50_ms": p50, "p99_ms": p99}
+    return {"updates": count, "elapsed": elapsed, "rate": count / elapsed, "handlers": handlers}
+
+
+def report(result, lateness, razorpay, errors, baseline):
+    print(f"{result['updates']} updates in {result['elapsed']:.1f} s "
+          f"({result['rate']:.0f}/s), {errors} errors")
+    print(f"  {'handler':20s} {'count':>6s} {'per s':>7s} {'p50 ms':>8s} {'p99 ms':>8s}"
+          + ("   vs baseline p50/p99/rate" if baseline else ""))
+    for name, row in result["handlers"].items():
+        line = (f"  {name:20s} {row['count']:6d} {row['rate']:7.1f} "
+                f"{row['p50_ms']:8.1f} {row['p99_ms']:8.1f}")
+        old = (baseline or {}).get("handlers", {}).get(name)
+        if old:
+            line += "   " + " ".join(
+                f"{(row[key] / old[key] - 1) * 100:+6.0f}%" if old[key] else "     -"
+                for key in ("p50_ms", "p99_ms", "rate")
+            )
+        print(line)
+    if lateness:
+        p50, p99 = percentiles(lateness)
+        print(f"Behind the recorded schedule: p50 {p50:.1f} ms, p99 {p99:.1f} ms, "
+              f"max {max(lateness) * 1000:.0f} ms")
+    print(f"Razorpay: {razorpay.answered} calls answered from the recording, "
+          f"{razorpay.missing} not in it")
+
+
+async def replay(args, updates, razorpay_records, db_latency):
+    # Imported here: config reads the environment set up in main()
+    bot_webhook = importlib.import_module("bot_webhook")
+    from database import db
+    from payments import payment_processor
+
+    razorpay = RecordedRazorpay(razorpay_records)
+    payment_processor._request = razorpay.request
+    if args.db_latency == "recorded":
+        pad_latency(db, db_latency)
+    timer = make_timer(bot_webhook)
+
+    await db.connect()
+    await db.ensure_indexes()
+    try:
+        elapsed, lateness, errors = await feed(
+            bot_webhook.dp, updates, args.speed, args.max_pending, bot_webhook.handle_razorpay_event
+        )
+    finally:
+        await payment_processor.close()
+        await db.close()
+        await bot_webhook.dp.storage.close()
+        await bot_webhook.dp.storage.wait_closed()
+        session = await bot_webhook.bot.get_session()
+        await session.close()
+    return summary(timer, len(updates), elapsed), lateness, razorpay, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+", help="capture files or CAPTURE_DIR directories")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = recorded pace, 0 = max")
+    parser.add_argument("--skip", type=float, default=0, help="seconds from the start of the capture")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to replay, 0 = all")
+    parser.add_argument("--max-pending", type=int, default=1000, help="updates in flight at once")
+    parser.add_argument("--db-latency", choices=("recorded", "none"), default="recorded")
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--no-limits", action="store_true",
+                        help="turn off the Telegram send scheduler (if the capture ran without it)")
+    parser.add_argument("--mongo-uri", default=None, help="scratch MongoDB instead of SQLite")
+    parser.add_argument("--json", default=None, help="save the report here")
+    parser.add_argument("--baseline", default=None, help="report saved by an earlier --json run")
+    args = parser.parse_args()
+
+    telegram = FakeTelegram(latency=args.telegram_latency).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            BOT_TOKEN=TOKEN,
+            TELEGRAM_API_URL=telegram.url,
+            RAZORPAY_KEY_ID="rzp_test_replay",
+            RAZORPAY_KEY_SECRET="replay",
+            # Do not capture the replay itself
+            CAPTURE_DIR="",
+            WEB_WORKERS="1",
+            FSM_STORAGE="memory",
+        )
+        if args.no_limits:
+            os.environ.update(TELEGRAM_SEND_SCHEDULER="0")
+        if args.mongo_uri:
+            os.environ.update(DATABASE_BACKEND="mongo", MONGODB_URI=args.mongo_uri,
+                              DATABASE_NAME="payment_bot_replay")
+        else:
+            os.environ.update(DATABASE_BACKEND="sqlite", SQLITE_PATH=os.path.join(tmp, "payments.db"))
+
+        updates, razorpay_records, db_latency = load(args.paths, args.skip, args.duration)
+        if not updates:
+            print("No updates in the capture window")
+            return
+        span = updates[-1][0] - updates[0][0]
+        webhooks = sum(1 for _, kind, _ in updates if kind == "webhook")
+        print(f"{len(updates)} updates ({webhooks} Razorpay webhooks) over {span:.0f} s recorded, "
+              f"{len(razorpay_records)} Razorpay calls, speed {args.speed or 'max'}")
+        try:
+            result, lateness, razorpay, errors = asyncio.run(
+                replay(args, updates, razorpay_records, db_latency)
+            )
+        finally:
+            telegram.stop()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(result, lateness, razorpay, errors, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
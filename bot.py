@@ -1,24 +1,46 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, types
+from aiogram import Dispatcher, types
 from aiogram.contrib.middlewares.logging import LoggingMiddleware
+from aiogram.dispatcher import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime
 
 import config
-from database import db
-from payments import payment_processor
+from database import db, history_cursor, parse_history_cursor
+from payments import payment_processor, CircuitOpenError
+from orders import order_creator
+from media import send_photo_cached
+from sender import create_bot, transactional
+from states import PaymentStates
+from storage import create_storage
+from router import StateRouter
+from reconciler import Reconciler
+from metrics import ORDERS_CONFIRMED
+from money import parse_amount, format_amount, MIN_PAISE, MAX_PAISE
+from rollups import stats_bucket_ids, stats_text
+from loop_monitor import LoopMonitor, ProfilingMiddleware
+from capture import Capture
 
 # Logging ସେଟଅପ୍
 logging.basicConfig(level=logging.INFO)
 
 # Bot ଏବଂ Dispatcher ଆରମ୍ଭ କରନ୍ତୁ
-bot = Bot(token=config.BOT_TOKEN)
-dp = Dispatcher(bot)
+bot = create_bot(config.BOT_TOKEN)
+dp = Dispatcher(bot, storage=create_storage())
 dp.middleware.setup(LoggingMiddleware())
 
-# ୟୁଜର୍ ସ୍ଥିତି ସଂରକ୍ଷଣ ପାଇଁ
-user_states = {}
+# Event loop lag ଓ blocking calls ଧରନ୍ତୁ
+loop_monitor = LoopMonitor(config.LOOP_BLOCK_THRESHOLD, config.LOOP_LAG_INTERVAL)
+if config.LOOP_MONITOR:
+    dp.middleware.setup(ProfilingMiddleware(config.LOOP_BLOCK_THRESHOLD))
+
+# Text messages ପାଇଁ state dispatch table
+router = StateRouter()
+
+# /history ପ୍ରତି page ରେ କେତେ payment
+HISTORY_PAGE_SIZE = 10
+STATUS_ICONS = {"SUCCESS": "✅", "EXPIRED": "❌"}
 
 def get_payment_keyboard(order_id):
     """Check Payment ବଟନ୍ ତିଆରି କରନ୍ତୁ"""
@@ -30,7 +52,7 @@ def get_payment_keyboard(order_id):
     keyboard.add(button)
     return keyboard
 
-@dp.message_handler(commands=['start'])
+@dp.message_handler(commands=['start'], state='*')
 async def start_command(message: types.Message):
     """Start command - /start"""
     welcome_text = """
@@ -45,90 +67,107 @@ Made with Python 🐍
     """
     await message.reply(welcome_text)
 
-@dp.message_handler(commands=['help'])
+@dp.message_handler(commands=['help'], state='*')
 async def help_command(message: types.Message):
     """Help command - /help"""
     help_text = f"""
 📖 How to use:
 
 1. Click /pay to start payment
-2. Enter amount (₹{config.MIN_AMOUNT} - ₹{config.MAX_AMOUNT})
+2. Enter amount (₹{format_amount(MIN_PAISE)} - ₹{format_amount(MAX_PAISE)})
 3. Scan QR code or use payment link
 4. Click 'Check Payment' after payment
 5. Get confirmation
 
-Minimum: ₹{config.MIN_AMOUNT}
-Maximum: ₹{config.MAX_AMOUNT}
+Minimum: ₹{format_amount(MIN_PAISE)}
+Maximum: ₹{format_amount(MAX_PAISE)}
     """
     await message.reply(help_text)
 
-@dp.message_handler(commands=['pay'])
+@dp.message_handler(commands=['pay'], state='*')
 async def pay_command(message: types.Message):
     """Pay command - /pay"""
-    user_id = message.from_user.id
-    
     # ୟୁଜର୍ ସ୍ଥିତି ସେଟ୍ କରନ୍ତୁ
-    user_states[user_id] = {"state": "awaiting_amount"}
+    await PaymentStates.awaiting_amount.set()
     
     await message.reply(
         f"💰 Please enter amount in INR:\n"
-        f"(₹{config.MIN_AMOUNT} - ₹{config.MAX_AMOUNT})"
+        f"(₹{format_amount(MIN_PAISE)} - ₹{format_amount(MAX_PAISE)})"
     )
 
-@dp.message_handler(lambda message: user_states.get(message.from_user.id, {}).get("state") == "awaiting_amount")
-async def process_amount(message: types.Message):
+@router.handler(PaymentStates.awaiting_amount)
+async def process_amount(message: types.Message, state: FSMContext):
     """Amount input process କରନ୍ତୁ"""
     user_id = message.from_user.id
     
     try:
-        amount = float(message.text.strip())
-        
+        amount_paise = parse_amount(message.text)
+    except ValueError:
+        await message.reply("❌ Please enter a valid number:")
+        return
+    
+    try:
         # Amount ଯାଞ୍ଚ କରନ୍ତୁ
-        if amount < config.MIN_AMOUNT or amount > config.MAX_AMOUNT:
+        if amount_paise < MIN_PAISE or amount_paise > MAX_PAISE:
             await message.reply(
-                f"❌ Invalid amount! Please enter between ₹{config.MIN_AMOUNT} and ₹{config.MAX_AMOUNT}:"
+                f"❌ Invalid amount! Please enter between ₹{format_amount(MIN_PAISE)} and ₹{format_amount(MAX_PAISE)}:"
             )
             return
         
-        # Razorpay order ତିଆରି କରନ୍ତୁ
-        order = payment_processor.create_order(amount)
-        order_id = order['id']
+        if payment_processor.degraded:
+            # Razorpay ସୁସ୍ଥ ହେବା ପର୍ଯ୍ୟନ୍ତ order queue ରେ ଅପେକ୍ଷା କରେ
+            await message.reply("⏳ Payment service is busy, your payment request is queued...")
         
-        # Database ରେ ସେଭ୍ କରନ୍ତୁ
-        await db.create_payment(user_id, order_id, amount)
+        # Razorpay order ତିଆରି କରନ୍ତୁ (ଦୁଇଥର ପଠାଇଲେ ପୁରୁଣା order ଫେରେ)
+        update = types.Update.get_current()
+        update_id = update.update_id if update else None
+        payment, created = await order_creator.create(user_id, amount_paise, update_id)
+        order_id = payment['order_id']
+        
+        if not created and update_id is not None and payment.get('update_id') == update_id:
+            # Telegram ପୁଣି ପଠାଇଥିବା update - ଉତ୍ତର ପୂର୍ବରୁ ଦିଆଯାଇଛି
+            return
         
         # Payment link ଏବଂ QR code
         payment_link = f"https://rzp.io/i/{order_id}"  # Simple link
-        qr_buffer = payment_processor.generate_qr_code(payment_link)
+        qr_buffer = await payment_processor.generate_qr_code(payment_link)
         
         # ୟୁଜର୍ ସ୍ଥିତି ସଫା କରନ୍ତୁ
-        del user_states[user_id]
+        await state.finish()
         
         # Payment details ପଠାନ୍ତୁ
-        await message.reply(
-            f"✅ Payment request created!\n\n"
-            f"Amount: ₹{amount}\n"
-            f"Order ID: `{order_id}`\n\n"
-            f"Scan QR code or use link below:"
-        )
+        with transactional():
+            await message.reply(
+                f"{'✅ Payment request created!' if created else '♻️ Payment request already created!'}\n\n"
+                f"Amount: ₹{format_amount(amount_paise)}\n"
+                f"Order ID: `{order_id}`\n\n"
+                f"Scan QR code or use link below:"
+            )
         
-        # QR code ପଠାନ୍ତୁ
-        await bot.send_photo(
-            chat_id=user_id,
-            photo=qr_buffer,
-            caption=f"🔗 {payment_link}",
-            reply_markup=get_payment_keyboard(order_id)
-        )
+            # QR code ପଠାନ୍ତୁ
+            sent = await send_photo_cached(
+                bot,
+                user_id,
+                qr_buffer,
+                cache_key=order_id,
+                file_id=payment.get('qr_file_id'),
+                caption=f"🔗 {payment_link}",
+                reply_markup=get_payment_keyboard(order_id)
+            )
+        if sent.photo[-1].file_id != payment.get('qr_file_id'):
+            await db.set_qr_file_id(order_id, sent.photo[-1].file_id)
         
-    except ValueError:
-        await message.reply("❌ Please enter a valid number:")
+    except CircuitOpenError:
+        await message.reply(
+            "❌ Payment service is unavailable right now. Please try again in a few minutes."
+        )
+        await state.finish()
     except Exception as e:
         logging.error(f"Error: {e}")
         await message.reply("❌ Something went wrong. Please try again.")
-        if user_id in user_states:
-            del user_states[user_id]
+        await state.finish()
 
-@dp.callback_query_handler(lambda c: c.data.startswith('check_'))
+@dp.callback_query_handler(lambda c: c.data.startswith('check_'), state='*')
 async def check_payment(callback_query: types.CallbackQuery):
     """Check payment button handler"""
     order_id = callback_query.data.replace('check_', '')
@@ -150,12 +189,13 @@ async def check_payment(callback_query: types.CallbackQuery):
     
     try:
         # Razorpay ରୁ order details ଆଣନ୍ତୁ
-        order = payment_processor.fetch_order(order_id)
+        order = await payment_processor.fetch_order(order_id, user_id)
         
         # Payment status ଯାଞ୍ଚ କରନ୍ତୁ
         if order['status'] == 'paid':
-            # Database update କରନ୍ତୁ
-            await db.update_payment_status(order_id, "SUCCESS")
+            # Database update କରନ୍ତୁ (webhook/sweeper ପୂର୍ବରୁ କରିନଥିଲେ)
+            if await db.update_payment_status(order_id, "SUCCESS", expected_status=("PENDING", "EXPIRED")):
+                ORDERS_CONFIRMED.inc("check")
             
             # Button ହଟାନ୍ତୁ
             await callback_query.message.edit_caption(
@@ -164,12 +204,13 @@ async def check_payment(callback_query: types.CallbackQuery):
             )
             
             # Success message
-            await bot.send_message(
-                user_id,
-                f"✅ Payment successful!\n"
-                f"Amount: ₹{order['amount']/100}\n"
-                f"Thank you for your payment!"
-            )
+            with transactional():
+                await bot.send_message(
+                    user_id,
+                    f"✅ Payment successful!\n"
+                    f"Amount: ₹{format_amount(order['amount'])}\n"
+                    f"Thank you for your payment!"
+                )
         else:
             # Payment ମିଳିଲା ନାହିଁ
             await bot.send_message(
@@ -178,6 +219,13 @@ async def check_payment(callback_query: types.CallbackQuery):
                 "Please complete the payment and try again."
             )
             
+    except CircuitOpenError:
+        # Sweeper/webhook ପରେ ଆପେ ଜଣାଇବ, ବାରମ୍ବାର ଚେଷ୍ଟା ଦରକାର ନାହିଁ
+        await bot.send_message(
+            user_id,
+            "⏳ Payment service is busy right now.\n"
+            "We'll confirm your payment automatically once it's received."
+        )
     except Exception as e:
         logging.error(f"Error checking payment: {e}")
         await bot.send_message(
@@ -185,42 +233,136 @@ async def check_payment(callback_query: types.CallbackQuery):
             "❌ Error checking payment. Please try again later."
         )
 
-@dp.message_handler(commands=['history'])
+def get_history_keyboard(last_payment):
+    """Older ▸ ବଟନ୍ ତିଆରି କରନ୍ତୁ (ଶେଷ payment ର cursor ସହ)"""
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    button = InlineKeyboardButton(
+        "Older ▸",
+        callback_data=f"history_{history_cursor(last_payment)}"
+    )
+    keyboard.add(button)
+    return keyboard
+
+async def get_history_page(user_id, before=None):
+    """ଗୋଟିଏ history page ର text ଏବଂ keyboard"""
+    # ଗୋଟିଏ ଅଧିକ ଆଣନ୍ତୁ, ପୁରୁଣା ଅଛି କି ନାହିଁ ଜାଣିବା ପାଇଁ
+    payments = await db.get_user_payments(user_id, limit=HISTORY_PAGE_SIZE + 1, before=before)
+    if not payments:
+        return None, None
+    
+    has_more = len(payments) > HISTORY_PAGE_SIZE
+    payments = payments[:HISTORY_PAGE_SIZE]
+    
+    history_text = "📊 Your Payment History:\n\n"
+    
+    for p in payments:
+        status = STATUS_ICONS.get(p['status'], "⏳")
+        date = p['created_at'].strftime("%d-%b-%Y")
+        history_text += f"{status} ₹{format_amount(p['amount_paise'])} - {date}\n"
+    
+    keyboard = get_history_keyboard(payments[-1]) if has_more else None
+    return history_text, keyboard
+
+@dp.message_handler(commands=['history'], state='*')
 async def history_command(message: types.Message):
     """History command - /history"""
     user_id = message.from_user.id
     
-    payments = await db.get_user_payments(user_id)
+    history_text, keyboard = await get_history_page(user_id)
     
-    if not payments:
+    if not history_text:
         await message.reply("📭 No payment history found.")
         return
     
-    history_text = "📊 Your Payment History:\n\n"
+    await message.reply(history_text, reply_markup=keyboard)
+
+@dp.message_handler(commands=['stats'], state='*')
+async def stats_command(message: types.Message):
+    """Admin /stats - rollups ରୁ revenue ଓ conversion (orders scan ନାହିଁ)"""
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
     
-    for p in payments:
-        status = "✅" if p['status'] == "SUCCESS" else "⏳"
-        date = p['created_at'].strftime("%d-%b-%Y")
-        history_text += f"{status} ₹{p['amount']} - {date}\n"
+    now = datetime.utcnow()
+    rollups = await db.get_rollups(stats_bucket_ids(now))
+    await message.reply(stats_text(rollups, now))
+
+@dp.callback_query_handler(lambda c: c.data.startswith('history_'), state='*')
+async def history_older(callback_query: types.CallbackQuery):
+    """Older ▸ button handler"""
+    user_id = callback_query.from_user.id
+    try:
+        before = parse_history_cursor(callback_query.data.replace('history_', ''))
+    except (ValueError, OverflowError):
+        await callback_query.answer(
+            "⌛ This page has expired, run /history again.", show_alert=True
+        )
+        return
+    
+    await callback_query.answer()
+    
+    history_text, keyboard = await get_history_page(user_id, before)
     
-    await message.reply(history_text)
+    if not history_text:
+        await callback_query.message.edit_reply_markup(reply_markup=None)
+        return
+    
+    await callback_query.message.edit_text(history_text, reply_markup=keyboard)
 
-@dp.message_handler()
-async def unknown_message(message: types.Message):
+@router.handler()
+async def unknown_message(message: types.Message, state: FSMContext):
     """Unknown messages handler"""
-    if message.from_user.id in user_states:
-        await message.reply("Please enter amount:")
-    else:
-        await message.reply("Use /pay to start or /help for help.")
+    await message.reply("Use /pay to start or /help for help.")
+
+# ସବୁ command handler ପରେ
+router.setup(dp)
+
+async def notify_payment_success(payment):
+    """Sweeper ଦ୍ୱାରା ମିଳିଥିବା ପେମେଣ୍ଟ ୟୁଜରଙ୍କୁ ଜଣାନ୍ତୁ"""
+    try:
+        with transactional():
+            await bot.send_message(
+                payment["user_id"],
+                f"✅ Payment successful!\n"
+                f"Amount: ₹{format_amount(payment['amount_paise'])}\n"
+                f"Thank you for your payment!"
+            )
+    except Exception as e:
+        logging.error(f"Error sending confirmation for {payment['order_id']}: {e}")
+
+# PENDING orders ପାଇଁ ପୃଷ୍ଠଭୂମି sweeper
+reconciler = Reconciler(db, payment_processor, notify_payment_success)
+
+# Replay ପାଇଁ updates ଓ Razorpay/database calls ରେକର୍ଡ କରନ୍ତୁ
+capture = Capture(
+    config.CAPTURE_DIR, config.CAPTURE_MAX_BYTES, config.CAPTURE_MAX_FILES, config.CAPTURE_SALT,
+    config.CAPTURE_FLUSH_INTERVAL
+) if config.CAPTURE_DIR else None
+if capture is not None:
+    capture.install(dp, db, payment_processor)
 
 async def main():
     """Main function"""
     # Database connect କରନ୍ତୁ
     await db.connect()
+    await db.migrate_amounts()
+    await db.ensure_indexes()
+    reconciler.start()
+    if config.LOOP_MONITOR:
+        loop_monitor.start()
     
     # Bot start କରନ୍ତୁ
     print("🤖 Bot is starting...")
-    await dp.start_polling()
+    try:
+        await dp.start_polling()
+    finally:
+        await loop_monitor.stop()
+        await reconciler.stop()
+        # Razorpay HTTP session ବନ୍ଦ କରନ୍ତୁ
+        await payment_processor.close()
+        # Queue ରେ ଥିବା payment writes ଲେଖି database ବନ୍ଦ କରନ୍ତୁ
+        await db.close()
+        if capture is not None:
+            capture.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -1,15 +1,38 @@
 import os
+import hmac
+import json
+import time
+import signal
 import asyncio
 import logging
+from aiohttp import web
 from aiogram import Bot, Dispatcher, types
 from aiogram.contrib.middlewares.logging import LoggingMiddleware
+from aiogram.dispatcher import FSMContext
+from aiogram.dispatcher.webhook import BOT_DISPATCHER_KEY, WebhookRequestHandler
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.executor import start_webhook
 from datetime import datetime
 
 import config
-from database import db
-from payments import payment_processor
+from database import db, history_cursor, parse_history_cursor
+from payments import payment_processor, CircuitOpenError
+from orders import order_creator
+from media import send_photo_cached
+from sender import create_bot, transactional, PRIORITY_NAMES
+from states import PaymentStates
+from storage import create_storage
+from router import StateRouter
+from reconciler import Reconciler
+from leader import LeaderElection
+import metrics
+from metrics import HANDLER_LATENCY, ORDERS_CONFIRMED, timed
+from update_queue import UpdateQueue
+from money import parse_amount, format_amount, MIN_PAISE, MAX_PAISE
+from rollups import stats_bucket_ids, stats_text
+from bson.errors import InvalidId
+from export import FORMATS, export_stream, parse_day
+from loop_monitor import LoopMonitor, ProfilingMiddleware
+from capture import Capture
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -22,14 +45,32 @@ PORT = int(os.getenv("PORT", 8000))
 # Webhook paths
 WEBHOOK_PATH = f"/webhook/{BOT_TOKEN}"
 WEBHOOK_URL = f"{RENDER_EXTERNAL_URL}{WEBHOOK_PATH}"
+RAZORPAY_WEBHOOK_PATH = os.getenv("RAZORPAY_WEBHOOK_PATH", "/razorpay/webhook")
+
+HISTORY_PAGE_SIZE = 10
+STATUS_ICONS = {"SUCCESS": "✅", "EXPIRED": "❌"}
+
+# Razorpay events that mean the order is paid
+PAID_EVENTS = ("payment.captured", "order.paid")
 
 # Initialize bot and dispatcher
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(bot)
+bot = create_bot(BOT_TOKEN)
+dp = Dispatcher(bot, storage=create_storage())
 dp.middleware.setup(LoggingMiddleware())
 
-# User states
-user_states = {}
+# Event loop lag and blocking-call detector
+loop_monitor = LoopMonitor(config.LOOP_BLOCK_THRESHOLD, config.LOOP_LAG_INTERVAL)
+if config.LOOP_MONITOR:
+    dp.middleware.setup(ProfilingMiddleware(config.LOOP_BLOCK_THRESHOLD))
+Bot.set_current(bot)
+Dispatcher.set_current(dp)
+
+# Set once the database client is up
+ready = asyncio.Event()
+startup_updates = set()
+
+# State dispatch table for plain text messages
+router = StateRouter()
 
 def get_payment_keyboard(order_id):
     keyboard = InlineKeyboardMarkup(row_width=1)
@@ -40,7 +81,7 @@ def get_payment_keyboard(order_id):
     keyboard.add(button)
     return keyboard
 
-@dp.message_handler(commands=['start'])
+@dp.message_handler(commands=['start'], state='*')
 async def start_command(message: types.Message):
     welcome_text = """
 🚀 Welcome to Payment Bot!
@@ -54,113 +95,116 @@ Made with Python 🐍
     """
     await message.reply(welcome_text)
 
-@dp.message_handler(commands=['help'])
+@dp.message_handler(commands=['help'], state='*')
 async def help_command(message: types.Message):
     help_text = f"""
 📖 How to use:
 
 1. Click /pay to start payment
-2. Enter amount (₹{config.MIN_AMOUNT} - ₹{config.MAX_AMOUNT})
+2. Enter amount (₹{format_amount(MIN_PAISE)} - ₹{format_amount(MAX_PAISE)})
 3. Scan QR code or use payment link
 4. Click 'Check Payment' after payment
 5. Get confirmation
 
-Minimum: ₹{config.MIN_AMOUNT}
-Maximum: ₹{config.MAX_AMOUNT}
+Minimum: ₹{format_amount(MIN_PAISE)}
+Maximum: ₹{format_amount(MAX_PAISE)}
     """
     await message.reply(help_text)
 
-@dp.message_handler(commands=['pay'])
+@dp.message_handler(commands=['pay'], state='*')
 async def pay_command(message: types.Message):
-    user_id = message.from_user.id
-    user_states[user_id] = {"state": "awaiting_amount"}
+    await PaymentStates.awaiting_amount.set()
     await message.reply(
         f"💰 Please enter amount in INR:\n"
-        f"(₹{config.MIN_AMOUNT} - ₹{config.MAX_AMOUNT})"
+        f"(₹{format_amount(MIN_PAISE)} - ₹{format_amount(MAX_PAISE)})"
     )
 
-@dp.message_handler(lambda message: user_states.get(message.from_user.id, {}).get("state") == "awaiting_amount")
-async def process_amount(message: types.Message):
+@router.handler(PaymentStates.awaiting_amount)
+@timed(HANDLER_LATENCY)
+async def process_amount(message: types.Message, state: FSMContext):
     user_id = message.from_user.id
     
     try:
-        amount = float(message.text.strip())
-        
-        if amount < config.MIN_AMOUNT or amount > config.MAX_AMOUNT:
+        amount_paise = parse_amount(message.text)
+    except ValueError:
+        await message.reply("❌ Please enter a valid number:")
+        return
+    
+    try:
+        if amount_paise < MIN_PAISE or amount_paise > MAX_PAISE:
             await message.reply(
-                f"❌ Invalid amount! Please enter between ₹{config.MIN_AMOUNT} and ₹{config.MAX_AMOUNT}:"
+                f"❌ Invalid amount! Please enter between ₹{format_amount(MIN_PAISE)} and ₹{format_amount(MAX_PAISE)}:"
             )
             return
         
-        # Create Razorpay order
-        order = payment_processor.create_order(amount)
-        order_id = order['id']
+        if payment_processor.degraded:
+            # Order creation waits in a queue until Razorpay recovers
+            await message.reply("⏳ Payment service is busy, your payment request is queued...")
         
-        # Save to database
-        await db.create_payment(user_id, order_id, amount)
+        # Create the Razorpay order, or reuse it for a double-send / redelivery
+        update = types.Update.get_current()
+        update_id = update.update_id if update else None
+        payment, created = await order_creator.create(user_id, amount_paise, update_id)
+        order_id = payment['order_id']
+        
+        if not created and update_id is not None and payment.get('update_id') == update_id:
+            # Telegram redelivered this update; it was already answered
+            return
         
         # Payment link and QR code
         payment_link = f"https://rzp.io/i/{order_id}"
-        qr_buffer = payment_processor.generate_qr_code(payment_link)
+        qr_buffer = await payment_processor.generate_qr_code(payment_link)
         
-        del user_states[user_id]
+        await state.finish()
         
-        await message.reply(
-            f"✅ Payment request created!\n\n"
-            f"Amount: ₹{amount}\n"
-            f"Order ID: `{order_id}`\n\n"
-            f"Scan QR code or use link below:"
-        )
+        with transactional():
+            await message.reply(
+                f"{'✅ Payment request created!' if created else '♻️ Payment request already created!'}\n\n"
+                f"Amount: ₹{format_amount(amount_paise)}\n"
+                f"Order ID: `{order_id}`\n\n"
+                f"Scan QR code or use link below:"
+            )
         
-        await bot.send_photo(
-            chat_id=user_id,
-            photo=qr_buffer,
-            caption=f"🔗 {payment_link}",
-            reply_markup=get_payment_keyboard(order_id)
-        )
+            sent = await send_photo_cached(
+                bot,
+                user_id,
+                qr_buffer,
+                cache_key=order_id,
+                file_id=payment.get('qr_file_id'),
+                caption=f"🔗 {payment_link}",
+                reply_markup=get_payment_keyboard(order_id)
+            )
+        if sent.photo[-1].file_id != payment.get('qr_file_id'):
+            await db.set_qr_file_id(order_id, sent.photo[-1].file_id)
         
-    except ValueError:
-        await message.reply("❌ Please enter a valid number:")
+    except CircuitOpenError:
+        await message.reply(
+            "❌ Payment service is unavailable right now. Please try again in a few minutes."
+        )
+        await state.finish()
     except Exception as e:
         logging.error(f"Error: {e}")
         await message.reply("❌ Something went wrong. Please try again.")
-        if user_id in user_states:
-            del user_states[user_id]
+        await state.finish()
 
-@dp.callback_query_handler(lambda c: c.data.startswith('check_'))
+@dp.callback_query_handler(lambda c: c.data.startswith('check_'), state='*')
+@timed(HANDLER_LATENCY)
 async def check_payment(callback_query: types.CallbackQuery):
     order_id = callback_query.data.replace('check_', '')
     user_id = callback_query.from_user.id
     
     await callback_query.answer()
     
-    if await db.is_payment_completed(order_id):
-        await callback_query.message.edit_caption(
-            callback_query.message.caption,
-            reply_markup=None
-        )
-        await bot.send_message(
-            user_id,
-            "✅ Payment already confirmed! Thank you!"
-        )
-        return
-    
     try:
-        order = payment_processor.fetch_order(order_id)
-        
-        if order['status'] == 'paid':
-            await db.update_payment_status(order_id, "SUCCESS")
-            
+        # Status comes from the Razorpay webhook, no API call here
+        if await db.is_payment_completed(order_id):
             await callback_query.message.edit_caption(
                 callback_query.message.caption,
                 reply_markup=None
             )
-            
             await bot.send_message(
                 user_id,
-                f"✅ Payment successful!\n"
-                f"Amount: ₹{order['amount']/100}\n"
-                f"Thank you for your payment!"
+                "✅ Payment already confirmed! Thank you!"
             )
         else:
             await bot.send_message(
@@ -176,49 +220,414 @@ async def check_payment(callback_query: types.CallbackQuery):
             "❌ Error checking payment. Please try again later."
         )
 
-@dp.message_handler(commands=['history'])
+def get_history_keyboard(last_payment):
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    button = InlineKeyboardButton(
+        "Older ▸",
+        callback_data=f"history_{history_cursor(last_payment)}"
+    )
+    keyboard.add(button)
+    return keyboard
+
+async def get_history_page(user_id, before=None):
+    # One extra row tells us whether an older page exists
+    payments = await db.get_user_payments(user_id, limit=HISTORY_PAGE_SIZE + 1, before=before)
+    if not payments:
+        return None, None
+    
+    has_more = len(payments) > HISTORY_PAGE_SIZE
+    payments = payments[:HISTORY_PAGE_SIZE]
+    
+    history_text = "📊 Your Payment History:\n\n"
+    for p in payments:
+        status = STATUS_ICONS.get(p['status'], "⏳")
+        date = p['created_at'].strftime("%d-%b-%Y")
+        history_text += f"{status} ₹{format_amount(p['amount_paise'])} - {date}\n"
+    
+    keyboard = get_history_keyboard(payments[-1]) if has_more else None
+    return history_text, keyboard
+
+@dp.message_handler(commands=['history'], state='*')
+@timed(HANDLER_LATENCY)
 async def history_command(message: types.Message):
     user_id = message.from_user.id
-    payments = await db.get_user_payments(user_id)
+    history_text, keyboard = await get_history_page(user_id)
     
-    if not payments:
+    if not history_text:
         await message.reply("📭 No payment history found.")
         return
     
-    history_text = "📊 Your Payment History:\n\n"
-    for p in payments:
-        status = "✅" if p['status'] == "SUCCESS" else "⏳"
-        date = p['created_at'].strftime("%d-%b-%Y")
-        history_text += f"{status} ₹{p['amount']} - {date}\n"
+    await message.reply(history_text, reply_markup=keyboard)
+
+@dp.message_handler(commands=['stats'], state='*')
+async def stats_command(message: types.Message):
+    """Admin-only revenue and conversion from the rollups, O(buckets)"""
+    if message.from_user.id not in config.ADMIN_IDS:
+        return
     
-    await message.reply(history_text)
+    now = datetime.utcnow()
+    rollups = await db.get_rollups(stats_bucket_ids(now))
+    await message.reply(stats_text(rollups, now))
+
+@dp.callback_query_handler(lambda c: c.data.startswith('history_'), state='*')
+async def history_older(callback_query: types.CallbackQuery):
+    user_id = callback_query.from_user.id
+    try:
+        before = parse_history_cursor(callback_query.data.replace('history_', ''))
+    except (ValueError, OverflowError):
+        await callback_query.answer(
+            "⌛ This page has expired, run /history again.", show_alert=True
+        )
+        return
+    
+    await callback_query.answer()
+    
+    history_text, keyboard = await get_history_page(user_id, before)
+    
+    if not history_text:
+        await callback_query.message.edit_reply_markup(reply_markup=None)
+        return
+    
+    await callback_query.message.edit_text(history_text, reply_markup=keyboard)
+
+@router.handler()
+async def unknown_message(message: types.Message, state: FSMContext):
+    await message.reply("Use /pay to start or /help for help.")
+
+# Must come after every command handler
+router.setup(dp)
 
-@dp.message_handler()
-async def unknown_message(message: types.Message):
-    if message.from_user.id in user_states:
-        await message.reply("Please enter amount:")
+async def razorpay_webhook(request):
+    """Razorpay payment.captured / order.paid webhook"""
+    body = await request.text()
+    signature = request.headers.get("X-Razorpay-Signature")
+    
+    if not payment_processor.verify_webhook(body, signature):
+        logging.warning("Rejected Razorpay webhook with bad signature")
+        return web.Response(status=400)
+    
+    event = json.loads(body)
+    if capture is not None:
+        capture.record("webhook", e=capture.redact(event))
+    return web.Response(text=await handle_razorpay_event(event))
+
+async def handle_razorpay_event(event):
+    """Applies a verified webhook event; returns "ok" or "ignored" """
+    if event.get("event") not in PAID_EVENTS:
+        return "ignored"
+    
+    payload = event.get("payload", {})
+    payment = payload.get("payment", {}).get("entity", {})
+    order_id = payment.get("order_id") or payload.get("order", {}).get("entity", {}).get("id")
+    if not order_id:
+        return "ignored"
+    
+    # Only the first paid event moves the order to SUCCESS and notifies.
+    # EXPIRED orders (given up on by the sweeper) can still be paid late.
+    updated = await db.update_payment_status(
+        order_id, "SUCCESS", payment or None, expected_status=("PENDING", "EXPIRED")
+    )
+    if updated:
+        ORDERS_CONFIRMED.inc("webhook")
+        await notify_payment_success(await db.get_payment(order_id))
+    
+    return "ok"
+
+async def notify_payment_success(payment):
+    """Push the payment confirmation to the user"""
+    try:
+        with transactional():
+            await bot.send_message(
+                payment["user_id"],
+                f"✅ Payment successful!\n"
+                f"Amount: ₹{format_amount(payment['amount_paise'])}\n"
+                f"Thank you for your payment!"
+            )
+    except Exception as e:
+        logging.error(f"Error sending confirmation for {payment['order_id']}: {e}")
+
+reconciler = Reconciler(db, payment_processor, notify_payment_success)
+
+# Record updates and Razorpay/database calls for benchmarks/replay.py
+capture = Capture(
+    config.CAPTURE_DIR, config.CAPTURE_MAX_BYTES, config.CAPTURE_MAX_FILES, config.CAPTURE_SALT,
+    config.CAPTURE_FLUSH_INTERVAL
+) if config.CAPTURE_DIR else None
+if capture is not None:
+    capture.install(dp, db, payment_processor)
+
+async def on_elected():
+    """Leader-only startup: webhook registration and background jobs"""
+    results = await asyncio.gather(
+        bot.set_webhook(WEBHOOK_URL),
+        # Index builds are idempotent and not needed to serve traffic
+        db.ensure_indexes(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logging.error(f"Leader startup error: {result}")
+    logging.info(f"Webhook set to {WEBHOOK_URL}")
+    reconciler.start()
+
+async def on_demoted():
+    """Another worker owns the background jobs now"""
+    await reconciler.stop()
+
+# With several workers only the lease holder talks to set_webhook/reconciler
+election = LeaderElection(
+    db, "webhook", config.LEADER_LEASE_TTL, on_elected, on_demoted
+)
+
+async def reply_busy(update):
+    """Tell the user their update was shed because the queue is full"""
+    if update.callback_query:
+        await bot.answer_callback_query(
+            update.callback_query.id, "⏳ Bot is busy, please try again in a moment."
+        )
+    elif update.message:
+        await bot.send_message(
+            update.message.chat.id, "⏳ Bot is busy, please try again in a moment."
+        )
+
+# Bounded per-user-ordered queue; None runs handlers inside the request
+update_queue = UpdateQueue(
+    dp, ready, config.UPDATE_WORKERS, config.UPDATE_QUEUE_SIZE,
+    config.UPDATE_DEDUPE_SIZE, on_full=reply_busy
+) if config.UPDATE_QUEUE else None
+
+class StartupWebhookHandler(WebhookRequestHandler):
+    """Telegram webhook that ACKs at once (queue mode, or while starting)"""
+    
+    async def post(self):
+        if ready.is_set() and update_queue is None:
+            return await super().post()
+        
+        self.validate_ip()
+        dispatcher = self.get_dispatcher()
+        update = await self.parse_update(dispatcher.bot)
+        
+        if update_queue is not None:
+            # Workers pick it up (after startup); duplicates and overflow are dropped
+            update_queue.put(update)
+            return web.Response(text='ok')
+        
+        # Queue it; waiters wake in arrival order once startup finishes
+        task = asyncio.create_task(process_when_ready(dispatcher, update))
+        startup_updates.add(task)
+        task.add_done_callback(startup_updates.discard)
+        return web.Response(text='ok')
+
+async def process_when_ready(dispatcher, update):
+    await ready.wait()
+    await dispatcher.process_update(update)
+
+async def warm_up():
+    """Startup I/O, run off the listening path"""
+    try:
+        await db.connect()
+        # Readers expect amount_paise, so migrate before handling updates
+        await db.migrate_amounts()
+    except Exception as e:
+        logging.error(f"Startup error: {e}")
+    ready.set()
+    
+    if config.WEB_WORKERS > 1:
+        election.start()
     else:
-        await message.reply("Use /pay to start or /help for help.")
+        await election.claim()
 
-async def on_startup(dp):
+async def on_startup(app):
     """Webhook startup"""
-    await bot.set_webhook(WEBHOOK_URL)
-    await db.connect()
-    logging.info(f"Webhook set to {WEBHOOK_URL}")
+    # Returns immediately so the server starts listening right away
+    app['warm_up'] = asyncio.create_task(warm_up())
+    if config.LOOP_MONITOR:
+        loop_monitor.start()
+    if update_queue is not None:
+        update_queue.start()
+    if shared_metrics is not None:
+        shared_metrics.start()
 
-async def on_shutdown(dp):
+async def on_shutdown(app):
     """Webhook shutdown"""
-    await bot.delete_webhook()
+    app['warm_up'].cancel()
+    await loop_monitor.stop()
+    if shared_metrics is not None:
+        await shared_metrics.stop()
+    if update_queue is not None:
+        # Finish accepted updates while the bot session and database are up
+        await update_queue.close()
+    was_leader = election.is_leader
+    await election.stop()
+    if was_leader:
+        await bot.delete_webhook()
+        logging.info("Webhook removed")
+    await payment_processor.close()
+    # Flushes queued payment writes before the connection closes
     await db.close()
-    logging.info("Webhook removed")
+    if capture is not None:
+        capture.close()
+    await dp.storage.close()
+    await dp.storage.wait_closed()
+    session = await bot.get_session()
+    await session.close()
+
+# Set by serve_workers(): every worker's metrics in one scrape
+shared_metrics = None
+
+def authorized(request, token):
+    """Checks "Authorization: Bearer <token>" in constant time"""
+    given = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return hmac.compare_digest(given.encode(), token.encode())
+
+async def metrics_handler(request):
+    """Prometheus scrape endpoint (Authorization: Bearer <METRICS_TOKEN>)"""
+    if not authorized(request, config.METRICS_TOKEN):
+        return web.Response(status=401)
+    text = shared_metrics.render() if shared_metrics is not None else metrics.render()
+    return web.Response(text=text, content_type="text/plain", charset="utf-8")
+
+if metrics.ENABLED:
+    # Read at scrape time from the objects that already keep these numbers
+    metrics.Gauge(
+        "razorpay_client_events_total", "Razorpay client cache, retry and breaker events",
+        lambda: {(event,): count for event, count in payment_processor.stats.items()},
+        ("event",), kind="counter"
+    )
+    metrics.Gauge(
+        "razorpay_circuit_open", "1 while the Razorpay circuit breaker is open",
+        lambda: int(payment_processor.degraded)
+    )
+    metrics.Gauge(
+        "write_behind_pending", "Payment writes waiting for the next batch",
+        lambda: len(db.writes) if db.writes is not None else 0
+    )
+    if update_queue is not None:
+        metrics.Gauge(
+            "update_queue_depth", "Telegram updates waiting for a worker",
+            lambda: len(update_queue)
+        )
+    if bot.scheduler is not None:
+        metrics.Gauge(
+            "telegram_send_queue_depth", "Outbound sends waiting for a rate-limit slot",
+            lambda: {(PRIORITY_NAMES[p],): n for p, n in bot.scheduler.waiting.items()},
+            ("priority",)
+        )
+
+async def export_handler(request):
+    """Admin download: streams payments as CSV/JSONL, optionally gzipped
+
+    GET /admin/export?format=csv&gzip=1&since=YYYY-MM-DD&until=YYYY-MM-DD&after=<_id>
+    with "Authorization: Bearer <EXPORT_TOKEN>". Rows are in _id order and
+    carry their _id, so an interrupted download resumes with after=<last _id>.
+    """
+    if not authorized(request, config.EXPORT_TOKEN):
+        return web.Response(status=401)
+    
+    query = request.query
+    fmt = query.get("format", "csv")
+    compress = query.get("gzip") == "1"
+    try:
+        content_type, extension = FORMATS[fmt]
+        since = query.get("since") and parse_day(query["since"])
+        until = query.get("until") and parse_day(query["until"])
+        chunks = export_stream(
+            db, fmt, compress, header=not query.get("after"),
+            since=since, until=until, after=query.get("after")
+        )
+    except (KeyError, ValueError, InvalidId) as e:
+        return web.Response(status=400, text=f"Bad export parameters: {e}")
+    
+    filename = f"payments-{query.get('since', 'all')}{extension}{'.gz' if compress else ''}"
+    response = web.StreamResponse(headers={
+        "Content-Type": "application/gzip" if compress else content_type,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    })
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    async for data, rows, last_id in chunks:
+        await response.write(data)
+    await response.write_eof()
+    return response
+
+def make_app():
+    """aiohttp app: Telegram webhook + Razorpay webhook"""
+    app = web.Application()
+    app[BOT_DISPATCHER_KEY] = dp
+    app.router.add_route('*', WEBHOOK_PATH, StartupWebhookHandler, name='webhook_handler')
+    app.router.add_post(RAZORPAY_WEBHOOK_PATH, razorpay_webhook)
+    if metrics.ENABLED and config.METRICS_TOKEN:
+        app.router.add_get(config.METRICS_PATH, metrics_handler)
+    if config.EXPORT_TOKEN:
+        app.router.add_get("/admin/export", export_handler)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+def run_worker():
+    """One webhook server process"""
+    # SO_REUSEPORT lets every worker bind the same port; the kernel
+    # spreads incoming connections across them
+    web.run_app(
+        make_app(), host='0.0.0.0', port=PORT,
+        reuse_port=config.WEB_WORKERS > 1
+    )
+
+def serve_workers(count):
+    """Pre-fork supervisor: start `count` workers and restart any that die"""
+    import multiprocessing
+    import shutil
+    import tempfile
+    global shared_metrics
+    
+    # Workers inherit it through fork and share their metrics there
+    if metrics.ENABLED:
+        shared_metrics = metrics.SharedMetrics(
+            tempfile.mkdtemp(prefix="payment-bot-metrics-"), config.METRICS_SHARE_INTERVAL
+        )
+    context = multiprocessing.get_context("fork")
+    workers = []
+    stopping = False
+    
+    def spawn():
+        worker = context.Process(target=run_worker)
+        worker.start()
+        return worker
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    workers.extend(spawn() for _ in range(count))
+    logging.info(f"Started {count} webhook workers on port {PORT}")
+    
+    while not stopping:
+        for i, worker in enumerate(workers):
+            if not worker.is_alive() and not stopping:
+                logging.warning(f"Worker {worker.pid} exited ({worker.exitcode}), restarting")
+                if shared_metrics is not None:
+                    # Its last snapshot would be scraped forever
+                    try:
+                        os.remove(os.path.join(shared_metrics.directory, f"{worker.pid}.json"))
+                    except OSError:
+                        pass
+                workers[i] = spawn()
+        time.sleep(1)
+    
+    for worker in workers:
+        worker.join()
+    if shared_metrics is not None:
+        shutil.rmtree(shared_metrics.directory, ignore_errors=True)
 
 if __name__ == '__main__':
     # Start webhook
-    start_webhook(
-        dispatcher=dp,
-        webhook_path=WEBHOOK_PATH,
-        on_startup=on_startup,
-        on_shutdown=on_shutdown,
-        host='0.0.0.0',
-        port=PORT
-    )
+    if config.WEB_WORKERS > 1:
+        serve_workers(config.WEB_WORKERS)
+    else:
+        run_worker()
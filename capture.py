@@ -0,0 +1,251 @@
+import os
+import hmac
+import json
+import time
+import heapq
+import hashlib
+import asyncio
+import secrets
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from money import AMOUNT_RE
+
+# ଏହି fields ର value ହଟାନ୍ତୁ (Telegram profile, Razorpay customer details)
+REDACT_KEYS = {
+    "first_name", "last_name", "username", "title", "bio", "phone_number",
+    "email", "contact", "vpa", "card", "card_id", "bank", "wallet",
+    "address", "notes", "receipt", "description", "location", "venue",
+}
+# ଏହି ids pseudonymous ids ରେ ବଦଳନ୍ତୁ (ସମାନ user ପାଇଁ ସମାନ)
+ID_KEYS = {"user_id", "chat_id"}
+CHAT_TYPES = {"private", "group", "supergroup", "channel"}
+
+# Replay ପାଇଁ latency ରଖାଯାଉଥିବା database methods (leases ବାଦ)
+DB_METHODS = (
+    "create_payment", "find_idempotent_payment", "claim_order_key", "release_order_key",
+    "get_payment", "update_payment_status", "set_qr_file_id", "get_payment_status",
+    "is_payment_completed", "get_due_payments", "reschedule_payments", "expire_payments",
+    "get_user_payments", "get_rollups",
+)
+
+def is_user_object(value):
+    """Telegram User (is_bot) ବା Chat (type) ପରି dict, ଯେକୌଣସି key ତଳେ"""
+    return "id" in value and ("is_bot" in value or value.get("type") in CHAT_TYPES)
+
+def redact_text(text):
+    """Commands ଓ amounts ରଖନ୍ତୁ, ବାକି ଲେଖା ହଟାନ୍ତୁ"""
+    if text.startswith("/"):
+        # "/start <payload>" -> "/start"
+        return text.split()[0]
+    if AMOUNT_RE.fullmatch(text.strip().replace(",", "")):
+        return text
+    return "redacted"
+
+class CaptureWriter:
+    def __init__(self, directory, max_bytes, max_files, flush_interval):
+        """
+        Compact JSONL, max_bytes ପରେ ନୂଆ file
+
+        Files are named capture-<start ms>-<pid>.jsonl, so each webhook
+        worker writes its own and a sorted listing is in time order. The
+        file is opened on the first write (after the pre-fork), and the
+        oldest files are deleted beyond max_files. Lines are buffered in
+        memory and written every `flush_interval` seconds by one executor
+        thread, so no disk I/O runs on the event loop.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        self.file = None
+        self.size = 0
+        self.buffer = []
+        self.executor = None
+        self.task = None
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"capture-{int(time.time() * 1000):013d}-{os.getpid()}.jsonl"
+        self.file = open(os.path.join(self.directory, name), "w")
+        self.size = 0
+        for old in capture_files(self.directory)[:-self.max_files]:
+            os.remove(old)
+
+    def write(self, record):
+        """Buffer ରେ ରଖନ୍ତୁ; ପରବର୍ତ୍ତୀ flush ରେ disk କୁ"""
+        self.buffer.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if self.task is None:
+            # ପ୍ରଥମ write (pre-fork ପରେ) - ଏହି process ର thread ଓ task
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.buffer:
+                lines, self.buffer = self.buffer, []
+                await loop.run_in_executor(self.executor, self._write_lines, lines)
+
+    def _write_lines(self, lines):
+        for line in lines:
+            if self.file is None or self.size >= self.max_bytes:
+                self._rotate()
+            self.file.write(line)
+            # ensure_ascii: ଅକ୍ଷର ସଂଖ୍ୟା = bytes
+            self.size += len(line)
+        self.file.flush()
+
+    def close(self):
+        """ବାକି buffer ଲେଖି file ବନ୍ଦ କରନ୍ତୁ"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.executor is not None:
+            # ଚାଲୁଥିବା flush ଶେଷ ହେଉ, ଯେପରି ଧାଡ଼ି କ୍ରମ ରହେ
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.buffer:
+            lines, self.buffer = self.buffer, []
+            self._write_lines(lines)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class Capture:
+    def __init__(self, directory, max_bytes, max_files, salt=None, flush_interval=1.0):
+        """
+        Production traffic ରେକର୍ଡ କରନ୍ତୁ (benchmarks/replay.py ପାଇଁ)
+
+        Records every incoming Telegram update and verified Razorpay
+        webhook event, every Razorpay API call (request, response or
+        error, latency) and the latency of every database call, each with
+        a wall-clock timestamp. Names, phone numbers, emails, VPAs,
+        locations, free text and the like are removed, and the ids of
+        every Telegram user and chat object are replaced by a keyed hash,
+        stable within a run, so per-user ordering survives but the ids do
+        not. Without a salt a random one is used per process start.
+        """
+        self.writer = CaptureWriter(directory, max_bytes, max_files, flush_interval)
+        self.salt = (salt or secrets.token_hex(16)).encode()
+
+    def pseudonym(self, value):
+        digest = hmac.new(self.salt, str(value).encode(), hashlib.sha256).hexdigest()
+        return int(digest[:12], 16)
+
+    def redact(self, value):
+        """Update / Razorpay JSON ରୁ PII ହଟାନ୍ତୁ"""
+        if isinstance(value, list):
+            return [self.redact(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        # from, forward_from, new_chat_members, via_bot, chat, ... ସବୁ
+        user_object = is_user_object(value)
+        redacted = {}
+        for name, item in value.items():
+            if name in REDACT_KEYS:
+                # Objects (Telegram contact, Razorpay card) ପୂରା ବାଦ
+                if not isinstance(item, (dict, list)):
+                    redacted[name] = "redacted"
+            elif name in ("text", "caption") and isinstance(item, str):
+                redacted[name] = redact_text(item)
+            elif name in ID_KEYS or (name == "id" and user_object):
+                redacted[name] = self.pseudonym(item)
+            else:
+                redacted[name] = self.redact(item)
+        return redacted
+
+    def record(self, kind, **fields):
+        """
+        ଗୋଟିଏ JSONL record; `t` ଲେଖିବା ସମୟ
+
+        Calls are written when they finish (with their latency in `ms`),
+        so every file is in `t` order and files can be merged by time.
+        """
+        self.writer.write({"t": round(time.time(), 3), "k": kind, **fields})
+
+    def install(self, dp, database, processor):
+        """Dispatcher, database ଓ Razorpay client ରେ capture ଲଗାନ୍ତୁ"""
+        dp.middleware.setup(CaptureMiddleware(self))
+        for name in DB_METHODS:
+            if hasattr(database, name):
+                setattr(database, name, self._wrap_db(name, getattr(database, name)))
+        processor._request = self._wrap_razorpay(processor._request)
+
+    def _wrap_db(self, name, method):
+        capture = self
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            start = time.time()
+            error = None
+            try:
+                return await method(*args, **kwargs)
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                fields = {"m": name, "ms": round((time.time() - start) * 1000, 1)}
+                if error:
+                    fields["e"] = error
+                capture.record("db", **fields)
+        return wrapper
+
+    def _wrap_razorpay(self, request):
+        capture = self
+
+        @functools.wraps(request)
+        async def wrapper(method, path, queue=False, **kwargs):
+            start = time.time()
+            fields = {"m": method, "p": path}
+            if "json" in kwargs:
+                fields["q"] = capture.redact(kwargs["json"])
+            try:
+                data = await request(method, path, queue, **kwargs)
+                fields["r"] = capture.redact(data)
+                return data
+            except BaseException as e:
+                fields["e"] = type(e).__name__
+                raise
+            finally:
+                fields["ms"] = round((time.time() - start) * 1000, 1)
+                capture.record("razorpay", **fields)
+        return wrapper
+
+    def close(self):
+        self.writer.close()
+
+class CaptureMiddleware(BaseMiddleware):
+    """ପ୍ରତି incoming update (redeliveries ସହ) capture ରେ ଲେଖନ୍ତୁ"""
+
+    def __init__(self, capture):
+        super().__init__()
+        self.capture = capture
+
+    async def on_pre_process_update(self, update, data):
+        self.capture.record("update", u=self.capture.redact(update.to_python()))
+
+def capture_files(directory):
+    """Directory ର capture files, ପୁରୁଣାରୁ ନୂଆ"""
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.startswith("capture-") and name.endswith(".jsonl")
+    )
+    return [os.path.join(directory, name) for name in names]
+
+def _read(path):
+    with open(path) as f:
+        for line in f:
+            # Crash ପରେ ଅଧା ଲେଖା ଶେଷ ଧାଡ଼ି ବାଦ
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+def read_capture(paths):
+    """Files (ବା directories) ର records, ସମୟ କ୍ରମରେ ମିଶାଇ (streaming)"""
+    files = []
+    for path in paths:
+        files.extend(capture_files(path) if os.path.isdir(path) else [path])
+    return heapq.merge(*(_read(path) for path in files), key=lambda record: record["t"])
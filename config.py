@@ -7,9 +7,114 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
+RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "payment_bot")
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "mongo")  # mongo / sqlite (bot.py, bot_webhook.py)
+
+# Embedded SQLite storage (simple_bot, DATABASE_BACKEND=sqlite)
+SQLITE_PATH = os.getenv("SQLITE_PATH", "payments.db")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL / FULL
 
 # Payment Settings
 MIN_AMOUNT = float(os.getenv("MIN_AMOUNT", 1))
 MAX_AMOUNT = float(os.getenv("MAX_AMOUNT", 100000))
+
+# Razorpay API Settings
+RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL", "https://api.razorpay.com/v1")
+RAZORPAY_TIMEOUT = float(os.getenv("RAZORPAY_TIMEOUT", 10))
+RAZORPAY_MAX_CONCURRENCY = int(os.getenv("RAZORPAY_MAX_CONCURRENCY", 20))
+RAZORPAY_RATE_LIMIT = float(os.getenv("RAZORPAY_RATE_LIMIT", 25))  # requests/second, 0 = off
+RAZORPAY_BURST = int(os.getenv("RAZORPAY_BURST", 50))
+RAZORPAY_MAX_RETRIES = int(os.getenv("RAZORPAY_MAX_RETRIES", 3))
+RAZORPAY_BACKOFF_BASE = float(os.getenv("RAZORPAY_BACKOFF_BASE", 0.25))  # seconds
+RAZORPAY_BACKOFF_MAX = float(os.getenv("RAZORPAY_BACKOFF_MAX", 8))
+RAZORPAY_BREAKER_THRESHOLD = int(os.getenv("RAZORPAY_BREAKER_THRESHOLD", 5))  # failures in a row
+RAZORPAY_BREAKER_RESET = float(os.getenv("RAZORPAY_BREAKER_RESET", 10))  # seconds until a probe
+RAZORPAY_QUEUE_TIMEOUT = float(os.getenv("RAZORPAY_QUEUE_TIMEOUT", 30))  # order creation wait
+
+# Same user + amount within this many seconds reuses the order
+ORDER_DEDUPE_WINDOW = int(os.getenv("ORDER_DEDUPE_WINDOW", 60))
+
+# Razorpay fetch_order result cache and per-user check throttle
+ORDER_CACHE_TTL = float(os.getenv("ORDER_CACHE_TTL", 3))  # seconds
+ORDER_CACHE_SIZE = int(os.getenv("ORDER_CACHE_SIZE", 1024))
+CHECK_THROTTLE = float(os.getenv("CHECK_THROTTLE", 2))  # seconds
+
+# QR Code Settings
+QR_EXECUTOR = os.getenv("QR_EXECUTOR", "thread")  # thread / process
+QR_WORKERS = int(os.getenv("QR_WORKERS", 2))
+QR_FAST_RENDER = os.getenv("QR_FAST_RENDER", "1") == "1"
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", 256))
+
+# Telegram file_id cache (uploaded photos)
+FILE_ID_CACHE_SIZE = int(os.getenv("FILE_ID_CACHE_SIZE", 1024))
+
+# Payment status cache
+STATUS_CACHE_SIZE = int(os.getenv("STATUS_CACHE_SIZE", 10000))
+PENDING_STATUS_TTL = float(os.getenv("PENDING_STATUS_TTL", 5))  # seconds
+
+# Write-behind queue for payment writes
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "1") == "1"
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 100))
+WRITE_BATCH_DELAY = float(os.getenv("WRITE_BATCH_DELAY", 0.05))  # seconds
+WRITE_MAX_RETRIES = int(os.getenv("WRITE_MAX_RETRIES", 5))  # per failed write before it is logged and dropped
+
+# Revenue / conversion rollups and admin /stats
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()}  # Telegram user ids
+STATS_UTC_OFFSET = int(os.getenv("STATS_UTC_OFFSET", 330))  # minutes, hour/day buckets (IST)
+ROLLUP_FLUSH_DELAY = float(os.getenv("ROLLUP_FLUSH_DELAY", 1))  # seconds
+
+# Streaming payments export (export.py, admin download)
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")  # enables GET /admin/export on the webhook server
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))  # documents per cursor batch
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 5000))  # rows per write / checkpoint
+
+# Traffic capture for benchmarks/replay.py (off unless CAPTURE_DIR is set)
+CAPTURE_DIR = os.getenv("CAPTURE_DIR")
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", 64 * 1024 * 1024))  # per file, then rotate
+CAPTURE_MAX_FILES = int(os.getenv("CAPTURE_MAX_FILES", 20))  # oldest deleted beyond this
+CAPTURE_SALT = os.getenv("CAPTURE_SALT")  # key for pseudonymous user ids, random if unset
+CAPTURE_FLUSH_INTERVAL = float(os.getenv("CAPTURE_FLUSH_INTERVAL", 1))  # seconds records are buffered
+
+# Reconciliation sweeper for PENDING orders
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", 30))  # seconds, young orders
+RECONCILE_MAX_INTERVAL = float(os.getenv("RECONCILE_MAX_INTERVAL", 3600))
+RECONCILE_YOUNG_AGE = float(os.getenv("RECONCILE_YOUNG_AGE", 900))  # seconds
+RECONCILE_EXPIRE_AFTER = float(os.getenv("RECONCILE_EXPIRE_AFTER", 86400))
+RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", 500))
+RECONCILE_LIST_WINDOW = float(os.getenv("RECONCILE_LIST_WINDOW", 600))  # seconds per list-orders call
+
+# Webhook worker processes (share the port via SO_REUSEPORT)
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", 15))  # seconds
+
+# FSM State Storage (several workers need the shared mongo store)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "mongo" if WEB_WORKERS > 1 else "memory")  # memory / mongo
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", 900))  # seconds
+FSM_MAX_STATES = int(os.getenv("FSM_MAX_STATES", 100000))
+
+# Webhook update queue: ACK at once, handlers run in background workers
+UPDATE_QUEUE = os.getenv("UPDATE_QUEUE", "1") == "1"
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 16))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+UPDATE_DEDUPE_SIZE = int(os.getenv("UPDATE_DEDUPE_SIZE", 10000))
+
+# Outbound Telegram API and send scheduler (flood limits)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")  # Local Bot API server / test fake
+TELEGRAM_SEND_SCHEDULER = os.getenv("TELEGRAM_SEND_SCHEDULER", "1") == "1"
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))  # messages/second
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))  # messages/second per chat
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3))
+TELEGRAM_SEND_RETRIES = int(os.getenv("TELEGRAM_SEND_RETRIES", 3))  # RetryAfter retries
+
+# Prometheus metrics on the webhook server
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+METRICS_SHARE_INTERVAL = float(os.getenv("METRICS_SHARE_INTERVAL", 5))  # seconds, WEB_WORKERS > 1
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", EXPORT_TOKEN)  # enables the metrics scrape, defaults to EXPORT_TOKEN
+
+# Event loop lag and blocking-call detector
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "1") == "1"
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", 0.1))  # seconds
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", 0.5))  # seconds between lag probes
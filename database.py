@@ -1,48 +1,563 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime
+import time
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from bson import ObjectId, Int64
+from datetime import datetime, timedelta
 import config
+from metrics import MONGO_LATENCY, timed
+from rollups import PERIODS, bucket_id, bucket_start, backfill_pipeline
+
+EPOCH = datetime(1970, 1, 1)
+
+# /history ପାଇଁ ଦରକାରୀ fields (index ରେ ଅଛି, ତେଣୁ covered query)
+HISTORY_PROJECTION = {"_id": 1, "created_at": 1, "amount_paise": 1, "status": 1}
+
+# ଏହି ସ୍ଥିତି ଆଉ ବଦଳେ ନାହିଁ
+TERMINAL_STATUSES = ("SUCCESS",)
+# ନୂଆ order ର insert ଅଟକାଇପାରୁଥିବା unique keys (order_id ଛଡ଼ା)
+DEDUPE_KEYS = ("idempotency_key", "update_id")
+
+def conflicting_keys(error):
+    """Duplicate key error ର DEDUPE_KEYS (order_id duplicate ହେଲେ ଖାଲି)"""
+    pattern = error.get("keyPattern") or {}
+    message = error.get("errmsg", "")
+    return [key for key in DEDUPE_KEYS if key in pattern or (not pattern and key in message)]
+
+class StatusCache:
+    def __init__(self, max_size, pending_ttl):
+        """Payment status LRU cache"""
+        self.max_size = max_size
+        self.pending_ttl = pending_ttl
+        self.entries = OrderedDict()  # order_id -> (status, expires_at)
+    
+    def get(self, order_id):
+        """Cache ରୁ status ଆଣନ୍ତୁ (ନଥିଲେ None)"""
+        entry = self.entries.get(order_id)
+        if entry is None:
+            return None
+        status, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.entries[order_id]
+            return None
+        self.entries.move_to_end(order_id)
+        return status
+    
+    def set(self, order_id, status):
+        """Terminal status ସବୁଦିନ ପାଇଁ, ବାକି pending_ttl ପାଇଁ"""
+        if status in TERMINAL_STATUSES:
+            expires_at = None
+        else:
+            expires_at = time.monotonic() + self.pending_ttl
+        self.entries[order_id] = (status, expires_at)
+        self.entries.move_to_end(order_id)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+class WriteBehindQueue:
+    def __init__(self, database, max_batch, max_delay):
+        """
+        Payment inserts ଓ $set updates କୁ bulk_write batch ରେ ଲେଖନ୍ତୁ
+
+        Writes for the same order_id are merged while queued (an update
+        after an insert is folded into the inserted document, later $set
+        fields win), so each batch holds at most one op per order and can
+        be written unordered. Batches are written one after another by a
+        single flusher, which keeps per-order ordering across batches.
+        A batch being written still counts as pending, so readers wait for
+        it (flush takes the same lock) instead of missing it in Mongo.
+        """
+        self.database = database
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.inserts = {}  # order_id -> document
+        self.updates = {}  # order_id -> $set fields
+        # ଲେଖା ଚାଲିଥିବା batch (Mongo ରେ ଏପର୍ଯ୍ୟନ୍ତ ନାହିଁ)
+        self.inflight_inserts = {}
+        self.inflight_updates = set()
+        self.failures = Counter()  # order_id -> failed write attempts
+        # ପ୍ରତି batch ଶେଷରେ set (ଓ ବଦଳ) - wait_written() ପାଇଁ
+        self.batch_done = asyncio.Event()
+        self.has_work = asyncio.Event()
+        self.batch_full = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.task = None
+    
+    def __len__(self):
+        return len(self.inserts) + len(self.updates)
+    
+    def is_pending(self, order_id):
+        return (
+            order_id in self.inserts or order_id in self.updates
+            or order_id in self.inflight_inserts or order_id in self.inflight_updates
+        )
+    
+    def find_insert(self, field, value):
+        """Queue ବା ଲେଖା ଚାଲିଥିବା batch ରେ insert ଖୋଜନ୍ତୁ (flush ନକରି)"""
+        for inserts in (self.inserts, self.inflight_inserts):
+            for document in inserts.values():
+                if document.get(field) == value:
+                    # In-flight insert ପରେ queue ହୋଇଥିବା $set (ଯଥା status)
+                    return {**document, **self.updates.get(document["order_id"], {})}
+        return None
+    
+    async def wait_written(self, order_id):
+        """order_id ର queued writes Mongo ରେ ପହଞ୍ଚିବା (ବା drop) ପର୍ଯ୍ୟନ୍ତ ଅପେକ୍ଷା"""
+        while self.is_pending(order_id):
+            await self.batch_done.wait()
+    
+    def _wake(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        self.has_work.set()
+        if len(self) >= self.max_batch:
+            self.batch_full.set()
+    
+    def insert(self, document):
+        """Insert queue ରେ ରଖନ୍ତୁ"""
+        self.inserts[document["order_id"]] = document
+        self._wake()
+    
+    def update(self, order_id, fields):
+        """$set update queue ରେ ରଖନ୍ତୁ (queued insert ସହ merge)"""
+        if order_id in self.inserts:
+            self.inserts[order_id].update(fields)
+        else:
+            self.updates.setdefault(order_id, {}).update(fields)
+        self._wake()
+    
+    async def _run(self):
+        """Batch ଭରିବା ପର୍ଯ୍ୟନ୍ତ କିମ୍ବା max_delay ପରେ flush କରନ୍ତୁ"""
+        while True:
+            await self.has_work.wait()
+            try:
+                await asyncio.wait_for(self.batch_full.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+    
+    @timed(MONGO_LATENCY, "write_behind_flush")
+    async def flush(self):
+        """Queue ରେ ଥିବା ସବୁ writes ଲେଖନ୍ତୁ"""
+        from pymongo import InsertOne, UpdateOne
+        from pymongo.errors import BulkWriteError, PyMongoError
+        
+        async with self.lock:
+            while self.inserts or self.updates:
+                inserts, self.inserts = self.inserts, {}
+                updates, self.updates = self.updates, {}
+                self.inflight_inserts = inserts
+                self.inflight_updates = set(updates)
+                self.has_work.clear()
+                self.batch_full.clear()
+                
+                ops = [("insert", order_id) for order_id in inserts]
+                ops += [("update", order_id) for order_id in updates]
+                requests = [InsertOne(doc) for doc in inserts.values()]
+                requests += [
+                    UpdateOne({"order_id": order_id}, {"$set": fields})
+                    for order_id, fields in updates.items()
+                ]
+                try:
+                    await self.database.db.payments.bulk_write(requests, ordered=False)
+                except BulkWriteError as e:
+                    errors = e.details.get("writeErrors", [])
+                    self._count_inserted(inserts, errors, ops)
+                    if self._retry_failed(errors, ops, inserts, updates):
+                        await asyncio.sleep(self.max_delay)
+                        return
+                except PyMongoError as e:
+                    logging.error(f"Write-behind batch failed, requeueing: {e}")
+                    self._requeue(inserts, updates)
+                    await asyncio.sleep(self.max_delay)
+                    return
+                else:
+                    self._count_inserted(inserts)
+                finally:
+                    self.inflight_inserts = {}
+                    self.inflight_updates = set()
+                    self.batch_done.set()
+                    self.batch_done = asyncio.Event()
+                for order_id in inserts.keys() | updates.keys():
+                    self.failures.pop(order_id, None)
+    
+    def _count_inserted(self, inserts, errors=(), ops=None):
+        """Mongo ରେ ପହଞ୍ଚିଥିବା inserts ହିଁ rollups ରେ ଗଣନ୍ତୁ"""
+        failed = set()
+        for error in errors:
+            kind, order_id = ops[error["index"]]
+            # order_id duplicate: ପୂର୍ବ ଅନିଶ୍ଚିତ batch ରେ ଲେଖା ହୋଇସାରିଛି (ଗଣା ହୋଇନାହିଁ)
+            if kind == "insert" and not (
+                error.get("code") == 11000 and "order_id" in error.get("keyPattern", {})
+            ):
+                failed.add(order_id)
+        for order_id, document in inserts.items():
+            if order_id not in failed:
+                self.database._count_created(document)
+    
+    def _retry_failed(self, errors, ops, inserts, updates):
+        """
+        BulkWriteError ର ବିଫଳ writes ପୁଣି queue କରନ୍ତୁ; requeue ହେଲେ True
+
+        A duplicate order_id on an insert means the document is already
+        there. A duplicate idempotency_key or update_id means another order
+        owns the key, but this Razorpay order exists and its QR was sent,
+        so it is stored without that key (and logged) to stay reconcilable.
+        Anything else is requeued up to WRITE_MAX_RETRIES times and then
+        logged with the document, so no write disappears silently.
+        """
+        failed_inserts, failed_updates = {}, {}
+        for error in errors:
+            kind, order_id = ops[error["index"]]
+            if kind == "insert" and error.get("code") == 11000:
+                keys = conflicting_keys(error)
+                if not keys:
+                    logging.warning(f"Write-behind insert for {order_id} already exists: {error.get('errmsg')}")
+                    continue
+                logging.error(
+                    f"Payment {order_id} clashes with another order on {', '.join(keys)}, "
+                    f"storing it without them: {error.get('errmsg')}"
+                )
+                failed_inserts[order_id] = {
+                    field: value for field, value in inserts[order_id].items() if field not in keys
+                }
+                continue
+            self.failures[order_id] += 1
+            if self.failures[order_id] > config.WRITE_MAX_RETRIES:
+                self.failures.pop(order_id)
+                payload = inserts[order_id] if kind == "insert" else updates[order_id]
+                logging.error(
+                    f"Write-behind {kind} for {order_id} failed {config.WRITE_MAX_RETRIES + 1} "
+                    f"times, dropping it: {error.get('errmsg')} {payload}"
+                )
+                continue
+            if kind == "insert":
+                failed_inserts[order_id] = inserts[order_id]
+            else:
+                failed_updates[order_id] = updates[order_id]
+        if not (failed_inserts or failed_updates):
+            return False
+        logging.error(f"Write-behind batch had {len(errors)} errors, requeueing "
+                      f"{len(failed_inserts) + len(failed_updates)} writes")
+        self._requeue(failed_inserts, failed_updates)
+        return True
+    
+    def _requeue(self, inserts, updates):
+        """ବିଫଳ batch କୁ ନୂଆ writes ଆଗରେ ଫେରାନ୍ତୁ"""
+        for order_id, document in inserts.items():
+            document.update(self.updates.pop(order_id, {}))
+            self.inserts[order_id] = document
+        for order_id, fields in updates.items():
+            self.updates[order_id] = {**fields, **self.updates.get(order_id, {})}
+        self.has_work.set()
+    
+    async def close(self):
+        """Shutdown ରେ ବାକି writes flush କରନ୍ତୁ"""
+        # Flush first so an in-flight batch is never cancelled half way
+        await self.flush()
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+        if len(self):
+            logging.error(f"Write-behind closed with {len(self)} unwritten payment writes")
+
+class RollupBuffer:
+    def __init__(self, database, max_delay):
+        """
+        Rollup $inc deltas memory ରେ ଯୋଡି batch ରେ ଲେଖନ୍ତୁ
+
+        $inc is commutative, so deltas for the same hour/day bucket are
+        summed while buffered and written as one upsert per bucket every
+        `max_delay` seconds, instead of two extra writes per payment.
+        """
+        self.database = database
+        self.max_delay = max_delay
+        self.deltas = {}  # bucket _id -> (period, start, Counter)
+        self.has_work = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.task = None
+    
+    def add(self, when, **counts):
+        """`when` ର hour ଓ day bucket ରେ counts ଯୋଡନ୍ତୁ"""
+        for period in PERIODS:
+            key = bucket_id(period, when)
+            entry = self.deltas.get(key)
+            if entry is None:
+                entry = self.deltas[key] = (period, bucket_start(period, when), Counter())
+            entry[2].update(counts)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        self.has_work.set()
+    
+    async def _run(self):
+        while True:
+            await self.has_work.wait()
+            await asyncio.sleep(self.max_delay)
+            await self.flush()
+    
+    @timed(MONGO_LATENCY, "rollup_flush")
+    async def flush(self):
+        """Buffer ରେ ଥିବା deltas ଲେଖନ୍ତୁ"""
+        from pymongo import UpdateOne
+        from pymongo.errors import PyMongoError
+        
+        async with self.lock:
+            deltas, self.deltas = self.deltas, {}
+            self.has_work.clear()
+            if not deltas:
+                return
+            requests = [
+                UpdateOne(
+                    {"_id": key},
+                    {
+                        "$inc": {field: Int64(value) for field, value in counts.items()},
+                        "$setOnInsert": {"period": period, "start": start}
+                    },
+                    upsert=True
+                )
+                for key, (period, start, counts) in deltas.items()
+            ]
+            try:
+                await self.database.db.rollups.bulk_write(requests, ordered=False)
+            except PyMongoError as e:
+                logging.error(f"Rollup flush failed, keeping deltas: {e}")
+                for key, (period, start, counts) in deltas.items():
+                    entry = self.deltas.setdefault(key, (period, start, Counter()))
+                    entry[2].update(counts)
+                self.has_work.set()
+    
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+        if self.deltas:
+            logging.error(f"Rollups closed with {len(self.deltas)} unwritten buckets")
 
 class Database:
     def __init__(self):
         self.client = None
         self.db = None
+        self.status_cache = StatusCache(config.STATUS_CACHE_SIZE, config.PENDING_STATUS_TTL)
+        self.writes = None
+        if config.WRITE_BEHIND:
+            self.writes = WriteBehindQueue(self, config.WRITE_BATCH_SIZE, config.WRITE_BATCH_DELAY)
+        self.rollups = RollupBuffer(self, config.ROLLUP_FLUSH_DELAY)
     
     async def connect(self):
         """MongoDB ସହିତ ଯୋଗାଯୋଗ କରନ୍ତୁ"""
+        # motor/pymongo import ଏଠାରେ, ଯେପରି module import ଶୀଘ୍ର ହୁଏ
+        from motor.motor_asyncio import AsyncIOMotorClient
+        
+        # Client ପୃଷ୍ଠଭୂମିରେ connect କରେ, ଏଠାରେ କୌଣସି I/O ନାହିଁ
         self.client = AsyncIOMotorClient(config.MONGODB_URI)
         self.db = self.client[config.DATABASE_NAME]
-        
-        # Indexes ତିଆରି କରନ୍ତୁ
-        await self.db.payments.create_index("order_id", unique=True)
-        await self.db.payments.create_index("user_id")
         print("✅ MongoDB connected successfully!")
     
+    async def ensure_indexes(self):
+        """Indexes ତିଆରି କରନ୍ତୁ (ପୂର୍ବରୁ ଥିଲେ କିଛି ହୁଏ ନାହିଁ)"""
+        from pymongo.errors import OperationFailure
+        
+        # ପୁରୁଣା indexes: idempotency_key_1 (ସବୁ status ପାଇଁ unique),
+        # user_id_1 (user_history_paise ର prefix, ଅଦରକାରୀ)
+        for name in ("idempotency_key_1", "user_id_1"):
+            try:
+                await self.db.payments.drop_index(name)
+            except OperationFailure:
+                pass
+        await asyncio.gather(
+            self.db.payments.create_index("order_id", unique=True),
+            # /history: user_id ଦ୍ୱାରା, ନୂଆରୁ ପୁରୁଣା; amount/status ଥିବାରୁ covering
+            self.db.payments.create_index(
+                [("user_id", 1), ("created_at", -1), ("_id", -1), ("amount_paise", 1), ("status", 1)],
+                name="user_history_paise"
+            ),
+            # Reconciliation sweeper: due PENDING orders
+            self.db.payments.create_index(
+                [("status", 1), ("next_check_at", 1)],
+                name="pending_due"
+            ),
+            # ଏକା (user, amount, window) ପାଇଁ ଗୋଟିଏ ହିଁ PENDING order;
+            # paid/expired ପରେ ସେହି key ରେ ନୂଆ order ହୋଇପାରେ
+            self.db.payments.create_index(
+                "idempotency_key", unique=True, name="pending_idempotency_key",
+                partialFilterExpression={"idempotency_key": {"$exists": True}, "status": "PENDING"}
+            ),
+            self.db.payments.create_index(
+                "update_id", unique=True,
+                partialFilterExpression={"update_id": {"$exists": True}}
+            ),
+            self.db.order_keys.create_index("expires_at", expireAfterSeconds=0),
+            # FSM states ଆପେ expire ହେବ
+            self.db.fsm_states.create_index("expires_at", expireAfterSeconds=0)
+        )
+        print("✅ MongoDB indexes ready!")
+    
+    async def migrate_amounts(self):
+        """
+        ପୁରୁଣା float rupee `amount` କୁ int64 `amount_paise` ରେ ବଦଳାନ୍ତୁ (ଥରେ)
+
+        Runs as one server-side update; a marker in the meta collection
+        keeps later startups from scanning payments again.
+        """
+        from pymongo.errors import OperationFailure
+        
+        if await self.db.meta.find_one({"_id": "amount_paise"}):
+            return
+        result = await self.db.payments.update_many(
+            {"amount": {"$exists": True}},
+            [
+                {"$set": {"amount_paise": {"$toLong": {"$round": [{"$multiply": ["$amount", 100]}, 0]}}}},
+                {"$unset": "amount"}
+            ]
+        )
+        # ପୁରୁଣା float amount ଥିବା history index
+        try:
+            await self.db.payments.drop_index("user_history")
+        except OperationFailure:
+            pass
+        await self.db.meta.update_one(
+            {"_id": "amount_paise"},
+            {"$set": {"migrated": result.modified_count, "done_at": datetime.utcnow()}},
+            upsert=True
+        )
+        print(f"✅ Payment amounts in paise ({result.modified_count} migrated)")
+    
     async def close(self):
         """MongoDB ସହିତ ଯୋଗାଯୋଗ ବନ୍ଦ କରନ୍ତୁ"""
+        # ପ୍ରଥମେ queue ରେ ଥିବା writes ଲେଖନ୍ତୁ
+        if self.writes is not None:
+            await self.writes.close()
         if self.client:
+            await self.rollups.close()
             self.client.close()
             print("✅ MongoDB connection closed!")
     
-    async def create_payment(self, user_id, order_id, amount):
-        """ନୂଆ ପେମେଣ୍ଟ ତିଆରି କରନ୍ତୁ"""
+    @timed(MONGO_LATENCY)
+    async def create_payment(self, user_id, order_id, amount_paise, idempotency_key=None, update_id=None):
+        """ନୂଆ ପେମେଣ୍ଟ ତିଆରି କରନ୍ତୁ (amount ପଇସାରେ); document ଫେରାନ୍ତୁ"""
+        from pymongo.errors import DuplicateKeyError
+        
         payment = {
             "user_id": user_id,
             "order_id": order_id,
-            "amount": amount,
+            # ସବୁବେଳେ int64, ଯେପରି aggregation/range queries ଠିକ ଓ ଶୀଘ୍ର
+            "amount_paise": Int64(amount_paise),
             "status": "PENDING",
             "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "updated_at": datetime.utcnow(),
+            # Reconciliation sweeper ପାଇଁ
+            "next_check_at": datetime.utcnow() + timedelta(seconds=config.RECONCILE_INTERVAL),
+            "reconcile_attempts": 0
         }
+        if idempotency_key:
+            payment["idempotency_key"] = idempotency_key
+        if update_id is not None:
+            payment["update_id"] = update_id
         
-        result = await self.db.payments.insert_one(payment)
-        return result.inserted_id is not None
+        self.status_cache.set(order_id, "PENDING")
+        
+        if self.writes is not None:
+            # Batch ଲେଖା ହେଲେ rollups ରେ ଗଣାଯିବ
+            self.writes.insert(payment)
+            return dict(payment)
+        
+        while True:
+            try:
+                await self.db.payments.insert_one(payment)
+                break
+            except DuplicateKeyError as e:
+                keys = [key for key in conflicting_keys(e.details or {}) if key in payment]
+                if not keys:
+                    raise
+                # Razorpay order ପୂର୍ବରୁ ଅଛି - key ବିନା ରଖନ୍ତୁ, ଯେପରି reconcile ହୁଏ
+                logging.error(f"Payment {order_id} clashes with another order on {', '.join(keys)}, "
+                              f"storing it without them: {e}")
+                for key in keys:
+                    del payment[key]
+        self._count_created(payment)
+        return payment
+    
+    def _count_created(self, payment):
+        """ଲେଖା ହୋଇଥିବା ନୂଆ payment rollups ରେ ଯୋଡନ୍ତୁ"""
+        amount = payment["amount_paise"]
+        self.rollups.add(payment["created_at"], created=1, created_paise=amount)
+        self._count_transition({**payment, "status": None}, payment["status"], payment["updated_at"])
     
+    @timed(MONGO_LATENCY)
+    async def find_idempotent_payment(self, idempotency_key, update_id=None):
+        """
+        ଏହି key ର PENDING payment, ବା ଏହି update ର payment (ନଥିଲେ None)
+
+        A paid or expired order is never handed out again for a new
+        request; a redelivered update still gets its own payment, whatever
+        the status, so it is not answered twice.
+        """
+        if self.writes is not None:
+            payment = self.writes.find_insert("idempotency_key", idempotency_key)
+            if payment is not None and payment["status"] != "PENDING":
+                payment = None
+            if payment is None and update_id is not None:
+                payment = self.writes.find_insert("update_id", update_id)
+            if payment is not None:
+                return payment
+        
+        query = {"idempotency_key": idempotency_key, "status": "PENDING"}
+        if update_id is not None:
+            query = {"$or": [query, {"update_id": update_id}]}
+        return await self.db.payments.find_one(query)
+    
+    @timed(MONGO_LATENCY)
+    async def claim_order_key(self, idempotency_key, ttl):
+        """Order ତିଆରି କରିବା ଅଧିକାର ନିଅନ୍ତୁ; ଅନ୍ୟ process ନେଇଥିଲେ False"""
+        from pymongo.errors import DuplicateKeyError
+        
+        now = datetime.utcnow()
+        claim = {"_id": idempotency_key, "expires_at": now + timedelta(seconds=ttl)}
+        try:
+            await self.db.order_keys.insert_one(claim)
+            return True
+        except DuplicateKeyError:
+            pass
+        # TTL monitor ମିନିଟ୍ ପ୍ରତି ଚାଲେ - expire ହୋଇଥିବା claim ନିଜେ ହଟାନ୍ତୁ
+        removed = await self.db.order_keys.delete_one(
+            {"_id": idempotency_key, "expires_at": {"$lt": now}}
+        )
+        if not removed.deleted_count:
+            return False
+        try:
+            await self.db.order_keys.insert_one(claim)
+            return True
+        except DuplicateKeyError:
+            return False
+    
+    @timed(MONGO_LATENCY)
+    async def release_order_key(self, idempotency_key):
+        """Order ତିଆରି ବିଫଳ ହେଲେ, ବା payment ଲେଖା ହେବା ପରେ key ଛାଡ଼ନ୍ତୁ"""
+        await self.db.order_keys.delete_one({"_id": idempotency_key})
+    
+    async def wait_written(self, order_id):
+        """Write-behind ରେ ଥିବା payment ଅନ୍ୟ processes ଦେଖିବା ପର୍ଯ୍ୟନ୍ତ ଅପେକ୍ଷା"""
+        if self.writes is not None:
+            await self.writes.wait_written(order_id)
+    
+    @timed(MONGO_LATENCY)
     async def get_payment(self, order_id):
         """order_id ଦ୍ୱାରା ପେମେଣ୍ଟ ଖୋଜନ୍ତୁ"""
+        if self.writes is not None and self.writes.is_pending(order_id):
+            await self.writes.flush()
         return await self.db.payments.find_one({"order_id": order_id})
     
-    async def update_payment_status(self, order_id, status, payment_details=None):
-        """ପେମେଣ୍ଟ ସ୍ଥିତି ଅପଡେଟ୍ କରନ୍ତୁ"""
+    @timed(MONGO_LATENCY)
+    async def update_payment_status(self, order_id, status, payment_details=None, expected_status=None):
+        """ପେମେଣ୍ଟ ସ୍ଥିତି ଅପଡେଟ୍ କରନ୍ତୁ
+
+        The update returns the previous document, so the status change is
+        counted in the rollups exactly once, and only once it is written.
+        Status changes are never queued in write-behind for that reason; a
+        queued insert of the order is flushed first.
+        """
         update_data = {
             "status": status,
             "updated_at": datetime.utcnow()
@@ -51,22 +566,215 @@ class Database:
         if payment_details:
             update_data["payment_details"] = payment_details
         
-        result = await self.db.payments.update_one(
-            {"order_id": order_id},
-            {"$set": update_data}
+        # ପୂର୍ବ document ଦରକାର, ତେଣୁ queued writes ପ୍ରଥମେ ଲେଖନ୍ତୁ
+        if self.writes is not None and self.writes.is_pending(order_id):
+            await self.writes.flush()
+        
+        # expected_status ଦେଲେ କେବଳ ସେହି ସ୍ଥିତି(ଗୁଡ଼ିକ)ରୁ ବଦଳାନ୍ତୁ (duplicate webhook ପାଇଁ)
+        query = {"order_id": order_id}
+        if isinstance(expected_status, (list, tuple)):
+            query["status"] = {"$in": list(expected_status)}
+        elif expected_status:
+            query["status"] = expected_status
+        
+        previous = await self.db.payments.find_one_and_update(
+            query,
+            {"$set": update_data},
+            projection={"_id": 0, "status": 1, "amount_paise": 1, "created_at": 1}
         )
+        if previous is None:
+            return False
+        
+        self.status_cache.set(order_id, status)
+        self._count_transition(previous, status, update_data["updated_at"])
+        return True
+    
+    def _count_transition(self, previous, status, when):
+        """Status ବଦଳ rollups ରେ ଯୋଡନ୍ତୁ (previous status None = ନୂଆ payment)"""
+        amount = previous.get("amount_paise")
+        if previous["status"] == status or amount is None:
+            return
+        if previous["status"] == "PENDING":
+            self.rollups.add(previous["created_at"], pending=-1, pending_paise=-amount)
+        if status == "PENDING":
+            self.rollups.add(previous["created_at"], pending=1, pending_paise=amount)
+        if status == "SUCCESS":
+            self.rollups.add(when, success=1, success_paise=amount)
+    
+    @timed(MONGO_LATENCY)
+    async def set_qr_file_id(self, order_id, file_id):
+        """QR photo ର Telegram file_id ସେଭ୍ କରନ୍ତୁ"""
+        if self.writes is not None:
+            self.writes.update(order_id, {"qr_file_id": file_id})
+            return
         
-        return result.modified_count > 0
+        await self.db.payments.update_one(
+            {"order_id": order_id},
+            {"$set": {"qr_file_id": file_id}}
+        )
+    
+    @timed(MONGO_LATENCY)
+    async def get_payment_status(self, order_id):
+        """କେବଳ status ଆଣନ୍ତୁ (cache, ନହେଲେ projection query)"""
+        status = self.status_cache.get(order_id)
+        if status is None:
+            payment = await self.db.payments.find_one(
+                {"order_id": order_id},
+                {"status": 1, "_id": 0}
+            )
+            if payment is None:
+                return None
+            status = payment["status"]
+            self.status_cache.set(order_id, status)
+        return status
     
     async def is_payment_completed(self, order_id):
         """ପେମେଣ୍ଟ ସଫଳ ହୋଇଛି କି ନାହିଁ ଯାଞ୍ଚ କରନ୍ତୁ"""
-        payment = await self.get_payment(order_id)
-        return payment and payment["status"] == "SUCCESS"
+        return await self.get_payment_status(order_id) == "SUCCESS"
+    
+    @timed(MONGO_LATENCY)
+    async def get_due_payments(self, now, limit):
+        """Sweeper ପାଇଁ ଯାଞ୍ଚ ସମୟ ହୋଇଥିବା PENDING payments"""
+        # $not/$gt also matches older documents without next_check_at
+        cursor = self.db.payments.find(
+            {"status": "PENDING", "next_check_at": {"$not": {"$gt": now}}},
+            {"_id": 0, "order_id": 1, "user_id": 1, "amount_paise": 1,
+             "created_at": 1, "reconcile_attempts": 1}
+        ).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    @timed(MONGO_LATENCY)
+    async def reschedule_payments(self, schedule):
+        """(order_id, next_check_at, attempts) ତାଲିକା bulk ରେ ଲେଖନ୍ତୁ"""
+        from pymongo import UpdateOne
+        
+        if not schedule:
+            return
+        await self.db.payments.bulk_write([
+            UpdateOne(
+                {"order_id": order_id, "status": "PENDING"},
+                {"$set": {"next_check_at": next_check_at, "reconcile_attempts": attempts}}
+            )
+            for order_id, next_check_at, attempts in schedule
+        ], ordered=False)
     
-    async def get_user_payments(self, user_id):
-        """ବ୍ୟବହାରକାରୀଙ୍କ ସମସ୍ତ ପେମେଣ୍ଟ ଦେଖନ୍ତୁ"""
-        cursor = self.db.payments.find({"user_id": user_id}).sort("created_at", -1).limit(10)
-        return await cursor.to_list(length=10)
+    @timed(MONGO_LATENCY)
+    async def expire_payments(self, order_ids):
+        """ବହୁତ ପୁରୁଣା PENDING payments କୁ EXPIRED କରନ୍ତୁ"""
+        if not order_ids:
+            return 0
+        now = datetime.utcnow()
+        result = await self.db.payments.update_many(
+            {"order_id": {"$in": order_ids}, "status": "PENDING"},
+            {"$set": {"status": "EXPIRED", "updated_at": now, "expired_at": now}}
+        )
+        # expired_at ରୁ ଜାଣନ୍ତୁ କେଉଁଗୁଡ଼ିକ ଏହି update ରେ ବଦଳିଲା; କେବଳ ସେଗୁଡ଼ିକ
+        # cache ରେ EXPIRED (ସେହି ସମୟରେ webhook SUCCESS କରିଥିବା ନୁହେଁ)
+        if result.modified_count:
+            cursor = self.db.payments.find(
+                {"order_id": {"$in": order_ids}, "status": "EXPIRED", "expired_at": now},
+                {"_id": 0, "order_id": 1, "amount_paise": 1, "created_at": 1}
+            )
+            async for payment in cursor:
+                self.status_cache.set(payment["order_id"], "EXPIRED")
+                payment["status"] = "PENDING"
+                self._count_transition(payment, "EXPIRED", now)
+        return result.modified_count
+    
+    @timed(MONGO_LATENCY)
+    async def get_user_payments(self, user_id, limit=10, before=None):
+        """ବ୍ୟବହାରକାରୀଙ୍କ ପେମେଣ୍ଟ ଦେଖନ୍ତୁ (ନୂଆରୁ ପୁରୁଣା)
+
+        `before` is a (created_at, _id) keyset cursor from
+        parse_history_cursor(); only older payments are returned, so every
+        page is an index range scan no matter how deep it is.
+        """
+        query = {"user_id": user_id}
+        if before:
+            created_at, last_id = before
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": last_id}}
+            ]
+        
+        cursor = (
+            self.db.payments.find(query, HISTORY_PROJECTION)
+            .sort([("created_at", -1), ("_id", -1)])
+            .limit(limit)
+        )
+        return await cursor.to_list(length=limit)
+    
+    async def stream_payments(self, query, projection, batch_size):
+        """Payments _id କ୍ରମରେ ଗୋଟି ଗୋଟି ଦିଅନ୍ତୁ (to_list ନାହିଁ, memory ସ୍ଥିର)"""
+        if self.writes is not None:
+            await self.writes.flush()
+        cursor = (
+            self.db.payments.find(query, projection)
+            .sort("_id", 1)
+            .batch_size(batch_size)
+        )
+        async for payment in cursor:
+            yield payment
+    
+    @timed(MONGO_LATENCY)
+    async def get_rollups(self, bucket_ids):
+        """Rollup documents, _id ଦ୍ୱାରା (ପ୍ରଥମେ buffer flush)"""
+        await self.rollups.flush()
+        cursor = self.db.rollups.find({"_id": {"$in": list(bucket_ids)}})
+        return {rollup["_id"]: rollup async for rollup in cursor}
+    
+    async def backfill_rollups(self):
+        """ପୁରୁଣା payments ରୁ rollups ପୁଣି ଗଣନା କରନ୍ତୁ (ଥରେ ଚଲାନ୍ତୁ)"""
+        await self.rollups.flush()
+        await self.db.payments.aggregate(backfill_pipeline(), allowDiskUse=True).to_list(length=None)
+        return await self.db.rollups.count_documents({})
+    
+    @timed(MONGO_LATENCY)
+    async def acquire_lease(self, name, holder, ttl):
+        """Lease ନିଅନ୍ତୁ ବା ନବୀକରଣ କରନ୍ତୁ; ମିଳିଲେ True
+
+        Matches the lease only if `holder` already owns it or it has
+        expired; otherwise the upsert collides on _id and the lease stays
+        with its current holder.
+        """
+        from pymongo.errors import DuplicateKeyError
+        
+        now = datetime.utcnow()
+        try:
+            await self.db.leases.update_one(
+                {"_id": name, "$or": [{"holder": holder}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+    
+    @timed(MONGO_LATENCY)
+    async def release_lease(self, name, holder):
+        """ନିଜ lease ଛାଡ଼ନ୍ତୁ (ଅନ୍ୟ worker ତୁରନ୍ତ ନେଇପାରିବ)"""
+        await self.db.leases.delete_one({"_id": name, "holder": holder})
+
+def history_cursor(payment):
+    """Payment ରୁ callback_data ପାଇଁ ଛୋଟ keyset cursor"""
+    millis = (payment["created_at"] - EPOCH) // timedelta(milliseconds=1)
+    return f"{millis}_{payment['_id']}"
+
+def parse_history_cursor(cursor):
+    """history_cursor() ର ଓଲଟା: (created_at, _id); ଭୁଲ cursor ରେ ValueError"""
+    millis, last_id = cursor.split("_")
+    # SQLite backend ରେ _id ଏକ integer
+    if len(last_id) == 24:
+        if not ObjectId.is_valid(last_id):
+            raise ValueError(f"invalid history cursor: {cursor!r}")
+        last_id = ObjectId(last_id)
+    else:
+        last_id = int(last_id)
+    return EPOCH + timedelta(milliseconds=int(millis)), last_id
 
 # Database object
-db = Database()
+if config.DATABASE_BACKEND == "sqlite":
+    from sqlite_database import SQLiteDatabase
+    db = SQLiteDatabase(config.SQLITE_PATH)
+else:
+    db = Database()
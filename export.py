@@ -0,0 +1,191 @@
+"""
+Accounting ପାଇଁ payments CSV/JSONL export (streaming)
+
+    python export.py -o payments.csv.gz --gzip --since 2024-05-01 --until 2024-05-02
+    python export.py -o payments.csv.gz --gzip --resume
+
+Documents stream from a Motor cursor in _id order through a generator
+pipeline (rows -> encoded chunks -> gzip members -> file), so memory
+stays flat however big the collection is. After every chunk the file is
+fsynced and "<output>.checkpoint" records the last _id and byte offset;
+--resume truncates the file to that offset and carries on after that
+_id, so an interrupted export never duplicates or skips rows.
+"""
+import os
+import io
+import csv
+import json
+import zlib
+import asyncio
+import argparse
+from datetime import datetime
+from bson import ObjectId
+import config
+from money import format_amount
+from rollups import OFFSET
+
+COLUMNS = (
+    "_id", "order_id", "user_id", "amount_paise", "amount", "status",
+    "created_at", "updated_at", "payment_id", "method"
+)
+PROJECTION = {
+    "_id": 1, "order_id": 1, "user_id": 1, "amount_paise": 1, "status": 1,
+    "created_at": 1, "updated_at": 1, "payment_details.id": 1, "payment_details.method": 1
+}
+FORMATS = {"csv": ("text/csv", ".csv"), "jsonl": ("application/x-ndjson", ".jsonl")}
+
+def parse_day(text):
+    """"2024-05-01" (STATS_UTC_OFFSET local day) -> UTC datetime"""
+    return datetime.strptime(text, "%Y-%m-%d") - OFFSET
+
+def export_query(since=None, until=None, after=None):
+    """
+    _id range query (ObjectId ରେ ସମୟ ଥାଏ, ତେଣୁ କେବଳ _id index)
+
+    `since`/`until` are UTC datetimes, `after` is the last exported _id.
+    """
+    bounds = {}
+    if since:
+        bounds["$gte"] = ObjectId.from_datetime(since)
+    if after:
+        # SQLite backend ରେ _id ଏକ integer
+        bounds["$gt"] = ObjectId(after) if len(str(after)) == 24 else int(after)
+        bounds.pop("$gte", None)
+    if until:
+        bounds["$lt"] = ObjectId.from_datetime(until)
+    return {"_id": bounds} if bounds else {}
+
+def flatten(payment):
+    """Payment document -> export row (COLUMNS କ୍ରମରେ)"""
+    details = payment.get("payment_details") or {}
+    amount = payment.get("amount_paise")
+    return {
+        "_id": str(payment["_id"]),
+        "order_id": payment.get("order_id"),
+        "user_id": payment.get("user_id"),
+        "amount_paise": amount,
+        "amount": format_amount(amount, fixed=True) if amount is not None else None,
+        "status": payment.get("status"),
+        "created_at": payment["created_at"].isoformat() if payment.get("created_at") else None,
+        "updated_at": payment["updated_at"].isoformat() if payment.get("updated_at") else None,
+        "payment_id": details.get("id"),
+        "method": details.get("method"),
+    }
+
+async def encode(payments, fmt, header, chunk_rows):
+    """Payments -> (bytes chunk, rows, last _id); ପ୍ରତି chunk ରେ chunk_rows ଧାଡ଼ି"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, COLUMNS) if fmt == "csv" else None
+    if writer and header:
+        writer.writeheader()
+    rows = 0
+    last_id = None
+    async for payment in payments:
+        row = flatten(payment)
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+        last_id = row["_id"]
+        rows += 1
+        if rows == chunk_rows:
+            yield buffer.getvalue().encode(), rows, last_id
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode(), rows, last_id
+
+async def gzip_members(chunks):
+    """ପ୍ରତି chunk ଗୋଟିଏ ପୂର୍ଣ୍ଣ gzip member (concatenated members ବୈଧ gzip)"""
+    async for data, rows, last_id in chunks:
+        compressor = zlib.compressobj(wbits=31)
+        yield compressor.compress(data) + compressor.flush(), rows, last_id
+
+def export_stream(database, fmt="csv", compress=False, header=True, since=None, until=None, after=None):
+    """Generator pipeline: (bytes, rows, last _id) chunks"""
+    payments = database.stream_payments(
+        export_query(since, until, after), PROJECTION, config.EXPORT_BATCH_SIZE
+    )
+    chunks = encode(payments, fmt, header, config.EXPORT_CHUNK_ROWS)
+    return gzip_members(chunks) if compress else chunks
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_checkpoint(path, checkpoint):
+    """Atomic: tmp file ଲେଖି rename"""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+async def export_to_file(database, output, fmt="csv", compress=False, since=None, until=None, resume=False):
+    """File ରେ export କରନ୍ତୁ; ଲେଖାଯାଇଥିବା rows ସଂଖ୍ୟା ଫେରାନ୍ତୁ"""
+    checkpoint_path = output + ".checkpoint"
+    checkpoint = read_checkpoint(checkpoint_path) if resume else None
+    if checkpoint:
+        after, rows = checkpoint["last_id"], checkpoint["rows"]
+        since, until = checkpoint["since"], checkpoint["until"]
+        fmt, compress = checkpoint["format"], checkpoint["gzip"]
+        since = since and datetime.fromisoformat(since)
+        until = until and datetime.fromisoformat(until)
+        f = open(output, "r+b")
+        # ଶେଷ checkpoint ପରେ ଲେଖାଯାଇଥିବା ଅଧା chunk ବାଦ
+        f.truncate(checkpoint["offset"])
+        f.seek(checkpoint["offset"])
+    else:
+        after, rows = None, 0
+        f = open(output, "wb")
+
+    with f:
+        chunks = export_stream(database, fmt, compress, header=checkpoint is None,
+                               since=since, until=until, after=after)
+        async for data, count, last_id in chunks:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            rows += count
+            write_checkpoint(checkpoint_path, {
+                "last_id": last_id,
+                "offset": f.tell(),
+                "rows": rows,
+                "since": since and since.isoformat(),
+                "until": until and until.isoformat(),
+                "format": fmt,
+                "gzip": compress,
+            })
+    return rows
+
+async def main():
+    from database import db
+
+    parser = argparse.ArgumentParser(description="Stream payments to CSV/JSONL for accounting")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--since", type=parse_day, help="first day, YYYY-MM-DD (local)")
+    parser.add_argument("--until", type=parse_day, help="day after the last, YYYY-MM-DD (local)")
+    parser.add_argument("--resume", action="store_true", help="continue from <output>.checkpoint")
+    args = parser.parse_args()
+
+    await db.connect()
+    try:
+        rows = await export_to_file(
+            db, args.output, args.format, args.gzip, args.since, args.until, args.resume
+        )
+    finally:
+        await db.close()
+    # ସଫଳ ହେଲେ checkpoint ଆଉ ଦରକାର ନାହିଁ
+    if os.path.exists(args.output + ".checkpoint"):
+        os.remove(args.output + ".checkpoint")
+    print(f"✅ Exported {rows} payments to {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import os
+import socket
+import asyncio
+import logging
+
+class LeaderElection:
+    """
+    Worker processes ମଧ୍ୟରୁ ଗୋଟିଏ leader ବାଛନ୍ତୁ
+
+    Every worker keeps trying to take or renew a Mongo lease every third
+    of its TTL. The holder runs on_elected() (set_webhook, background
+    jobs) in its own task, so the lease keeps being renewed however long
+    that takes; if a renewal fails or the lease is lost it cancels that
+    task if still running and runs on_demoted().
+    When the leader dies its lease expires and another worker takes over
+    within one TTL.
+    """
+
+    def __init__(self, database, name, ttl, on_elected, on_demoted):
+        self.database = database
+        self.name = name
+        self.ttl = ttl
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self.task = None
+        self.elected_task = None  # ଚାଲୁଥିବା on_elected()
+
+    def start(self):
+        """Election task ଆରମ୍ଭ କରନ୍ତୁ"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def claim(self):
+        """Lease ବିନା leader ହୁଅନ୍ତୁ (ଗୋଟିଏ process ଥିଲେ)"""
+        self.is_leader = True
+        await self.on_elected()
+
+    async def stop(self):
+        """Election ବନ୍ଦ କରନ୍ତୁ ଏବଂ leader ଥିଲେ lease ଛାଡ଼ନ୍ତୁ"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+            if self.is_leader:
+                try:
+                    await self.database.release_lease(self.name, self.holder)
+                except Exception as e:
+                    logging.error(f"Could not release {self.name} lease: {e}")
+        if self.is_leader:
+            await self._demote()
+
+    async def _elected(self):
+        try:
+            await self.on_elected()
+        except Exception as e:
+            logging.error(f"{self.name} leader startup failed: {e}")
+
+    async def _demote(self):
+        self.is_leader = False
+        if self.elected_task is not None:
+            self.elected_task.cancel()
+            await asyncio.gather(self.elected_task, return_exceptions=True)
+            self.elected_task = None
+        await self.on_demoted()
+
+    async def _run(self):
+        while True:
+            try:
+                acquired = await self.database.acquire_lease(self.name, self.holder, self.ttl)
+            except Exception as e:
+                # Renew ନ ହେଲେ lease expire ହୋଇପାରେ; leader ଭାବରେ ରହନ୍ତୁ ନାହିଁ
+                logging.error(f"Leader lease check failed: {e}")
+                acquired = False
+
+            if acquired and not self.is_leader:
+                logging.info(f"{self.holder} elected {self.name} leader")
+                self.is_leader = True
+                # Renewal ଚାଲୁ ରହୁ (index builds, migration ସମୟ ନେଇପାରେ)
+                self.elected_task = asyncio.create_task(self._elected())
+            elif not acquired and self.is_leader:
+                logging.warning(f"{self.holder} lost {self.name} leadership")
+                await self._demote()
+
+            await asyncio.sleep(self.ttl / 3)
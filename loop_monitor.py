@@ -0,0 +1,160 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from contextvars import ContextVar
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from metrics import HANDLER_BUSY, HANDLER_AWAITED, LOOP_LAG, SLOW_CALLBACKS
+
+# Handler ର task (ଓ ସେଥିରୁ ତିଆରି tasks) loop ଉପରେ ଚାଲିଥିବା ସମୟ, [seconds]
+_busy = ContextVar("loop_busy", default=None)
+
+class LoopMonitor:
+    def __init__(self, threshold, interval):
+        """Event loop lag ଓ `threshold` ରୁ ଅଧିକ blocking callbacks (stack ସହ) ଧରନ୍ତୁ"""
+        self.threshold = threshold
+        self.interval = interval
+        self.loop = None
+        self.thread_id = None
+        self.running = None  # (handle, start) of the callback on the loop now
+        self.max_lag = 0.0
+        self.slow_callbacks = 0
+        self._original_run = None
+        self._task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """ଚାଲୁଥିବା loop ରେ monitor ଆରମ୍ଭ କରନ୍ତୁ"""
+        if self._task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self._original_run = asyncio.Handle._run
+        asyncio.Handle._run = self._wrap(self._original_run)
+        self._stopped.clear()
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        self._task = asyncio.create_task(self._probe())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._stopped.set()
+        asyncio.Handle._run = self._original_run
+        logging.info(
+            f"Event loop monitor: max lag {self.max_lag * 1000:.0f} ms, "
+            f"{self.slow_callbacks} slow callbacks"
+        )
+
+    def _wrap(self, run):
+        monitor = self
+        loop = self.loop
+        threshold = self.threshold
+
+        def _run(handle):
+            # ଅନ୍ୟ thread ର loops (test fakes) କୁ ଛାଡନ୍ତୁ
+            if handle._loop is not loop:
+                return run(handle)
+            start = time.perf_counter()
+            monitor.running = (handle, start)
+            try:
+                run(handle)
+            finally:
+                monitor.running = None
+                elapsed = time.perf_counter() - start
+                busy = handle._context.get(_busy)
+                if busy is not None:
+                    busy[0] += elapsed
+                if elapsed >= threshold:
+                    monitor.slow_callbacks += 1
+                    SLOW_CALLBACKS.inc()
+                    logging.warning(f"Event loop blocked for {elapsed * 1000:.0f} ms by {handle}")
+        return _run
+
+    def _watch(self):
+        """Watchdog thread: ଅଟକି ରହିଥିବା callback ର stack log କରନ୍ତୁ"""
+        sampled = None
+        while not self._stopped.wait(self.threshold / 2):
+            running = self.running
+            if running is None or running is sampled:
+                continue
+            handle, start = running
+            blocked = time.perf_counter() - start
+            if blocked < self.threshold:
+                continue
+            sampled = running
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            # Loop ର ନିଜ frames (run_forever, Handle._run) ବାଦ ଦିଅନ୍ତୁ
+            for i, entry in enumerate(stack):
+                if entry.filename == asyncio.events.__file__ and entry.name == "_run":
+                    stack = stack[i + 1:]
+                    break
+            stack = "".join(traceback.format_list(stack))
+            logging.warning(
+                f"Event loop blocked for {blocked * 1000:.0f} ms so far in {handle}, "
+                f"loop thread stack:\n{stack}"
+            )
+
+    async def _probe(self):
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, self.loop.time() - start - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Handler ର wall time କୁ busy (loop ଉପରେ) ଓ awaited ରେ ଭାଗ କରନ୍ତୁ"""
+
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+
+    def _start(self, data):
+        # SkipHandler ପରେ ପରବର୍ତ୍ତୀ handler ପାଇଁ process ପୁଣି ଡକାଯାଏ
+        if "_profile" in data:
+            return
+        busy = [0.0]
+        name = getattr(current_handler.get(), "__name__", "unknown")
+        data["_profile"] = (name, time.perf_counter(), busy, _busy.set(busy))
+
+    def _finish(self, data):
+        profile = data.pop("_profile", None)
+        if profile is None:
+            return
+        name, start, busy, token = profile
+        # StateRouter ଯେଉଁ handler ବାଛିଲା
+        name = getattr(data.get("handler"), "__name__", name)
+        _busy.reset(token)
+        wall = time.perf_counter() - start
+        busy = min(busy[0], wall)
+        HANDLER_BUSY.observe(busy, name)
+        HANDLER_AWAITED.observe(wall - busy, name)
+        if busy >= self.threshold:
+            logging.warning(
+                f"Handler {name} ran on the event loop for {busy * 1000:.0f} ms "
+                f"of {wall * 1000:.0f} ms"
+            )
+
+    async def on_process_message(self, message, data):
+        self._start(data)
+
+    async def on_post_process_message(self, message, results, data):
+        self._finish(data)
+
+    async def on_process_callback_query(self, callback_query, data):
+        self._start(data)
+
+    async def on_post_process_callback_query(self, callback_query, results, data):
+        self._finish(data)
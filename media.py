@@ -0,0 +1,70 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from aiogram.utils.exceptions import BadRequest
+import config
+
+class FileIdCache:
+    def __init__(self, max_size):
+        """Telegram file_id LRU cache (order_id / content hash key)"""
+        self.max_size = max_size
+        self.entries = OrderedDict()
+    
+    def get(self, key):
+        """Cache ରୁ file_id ଆଣନ୍ତୁ"""
+        file_id = self.entries.get(key)
+        if file_id is not None:
+            self.entries.move_to_end(key)
+        return file_id
+    
+    def set(self, key, file_id):
+        """file_id ସେଭ୍ କରନ୍ତୁ"""
+        self.entries[key] = file_id
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def forget(self, *keys):
+        """ଅଚଳ file_id ହଟାନ୍ତୁ"""
+        for key in keys:
+            self.entries.pop(key, None)
+
+def content_key(data):
+    """Photo bytes ର hash key"""
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+async def send_photo_cached(bot, chat_id, photo, cache_key=None, file_id=None, **kwargs):
+    """
+    ପ୍ରଥମ ଥର upload କରନ୍ତୁ, ପରେ Telegram file_id ପଠାନ୍ତୁ
+
+    `photo` is a BytesIO; `cache_key` is an extra key such as an order_id.
+    `file_id` is one stored earlier (payment qr_file_id), tried first so
+    a restarted or other worker does not upload again. Returns the sent
+    Message; its `photo[-1].file_id` is what got cached.
+    """
+    digest = content_key(photo.getvalue())
+    file_id = (
+        file_id
+        or (cache_key and file_id_cache.get(cache_key))
+        or file_id_cache.get(digest)
+    )
+    
+    if file_id:
+        try:
+            return await bot.send_photo(chat_id, file_id, **kwargs)
+        except BadRequest as e:
+            # file_id ଅଚଳ (ଯଥା: bot token ବଦଳିଛି) - ପୁଣି upload କରନ୍ତୁ
+            logging.warning(f"Cached file_id rejected, re-uploading: {e}")
+            file_id_cache.forget(cache_key, digest)
+    
+    photo.seek(0)
+    message = await bot.send_photo(chat_id, photo, **kwargs)
+    
+    file_id = message.photo[-1].file_id
+    file_id_cache.set(digest, file_id)
+    if cache_key:
+        file_id_cache.set(cache_key, file_id)
+    return message
+
+# File id cache object
+file_id_cache = FileIdCache(config.FILE_ID_CACHE_SIZE)
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import functools
+from bisect import bisect_left
+import config
+
+# METRICS_ENABLED=0: timed() leaves functions undecorated and recording is a no-op
+ENABLED = config.METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+registry = []
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        """Prometheus counter (label values -> total)"""
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+        registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        if ENABLED:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        return self.values
+
+    def render(self, sources):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for extra, samples in sources:
+            for labels, value in samples.items():
+                yield f"{self.name}{_labels(self.labelnames, labels, extra)} {value}"
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Prometheus histogram (lock ନାହିଁ, buckets render() ରେ cumulative)"""
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        registry.append(self)
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        return self.series
+
+    def render(self, sources):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for extra, samples in sources:
+            for labels, series in samples.items():
+                total = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series):
+                    total += count
+                    yield f"{self.name}_bucket{_labels(self.labelnames, labels, [*extra, ('le', bound)])} {total}"
+                yield f"{self.name}_sum{_labels(self.labelnames, labels, extra)} {series[-1]}"
+                yield f"{self.name}_count{_labels(self.labelnames, labels, extra)} {total}"
+
+class Gauge:
+    def __init__(self, name, help, callback, labelnames=(), kind="gauge"):
+        """Scrape ସମୟରେ `callback()` ରୁ value (number କିମ୍ବା {labels: number})"""
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = labelnames
+        self.kind = kind
+        registry.append(self)
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return values
+
+    def render(self, sources):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for extra, samples in sources:
+            for labels, value in samples.items():
+                yield f"{self.name}{_labels(self.labelnames, labels, extra)} {value}"
+
+def timed(histogram, *labels):
+    """Async function ର latency histogram ରେ ରଖନ୍ତୁ (label ନଦେଲେ function name)"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        names = labels or (func.__name__,)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *names)
+        return wrapper
+    return decorator
+
+def snapshot():
+    """ଏହି process ର ସବୁ metric values (JSON ଯୋଗ୍ୟ)"""
+    return {
+        metric.name: [[list(labels), value] for labels, value in metric.samples().items()]
+        for metric in registry
+    }
+
+def render(snapshots=None):
+    """ସବୁ metrics Prometheus text format ରେ; `snapshots` ({pid: snapshot()}) ଦେଲେ pid label ସହ"""
+    lines = []
+    for metric in registry:
+        if snapshots is None:
+            sources = [((), metric.samples())]
+        else:
+            sources = [
+                ([("pid", pid)], {tuple(labels): value for labels, value in snapshot.get(metric.name, [])})
+                for pid, snapshot in snapshots.items()
+            ]
+        lines.extend(metric.render(sources))
+    return "\n".join(lines) + "\n"
+
+class SharedMetrics:
+    def __init__(self, directory, interval):
+        """Pre-fork workers ର metrics ଗୋଟିଏ scrape ରେ (<directory>/<pid>.json, `interval` ପୁରୁଣା ପର୍ଯ୍ୟନ୍ତ)"""
+        self.directory = directory
+        self.interval = interval
+        self.task = None
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{os.getpid()}.json")
+
+    def write(self):
+        # ପୂରା file ଏକାଥରେ ଦେଖାଯାଉ (os.replace)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot(), f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def render(self):
+        self.write()
+        snapshots = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots[name[:-5]] = json.load(f)
+            except (OSError, ValueError):
+                # ବନ୍ଦ ହେଉଥିବା worker
+                continue
+        return render(snapshots)
+
+    async def _run(self):
+        while True:
+            try:
+                self.write()
+            except OSError as e:
+                logging.warning(f"Could not write worker metrics: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_seconds", "Telegram handler latency", ("handler",)
+)
+RAZORPAY_LATENCY = Histogram(
+    "razorpay_request_seconds", "Razorpay API call latency, retries included", ("endpoint",)
+)
+MONGO_LATENCY = Histogram(
+    "mongo_op_seconds", "Database method latency", ("method",)
+)
+QR_RENDER_LATENCY = Histogram(
+    "qr_render_seconds", "QR code render time, executor queueing included"
+)
+SEND_LATENCY = Histogram(
+    "telegram_send_seconds", "Outbound Telegram send latency, scheduling included", ("priority",)
+)
+ORDERS_CREATED = Counter(
+    "orders_created_total", "Razorpay orders created"
+)
+ORDERS_CONFIRMED = Counter(
+    "orders_confirmed_total", "Payments moved to SUCCESS", ("source",)
+)
+HANDLER_BUSY = Histogram(
+    "bot_handler_busy_seconds", "Time a handler spent running on the event loop", ("handler",)
+)
+HANDLER_AWAITED = Histogram(
+    "bot_handler_awaited_seconds", "Time a handler spent awaiting I/O", ("handler",)
+)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late a periodic event loop probe woke up"
+)
+SLOW_CALLBACKS = Counter(
+    "event_loop_slow_callbacks_total", "Event loop callbacks that ran longer than LOOP_BLOCK_THRESHOLD"
+)
@@ -0,0 +1,30 @@
+import re
+import config
+
+# "499", "19.99", "₹ 1,000.50", "Rs. 250" (ସର୍ବାଧିକ 2 ଦଶମିକ ଅଙ୍କ)
+AMOUNT_RE = re.compile(r"(?:₹|rs\.?|inr)?\s*(\d{1,9})(?:\.(\d{1,2}))?", re.IGNORECASE)
+
+def parse_amount(text):
+    """
+    User ଲେଖିଥିବା rupee amount କୁ paise (int) ରେ ବଦଳାନ୍ତୁ
+
+    Exact: "19.99" is 1999, never a float. Raises ValueError for anything
+    that is not a plain non-negative amount with at most two decimals.
+    """
+    match = AMOUNT_RE.fullmatch(text.strip().replace(",", ""))
+    if match is None:
+        raise ValueError(f"Invalid amount: {text!r}")
+    rupees, paise = match.groups()
+    return int(rupees) * 100 + int((paise or "0").ljust(2, "0"))
+
+def to_paise(rupees):
+    """Config ର rupee value କୁ paise"""
+    return round(rupees * 100)
+
+def format_amount(paise, fixed=False):
+    """Paise କୁ rupee text: 49900 -> "499" (fixed: "499.00"), 1999 -> "19.99" """
+    rupees, paise = divmod(int(paise), 100)
+    return f"{rupees}.{paise:02d}" if paise or fixed else str(rupees)
+
+MIN_PAISE = to_paise(config.MIN_AMOUNT)
+MAX_PAISE = to_paise(config.MAX_AMOUNT)
@@ -0,0 +1,120 @@
+import time
+import asyncio
+import logging
+import config
+from database import db
+from payments import payment_processor
+from metrics import ORDERS_CREATED
+
+def idempotency_key(user_id, amount_paise, now=None):
+    """(user_id, amount, time window) ରୁ order key (Razorpay receipt ମଧ୍ୟ)"""
+    window = int((now or time.time()) // config.ORDER_DEDUPE_WINDOW)
+    return f"u{user_id}-{amount_paise}-{window}"
+
+def create_budget():
+    """
+    ଗୋଟିଏ create_order ର ସର୍ବାଧିକ ସମୟ (seconds), payment ଲେଖା ପର୍ଯ୍ୟନ୍ତ
+
+    Every attempt may wait out the breaker queue (RAZORPAY_QUEUE_TIMEOUT),
+    an empty token bucket and the request timeout, with up to
+    RAZORPAY_BACKOFF_MAX between attempts; then the write-behind batch.
+    Order key claims last this long and other processes wait this long.
+    """
+    attempt = config.RAZORPAY_QUEUE_TIMEOUT + config.RAZORPAY_TIMEOUT
+    if config.RAZORPAY_RATE_LIMIT > 0:
+        attempt += config.RAZORPAY_BURST / (config.RAZORPAY_RATE_LIMIT / max(1, config.WEB_WORKERS))
+    retries = config.RAZORPAY_MAX_RETRIES
+    return (retries + 1) * attempt + retries * config.RAZORPAY_BACKOFF_MAX + config.WRITE_BATCH_DELAY + 1
+
+class OrderCreator:
+    """
+    ଏକା order ଦୁଇଥର ତିଆରି ନକରନ୍ତୁ
+
+    A double-sent amount or a redelivered update reuses the order already
+    made for the same (user_id, amount, ORDER_DEDUPE_WINDOW) key or
+    update_id, while that order is still PENDING. Concurrent duplicates
+    in this process wait on the first create (single-flight); across
+    processes an order_keys claim decides who calls Razorpay, and the
+    others wait for that payment to appear. The claim is released once
+    the payment is written, so a paid order's key can be used again.
+    """
+
+    def __init__(self, database, processor):
+        self.database = database
+        self.processor = processor
+        self.inflight = {}  # key -> create task
+        self.releases = set()  # ଲେଖା ପରେ claim ଛାଡ଼ୁଥିବା tasks
+
+    async def create(self, user_id, amount_paise, update_id=None):
+        """
+        (payment, created) ଫେରାନ୍ତୁ
+
+        `created` is True only for the caller that made a new Razorpay
+        order; everyone else gets the existing payment document.
+        """
+        key = idempotency_key(user_id, amount_paise)
+        task = self.inflight.get(key)
+        owner = task is None
+        if owner:
+            task = asyncio.ensure_future(self._create(key, user_id, amount_paise, update_id))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+
+        # ଜଣେ caller cancel ହେଲେ ମଧ୍ୟ ଅନ୍ୟମାନଙ୍କ ପାଇଁ create ଚାଲୁ ରହେ
+        payment, created = await asyncio.shield(task)
+        return payment, created and owner
+
+    async def _create(self, key, user_id, amount_paise, update_id):
+        existing = await self.database.find_idempotent_payment(key, update_id)
+        if existing:
+            return existing, False
+
+        if not await self.database.claim_order_key(key, create_budget()):
+            existing = await self._wait_for(key)
+            if existing:
+                return existing, False
+
+        try:
+            order = await self.processor.create_order(amount_paise, receipt=key)
+        except Exception:
+            await self.database.release_order_key(key)
+            raise
+
+        payment = await self.database.create_payment(
+            user_id, order['id'], amount_paise, idempotency_key=key, update_id=update_id
+        )
+        ORDERS_CREATED.inc()
+        task = asyncio.ensure_future(self._release(key, payment['order_id']))
+        self.releases.add(task)
+        task.add_done_callback(self.releases.discard)
+        return payment, True
+
+    async def _release(self, key, order_id):
+        """Payment ଅନ୍ୟ processes ଦେଖିବା ପରେ claim ଛାଡ଼ନ୍ତୁ"""
+        try:
+            await self.database.wait_written(order_id)
+            await self.database.release_order_key(key)
+        except Exception as e:
+            # Claim create_budget() ପରେ ଆପେ expire ହେବ
+            logging.warning(f"Could not release order key {key}: {e}")
+
+    async def _wait_for(self, key):
+        """
+        ଅନ୍ୟ process ତିଆରି କରୁଥିବା payment ପାଇଁ ଅପେକ୍ଷା କରନ୍ତୁ
+
+        Returns the payment, or None once the claim is ours (the other
+        process gave up, crashed, or its order is no longer PENDING), in
+        which case the caller creates the order.
+        """
+        deadline = time.monotonic() + create_budget()
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            payment = await self.database.find_idempotent_payment(key)
+            if payment:
+                return payment
+            if await self.database.claim_order_key(key, create_budget()):
+                return None
+        raise TimeoutError(f"Order {key} is still being created elsewhere")
+
+# Order creator object
+order_creator = OrderCreator(db, payment_processor)
@@ -1,44 +1,355 @@
-import razorpay
-import qrcode
+import time
+import random
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import aiohttp
 from io import BytesIO
 import config
+from metrics import RAZORPAY_LATENCY, QR_RENDER_LATENCY
+
+# razorpay, qrcode ଏବଂ Pillow ଦରକାର ପଡ଼ିଲେ import ହୁଏ (fast cold start)
+
+def render_qr_png(payment_link, fast=False):
+    """QR କୋଡ୍ PNG bytes ତିଆରି କରନ୍ତୁ (executor ରେ ଚାଲେ)"""
+    import qrcode
+    from PIL import Image
+    
+    if not fast:
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(payment_link)
+        qr.make(fit=True)
+        
+        img = qr.make_image(fill_color="black", back_color="white")
+        
+        img_buffer = BytesIO()
+        img.save(img_buffer, format='PNG')
+        return img_buffer.getvalue()
+    
+    # Fast path: fixed mask (skips scoring all 8 masks) and a 1-bit
+    # image built straight from the module matrix
+    qr = qrcode.QRCode(version=1, box_size=10, border=5, mask_pattern=0)
+    qr.add_data(payment_link)
+    qr.make(fit=True)
+    
+    matrix = qr.get_matrix()
+    size = len(matrix)
+    img = Image.new("1", (size, size))
+    img.putdata([0 if module else 255 for row in matrix for module in row])
+    img = img.resize((size * qr.box_size, size * qr.box_size), Image.NEAREST)
+    
+    img_buffer = BytesIO()
+    img.save(img_buffer, format='PNG')
+    return img_buffer.getvalue()
+
+class CircuitOpenError(Exception):
+    """Razorpay degraded; the call was not attempted"""
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """Razorpay rate limit ଭିତରେ ରହିବା ପାଇଁ token bucket"""
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+    
+    async def acquire(self):
+        """ଗୋଟିଏ token ନିଅନ୍ତୁ; ନଥିଲେ ପାଳି ଆସିବା ପର୍ଯ୍ୟନ୍ତ ଅପେକ୍ଷା କରନ୍ତୁ"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Token ଆଗୁଆ ନିଅନ୍ତୁ: negative balance = ଆଗରେ ଅପେକ୍ଷା କରୁଥିବା calls
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_timeout):
+        """
+        Razorpay ବାରମ୍ବାର ବିଫଳ ହେଲେ କିଛି ସମୟ calls ବନ୍ଦ କରନ୍ତୁ
+
+        Opens after `threshold` failures in a row (429, 5xx, network).
+        While open, calls fail fast; after `reset_timeout` seconds one
+        probe call is let through, and its result closes or re-opens it.
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.closed = asyncio.Event()
+        self.closed.set()
+    
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+    
+    def allow(self):
+        """ଏବେ call କରିପାରିବେ କି"""
+        if self.opened_at is None:
+            return True
+        if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.probing = True
+            return True
+        return False
+    
+    async def wait(self, timeout):
+        """Call ଅନୁମତି ମିଳିବା ପର୍ଯ୍ୟନ୍ତ ଅପେକ୍ଷା କରନ୍ତୁ; timeout ହେଲେ False"""
+        deadline = time.monotonic() + timeout
+        while not self.allow():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # Probe ସମୟ ପର୍ଯ୍ୟନ୍ତ, କିମ୍ବା breaker ବନ୍ଦ ହେବା ପର୍ଯ୍ୟନ୍ତ
+            probe_in = self.opened_at + self.reset_timeout - time.monotonic()
+            try:
+                await asyncio.wait_for(self.closed.wait(), min(remaining, max(probe_in, 0.05)))
+            except asyncio.TimeoutError:
+                pass
+        return True
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.closed.set()
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logging.warning("Razorpay circuit breaker opened")
+            self.opened_at = time.monotonic()
+            self.probing = False
+            self.closed.clear()
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff (Retry-After ଥିଲେ ତା'ଠୁ କମ୍ ନୁହେଁ)"""
+    delay = random.uniform(0, min(config.RAZORPAY_BACKOFF_MAX, config.RAZORPAY_BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+def endpoint_label(method, path):
+    """Metrics ପାଇଁ path ରୁ id ହଟାନ୍ତୁ: GET /orders/{id}"""
+    parts = path.strip("/").split("/")
+    return f"{method} /{parts[0]}" + ("/{id}" if len(parts) > 1 else "")
 
 class PaymentProcessor:
     def __init__(self):
         """Razorpay କ୍ଲାଏଣ୍ଟ ଆରମ୍ଭ କରନ୍ତୁ"""
-        self.client = razorpay.Client(
-            auth=(config.RAZORPAY_KEY_ID, config.RAZORPAY_KEY_SECRET)
+        self._client = None
+        self.base_url = config.RAZORPAY_BASE_URL.rstrip("/")
+        self.auth = aiohttp.BasicAuth(
+            config.RAZORPAY_KEY_ID or "", config.RAZORPAY_KEY_SECRET or ""
         )
+        self.timeout = aiohttp.ClientTimeout(total=config.RAZORPAY_TIMEOUT)
+        self.semaphore = asyncio.Semaphore(config.RAZORPAY_MAX_CONCURRENCY)
+        # Account rate limit, split across webhook worker processes
+        self.limiter = None
+        if config.RAZORPAY_RATE_LIMIT > 0:
+            self.limiter = TokenBucket(
+                config.RAZORPAY_RATE_LIMIT / max(1, config.WEB_WORKERS),
+                config.RAZORPAY_BURST
+            )
+        self.breaker = CircuitBreaker(
+            config.RAZORPAY_BREAKER_THRESHOLD, config.RAZORPAY_BREAKER_RESET
+        )
+        self.session = None
+        self.qr_executor = None
+        self.qr_cache = OrderedDict()
+        # fetch_order: in-flight requests, recent results, last click per user
+        self.order_inflight = {}
+        self.order_cache = OrderedDict()  # order_id -> (order, fetched_at)
+        self.last_check = OrderedDict()  # user_id -> monotonic time
+        # fetch_order issued / coalesced / cached / throttled, plus
+        # retried / short_circuited for every call
+        self.stats = Counter()
+
+    @property
+    def client(self):
+        """Signature verification ପାଇଁ razorpay.Client (କୌଣସି network call ନାହିଁ)"""
+        if self._client is None:
+            import razorpay
+            self._client = razorpay.Client(
+                auth=(config.RAZORPAY_KEY_ID, config.RAZORPAY_KEY_SECRET)
+            )
+        return self._client
+
+    def _get_session(self):
+        """Keep-alive aiohttp session ତିଆରି କରନ୍ତୁ (ପ୍ରଥମ call ରେ)"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.RAZORPAY_MAX_CONCURRENCY,
+                keepalive_timeout=60
+            )
+            self.session = aiohttp.ClientSession(
+                auth=self.auth,
+                timeout=self.timeout,
+                connector=connector
+            )
+        return self.session
+
+    async def close(self):
+        """HTTP session ଏବଂ QR executor ବନ୍ଦ କରନ୍ତୁ"""
+        if self.stats:
+            logging.info(f"Razorpay client stats: {dict(self.stats)}")
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        if self.qr_executor:
+            self.qr_executor.shutdown(wait=False)
+            self.qr_executor = None
+
+    @property
+    def degraded(self):
+        """Circuit breaker ଖୋଲା ଅଛି କି"""
+        return self.breaker.is_open
+    
+    async def _request(self, method, path, queue=False, **kwargs):
+        """Razorpay API କୁ request ପଠାନ୍ତୁ (latency metrics ସହ)"""
+        start = time.perf_counter()
+        try:
+            return await self._send(method, path, queue, **kwargs)
+        finally:
+            RAZORPAY_LATENCY.observe(time.perf_counter() - start, endpoint_label(method, path))
     
-    def create_order(self, amount):
-        """ନୂଆ ପେମେଣ୍ଟ ଅର୍ଡର ତିଆରି କରନ୍ତୁ"""
-        # ଟଙ୍କାକୁ ପଇସାରେ ପରିଣତ କରନ୍ତୁ (ଗୁଣନ 100)
-        amount_paise = int(amount * 100)
+    async def _send(self, method, path, queue, **kwargs):
+        """Retries ଏବଂ circuit breaker ସହ ଗୋଟିଏ API call
+
+        429/5xx and network errors are retried with jittered exponential
+        backoff, up to RAZORPAY_MAX_RETRIES times. POSTs are only retried
+        when Razorpay cannot have acted on them (429, 503, connect failures).
+        While the circuit breaker is open calls raise CircuitOpenError at
+        once, unless `queue` is set: then they wait up to
+        RAZORPAY_QUEUE_TIMEOUT for the API to recover.
+        """
+        url = f"{self.base_url}{path}"
+        idempotent = method == "GET"
+        
+        for attempt in range(config.RAZORPAY_MAX_RETRIES + 1):
+            if queue:
+                allowed = await self.breaker.wait(config.RAZORPAY_QUEUE_TIMEOUT)
+            else:
+                allowed = self.breaker.allow()
+            if not allowed:
+                self.stats["short_circuited"] += 1
+                raise CircuitOpenError("Razorpay is unavailable, try again later")
+            
+            if self.limiter:
+                await self.limiter.acquire()
+            
+            retry_after = None
+            try:
+                async with self.semaphore:
+                    session = self._get_session()
+                    async with session.request(method, url, **kwargs) as response:
+                        status = response.status
+                        retry_after = response.headers.get("Retry-After")
+                        try:
+                            data = await response.json(content_type=None)
+                        except ValueError:
+                            # Gateway ର HTML / ଖାଲି 502, 503 ପୃଷ୍ଠା
+                            data = None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.breaker.record_failure()
+                sent = not isinstance(e, aiohttp.ClientConnectorError)
+                if attempt == config.RAZORPAY_MAX_RETRIES or (sent and not idempotent):
+                    raise
+                self.stats["retried"] += 1
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            except asyncio.CancelledError:
+                # Cancel ହୋଇଥିବା probe ପରେ ଅନ୍ୟ ଏକ probe ଯାଇପାରୁ
+                self.breaker.probing = False
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            
+            if status == 429 or status >= 500:
+                self.breaker.record_failure()
+                # 429/503 ମାନେ request process ହୋଇନାହିଁ, POST ମଧ୍ୟ ପୁଣି ପଠାଯାଇପାରେ
+                if attempt < config.RAZORPAY_MAX_RETRIES and (status in (429, 503) or idempotent):
+                    self.stats["retried"] += 1
+                    await asyncio.sleep(backoff_delay(attempt, retry_after))
+                    continue
+            else:
+                # 2xx ଏବଂ 4xx ଦୁହେଁ API ସୁସ୍ଥ ଥିବା ଦର୍ଶାଏ
+                self.breaker.record_success()
+            break
         
+        # razorpay.Client ପରି ସମାନ error types
+        from razorpay.errors import BadRequestError, GatewayError, ServerError
+        
+        if 200 <= status < 300:
+            if data is None:
+                raise ServerError(f"Invalid response body from Razorpay (HTTP {status})")
+            return data
+        
+        error = (data or {}).get("error", {}) if isinstance(data, dict) else {}
+        msg = error.get("description") or f"Razorpay HTTP {status}"
+        code = str(error.get("code", "")).upper()
+        
+        if code == "BAD_REQUEST_ERROR" and status != 429:
+            raise BadRequestError(msg)
+        elif code == "GATEWAY_ERROR":
+            raise GatewayError(msg)
+        raise ServerError(msg)
+    
+    async def create_order(self, amount_paise, receipt=None):
+        """ନୂଆ ପେମେଣ୍ଟ ଅର୍ଡର ତିଆରି କରନ୍ତୁ (amount ପଇସାରେ)"""
+        if not isinstance(amount_paise, int):
+            raise TypeError(f"amount_paise must be an int, got {amount_paise!r}")
+
         order_data = {
             "amount": amount_paise,
             "currency": "INR",
             "payment_capture": 1
         }
-        
-        order = self.client.order.create(data=order_data)
+        if receipt:
+            # ଆମ idempotency key (Razorpay ରେ ସର୍ବାଧିକ 40 ଅକ୍ଷର)
+            order_data["receipt"] = receipt[:40]
+
+        # Degraded ଥିବାବେଳେ fail ନକରି recover ପର୍ଯ୍ୟନ୍ତ queue ରେ ଅପେକ୍ଷା
+        order = await self._request("POST", "/orders", queue=True, json=order_data)
         return order
-    
-    def generate_qr_code(self, payment_link):
+
+    def _get_qr_executor(self):
+        """QR rendering ପାଇଁ thread/process pool"""
+        if self.qr_executor is None:
+            if config.QR_EXECUTOR == "process":
+                self.qr_executor = ProcessPoolExecutor(max_workers=config.QR_WORKERS)
+            else:
+                self.qr_executor = ThreadPoolExecutor(
+                    max_workers=config.QR_WORKERS, thread_name_prefix="qr"
+                )
+        return self.qr_executor
+
+    async def generate_qr_code(self, payment_link):
         """ପେମେଣ୍ଟ ଲିଙ୍କ ପାଇଁ QR କୋଡ୍ ତିଆରି କରନ୍ତୁ"""
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(payment_link)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # BytesIO ରେ ସେଭ୍ କରନ୍ତୁ
-        img_buffer = BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        return img_buffer
-    
+        png = self.qr_cache.get(payment_link)
+        if png is not None:
+            self.qr_cache.move_to_end(payment_link)
+        else:
+            # Event loop block ନକରି executor ରେ render କରନ୍ତୁ
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            png = await loop.run_in_executor(
+                self._get_qr_executor(), render_qr_png, payment_link, config.QR_FAST_RENDER
+            )
+            QR_RENDER_LATENCY.observe(time.perf_counter() - start)
+            self.qr_cache[payment_link] = png
+            if len(self.qr_cache) > config.QR_CACHE_SIZE:
+                self.qr_cache.popitem(last=False)
+
+        # ପ୍ରତି send ପାଇଁ ନୂଆ BytesIO (upload buffer ଶେଷ ପର୍ଯ୍ୟନ୍ତ ପଢ଼େ)
+        return BytesIO(png)
+
     def verify_payment(self, order_id, payment_id, signature):
         """ପେମେଣ୍ଟ ସଠିକ୍ କି ନାହିଁ ଯାଞ୍ଚ କରନ୍ତୁ"""
         try:
@@ -47,19 +358,92 @@ class PaymentProcessor:
                 'razorpay_payment_id': payment_id,
                 'razorpay_signature': signature
             }
-            
+
             self.client.utility.verify_payment_signature(params_dict)
             return True
         except:
             return False
-    
-    def fetch_payment(self, payment_id):
+
+    def verify_webhook(self, body, signature):
+        """Razorpay webhook signature ଯାଞ୍ଚ କରନ୍ତୁ"""
+        if not config.RAZORPAY_WEBHOOK_SECRET or not signature:
+            return False
+        try:
+            self.client.utility.verify_webhook_signature(
+                body, signature, config.RAZORPAY_WEBHOOK_SECRET
+            )
+            return True
+        except:
+            return False
+
+    async def fetch_payment(self, payment_id):
         """ପେମେଣ୍ଟ ବିବରଣୀ ଆଣନ୍ତୁ"""
-        return self.client.payment.fetch(payment_id)
+        return await self._request("GET", f"/payments/{payment_id}")
+
+    async def fetch_order(self, order_id, user_id=None):
+        """ଅର୍ଡର ବିବରଣୀ ଆଣନ୍ତୁ
+
+        Concurrent calls for one order share a single request, and results
+        are reused for ORDER_CACHE_TTL seconds. A user who checks again
+        within CHECK_THROTTLE seconds is answered from any cached result.
+        """
+        now = time.monotonic()
+        max_age = config.ORDER_CACHE_TTL
+        if user_id is not None and self._throttled(user_id, now):
+            self.stats["throttled"] += 1
+            max_age = float("inf")
+        
+        cached = self.order_cache.get(order_id)
+        if cached is not None and now - cached[1] <= max_age:
+            self.order_cache.move_to_end(order_id)
+            self.stats["cached"] += 1
+            return cached[0]
+        
+        task = self.order_inflight.get(order_id)
+        if task is None:
+            self.stats["issued"] += 1
+            task = asyncio.ensure_future(self._fetch_order(order_id))
+            self.order_inflight[order_id] = task
+            task.add_done_callback(lambda _: self.order_inflight.pop(order_id, None))
+        else:
+            self.stats["coalesced"] += 1
+        
+        # ଜଣେ caller cancel ହେଲେ ମଧ୍ୟ ଅନ୍ୟମାନଙ୍କ ପାଇଁ request ଚାଲୁ ରହେ
+        return await asyncio.shield(task)
     
-    def fetch_order(self, order_id):
-        """ଅର୍ଡର ବିବରଣୀ ଆଣନ୍ତୁ"""
-        return self.client.order.fetch(order_id)
+    async def _fetch_order(self, order_id):
+        order = await self._request("GET", f"/orders/{order_id}")
+        self.order_cache[order_id] = (order, time.monotonic())
+        self.order_cache.move_to_end(order_id)
+        if len(self.order_cache) > config.ORDER_CACHE_SIZE:
+            self.order_cache.popitem(last=False)
+        return order
+    
+    def _throttled(self, user_id, now):
+        """ଏହି ୟୁଜର CHECK_THROTTLE ମଧ୍ୟରେ ପୁଣି ଯାଞ୍ଚ କରୁଛନ୍ତି କି"""
+        last = self.last_check.get(user_id)
+        self.last_check[user_id] = now
+        self.last_check.move_to_end(user_id)
+        if len(self.last_check) > config.ORDER_CACHE_SIZE:
+            self.last_check.popitem(last=False)
+        return last is not None and now - last < config.CHECK_THROTTLE
+
+    async def list_orders(self, from_ts, to_ts):
+        """ସମୟ ସୀମା ମଧ୍ୟରେ ସବୁ ଅର୍ଡର ଆଣନ୍ତୁ (100 ଲେଖାଏଁ page)"""
+        orders = []
+        skip = 0
+        while True:
+            page = await self._request("GET", "/orders", params={
+                "from": int(from_ts),
+                "to": int(to_ts),
+                "count": 100,
+                "skip": skip
+            })
+            items = page.get("items", [])
+            orders.extend(items)
+            if len(items) < 100:
+                return orders
+            skip += len(items)
 
 # Payment processor object
 payment_processor = PaymentProcessor()
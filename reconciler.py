@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+import config
+from metrics import ORDERS_CONFIRMED
+
+EPOCH = datetime(1970, 1, 1)
+
+def list_windows(payments, span):
+    """
+    created_at କ୍ରମରେ (from_ts, to_ts) unix seconds windows
+
+    Consecutive orders share a window while it is at most `span` seconds
+    wide, padded by a minute for clock skew, so an unsorted batch spread
+    over a day never turns into one list call over the whole day.
+    """
+    created = sorted((p["created_at"] - EPOCH).total_seconds() for p in payments)
+    windows = []
+    for ts in created:
+        if windows and ts - windows[-1][0] <= span:
+            windows[-1][1] = ts
+        else:
+            windows.append([ts, ts])
+    return [(start - 60, end + 60) for start, end in windows]
+
+class Reconciler:
+    """
+    PENDING orders ପାଇଁ ପୃଷ୍ଠଭୂମି sweeper
+
+    Picks up orders whose next_check_at is due, looks them up with one
+    Razorpay list-orders call per RECONCILE_LIST_WINDOW of creation time
+    (not one fetch_order per row), then marks paid ones SUCCESS and
+    notifies the user, expires orders older than RECONCILE_EXPIRE_AFTER
+    and reschedules the rest in one bulk write. Young orders are checked
+    every RECONCILE_INTERVAL; after RECONCILE_YOUNG_AGE the interval
+    doubles per check up to RECONCILE_MAX_INTERVAL.
+    """
+    
+    def __init__(self, database, processor, notify):
+        self.database = database
+        self.processor = processor
+        # notify(payment) ପେମେଣ୍ଟ ସଫଳ ହେଲେ ୟୁଜରଙ୍କୁ ଜଣାଏ
+        self.notify = notify
+        self.task = None
+    
+    def start(self):
+        """Sweeper task ଆରମ୍ଭ କରନ୍ତୁ"""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Sweeper task ବନ୍ଦ କରନ୍ତୁ"""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                swept = await self.sweep()
+            except Exception as e:
+                logging.error(f"Reconciliation sweep failed: {e}")
+                swept = 0
+            # ଗୋଟିଏ ପୂରା batch ଥିଲେ ତୁରନ୍ତ ପୁଣି ଚଲାନ୍ତୁ
+            if swept < config.RECONCILE_BATCH_SIZE:
+                await asyncio.sleep(config.RECONCILE_INTERVAL)
+    
+    def next_check(self, now, age):
+        """Order ର ବୟସ ଅନୁସାରେ ପରବର୍ତ୍ତୀ ଯାଞ୍ଚ ସମୟ
+
+        The delay is the time since the young window ended, at least
+        RECONCILE_INTERVAL: 30s, 30s, 60s, 120s, ... after the handover,
+        whatever the attempt count or however late sweeps ran.
+        """
+        delay = max(config.RECONCILE_INTERVAL, age - config.RECONCILE_YOUNG_AGE)
+        return now + timedelta(seconds=min(delay, config.RECONCILE_MAX_INTERVAL))
+    
+    async def sweep(self):
+        """ଗୋଟିଏ batch ଯାଞ୍ଚ କରନ୍ତୁ; କେତେ order ଦେଖାଗଲା ଫେରାନ୍ତୁ"""
+        now = datetime.utcnow()
+        due = await self.database.get_due_payments(now, config.RECONCILE_BATCH_SIZE)
+        if not due:
+            return 0
+        
+        # ପ୍ରତି ଛୋଟ ସମୟ window ପାଇଁ ଗୋଟିଏ list call, ଦିନ ସାରା orders page ନକରି
+        paid = set()
+        for from_ts, to_ts in list_windows(due, config.RECONCILE_LIST_WINDOW):
+            orders = await self.processor.list_orders(from_ts, to_ts)
+            paid.update(o["id"] for o in orders if o.get("status") == "paid")
+        
+        confirmed = 0
+        expired = []
+        schedule = []
+        for payment in due:
+            order_id = payment["order_id"]
+            age = (now - payment["created_at"]).total_seconds()
+            
+            if order_id in paid:
+                updated = await self.database.update_payment_status(
+                    order_id, "SUCCESS", expected_status="PENDING"
+                )
+                if updated:
+                    confirmed += 1
+                    ORDERS_CONFIRMED.inc("reconciler")
+                    await self.notify(payment)
+            elif age > config.RECONCILE_EXPIRE_AFTER:
+                expired.append(order_id)
+            else:
+                attempts = payment.get("reconcile_attempts", 0) + 1
+                schedule.append((order_id, self.next_check(now, age), attempts))
+        
+        await self.database.reschedule_payments(schedule)
+        await self.database.expire_payments(expired)
+        
+        logging.info(
+            f"Reconciled {len(due)} pending orders: {confirmed} paid, "
+            f"{len(expired)} expired, {len(schedule)} rescheduled"
+        )
+        return len(due)
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+import config
+from money import format_amount
+
+# Hour/day buckets STATS_UTC_OFFSET local time ରେ (ଡିଫଲ୍ଟ IST)
+OFFSET = timedelta(minutes=config.STATS_UTC_OFFSET)
+TIMEZONE = "{}{:02d}:{:02d}".format(
+    "-" if config.STATS_UTC_OFFSET < 0 else "+", *divmod(abs(config.STATS_UTC_OFFSET), 60)
+)
+PERIODS = {"hour": "%Y-%m-%dT%H", "day": "%Y-%m-%d"}
+
+# created: orders created in the bucket; pending: of those, still PENDING;
+# success: orders paid in the bucket (by payment time)
+FIELDS = ("created", "created_paise", "pending", "pending_paise", "success", "success_paise")
+
+def bucket_id(period, when):
+    """UTC datetime ର rollup document _id, ଯେପରି "day:2024-05-01" """
+    return f"{period}:{(when + OFFSET).strftime(PERIODS[period])}"
+
+def bucket_range(key):
+    """bucket_id() ର ଓଲଟା: bucket ର (start, end) UTC"""
+    period, local = key.split(":", 1)
+    start = datetime.strptime(local, PERIODS[period]) - OFFSET
+    return start, start + timedelta(**{f"{period}s": 1})
+
+def bucket_start(period, when):
+    """Bucket ଆରମ୍ଭ ସମୟ (UTC)"""
+    local = when + OFFSET
+    local = local.replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        local = local.replace(hour=0)
+    return local - OFFSET
+
+def stats_windows(now):
+    """/stats ର ଧାଡ଼ି: (label, bucket ids)"""
+    return [
+        ("Today", [bucket_id("day", now)]),
+        ("Yesterday", [bucket_id("day", now - timedelta(days=1))]),
+        ("Last 7 days", [bucket_id("day", now - timedelta(days=i)) for i in range(7)]),
+        ("Last 24 hours", [bucket_id("hour", now - timedelta(hours=i)) for i in range(24)]),
+    ]
+
+def stats_bucket_ids(now):
+    return sorted({key for _, keys in stats_windows(now) for key in keys})
+
+def stats_text(rollups, now):
+    """Rollup documents ରୁ /stats message"""
+    lines = [f"📈 Payment stats (UTC{TIMEZONE})\n"]
+    for label, keys in stats_windows(now):
+        totals = dict.fromkeys(FIELDS, 0)
+        for key in keys:
+            for field in FIELDS:
+                totals[field] += rollups.get(key, {}).get(field, 0)
+        created = totals["created"]
+        conversion = f"{totals['success'] / created:.0%}" if created else "-"
+        lines.append(
+            f"{label}:\n"
+            f"  ✅ ₹{format_amount(totals['success_paise'])} from {totals['success']} payments\n"
+            f"  🧾 {created} orders (₹{format_amount(totals['created_paise'])}), conversion {conversion}\n"
+            f"  ⏳ {totals['pending']} still pending (₹{format_amount(totals['pending_paise'])})"
+        )
+    return "\n".join(lines)
+
+def _bucket(period, field):
+    return {
+        "_id": {"$concat": [f"{period}:", {"$dateToString": {
+            "date": f"${field}", "format": PERIODS[period], "timezone": TIMEZONE
+        }}]},
+        "period": period,
+        "start": {"$dateTrunc": {"date": f"${field}", "unit": period, "timezone": TIMEZONE}},
+    }
+
+def _event(period, field, **counts):
+    event = _bucket(period, field)
+    for name in FIELDS:
+        event[name] = counts.get(name, {"$literal": 0})
+    return event
+
+def backfill_pipeline():
+    """
+    Payments ରୁ ସବୁ rollup documents ପୁଣି ଗଣନା କରିବା pipeline
+
+    Each payment emits one event per period for its creation bucket and,
+    if paid, one for its payment bucket (updated_at); events are summed
+    per bucket and $merge'd over the rollups collection. Needs
+    MongoDB 5.0+ for $dateTrunc.
+    """
+    is_pending = {"$eq": ["$status", "PENDING"]}
+    created = [
+        _event(
+            period, "created_at",
+            created={"$literal": 1},
+            created_paise="$amount_paise",
+            pending={"$cond": [is_pending, 1, 0]},
+            pending_paise={"$cond": [is_pending, "$amount_paise", 0]},
+        )
+        for period in PERIODS
+    ]
+    paid = [
+        _event(period, "updated_at", success={"$literal": 1}, success_paise="$amount_paise")
+        for period in PERIODS
+    ]
+    return [
+        {"$match": {"amount_paise": {"$exists": True}}},
+        {"$project": {"_id": 0, "events": {"$concatArrays": [
+            created,
+            {"$cond": [{"$eq": ["$status", "SUCCESS"]}, paid, []]}
+        ]}}},
+        {"$unwind": "$events"},
+        {"$group": {
+            "_id": "$events._id",
+            "period": {"$first": "$events.period"},
+            "start": {"$first": "$events.start"},
+            **{name: {"$sum": f"$events.{name}"} for name in FIELDS}
+        }},
+        {"$merge": {"into": "rollups", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
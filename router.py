@@ -0,0 +1,39 @@
+from aiogram.dispatcher.handler import ctx_data, current_handler
+from aiogram.dispatcher.storage import BaseStorage
+
+class StateRouter:
+    """
+    State-keyed message dispatch table
+
+    Registered once on the dispatcher with state='*', it reads the user's
+    FSM state a single time and jumps straight to that state's handler
+    with a dict lookup, instead of aiogram testing one filtered handler
+    after another. Adding states costs nothing per update.
+    """
+    
+    def __init__(self):
+        self.handlers = {}
+        self.default = None
+    
+    def handler(self, *states):
+        """State(s) ପାଇଁ handler register କରନ୍ତୁ; state ନଦେଲେ default"""
+        def decorator(callback):
+            if not states:
+                self.default = callback
+            for state in states:
+                self.handlers[BaseStorage.resolve_state(state)] = callback
+            return callback
+        return decorator
+    
+    async def dispatch(self, message, state):
+        """Current state ର handler କୁ message ପଠାନ୍ତୁ"""
+        handler = self.handlers.get(await state.get_state(), self.default)
+        if handler is not None:
+            # Middlewares (ProfilingMiddleware) ପାଇଁ dispatch ବଦଳରେ ପ୍ରକୃତ handler
+            current_handler.set(handler)
+            ctx_data.get()["handler"] = handler
+            return await handler(message, state)
+    
+    def setup(self, dp):
+        """Dispatcher ରେ ଶେଷ message handler ଭାବେ ଯୋଡ଼ନ୍ତୁ"""
+        dp.register_message_handler(self.dispatch, state='*')
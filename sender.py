@@ -0,0 +1,212 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from io import BytesIO
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from aiogram import Bot
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
+from aiogram.types import InputFile
+from aiogram.utils.exceptions import RetryAfter
+import config
+from metrics import SEND_LATENCY
+
+# Telegram methods that post into a chat and count towards flood limits
+SEND_METHODS = {
+    "sendMessage", "sendPhoto", "sendDocument", "sendMediaGroup",
+    "copyMessage", "forwardMessage",
+    "editMessageText", "editMessageCaption", "editMessageReplyMarkup",
+}
+
+# Lower value goes first
+TRANSACTIONAL = 0
+INFORMATIONAL = 1
+
+PRIORITY_NAMES = {TRANSACTIONAL: "transactional", INFORMATIONAL: "informational"}
+
+send_priority = ContextVar("send_priority", default=INFORMATIONAL)
+
+@contextmanager
+def transactional():
+    """ଏହି block ର messages (payment confirmations) ଆଗରେ ପଠାନ୍ତୁ"""
+    token = send_priority.set(TRANSACTIONAL)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+def snapshot_files(files):
+    """Upload bytes ରଖନ୍ତୁ (aiohttp file ବନ୍ଦ କରେ), RetryAfter ପରେ ପୁଣି ପଠାଇବା ପାଇଁ; ନହେଲେ None"""
+    snapshot = {}
+    for key, file in files.items():
+        filename = key
+        if isinstance(file, InputFile):
+            filename, file = file.filename or key, file.file
+        elif isinstance(file, tuple):
+            filename, file = file
+        if not isinstance(file, BytesIO):
+            return None
+        snapshot[key] = (filename, file.getvalue())
+    return snapshot
+
+class PriorityLimiter:
+    def __init__(self, rate, burst):
+        """Priority ଅନୁସାରେ token ଦେଉଥିବା global token bucket"""
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.waiters = []  # heap of (priority, seq, future)
+        self.seq = itertools.count()
+        self.task = None
+
+    def __len__(self):
+        return len(self.waiters)
+
+    def _take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, priority):
+        """Token ନିଅନ୍ତୁ; ଅପେକ୍ଷା କରୁଥିବା ମଧ୍ୟରୁ ଉଚ୍ଚ priority ପ୍ରଥମେ ପାଏ"""
+        if not self.waiters and self._take():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.seq), future))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        await future
+
+    async def _run(self):
+        while self.waiters:
+            # Cancel ହୋଇଥିବା waiters token ନିଅନ୍ତି ନାହିଁ
+            while self.waiters and self.waiters[0][2].done():
+                heapq.heappop(self.waiters)
+            if not self.waiters:
+                break
+            if self._take():
+                heapq.heappop(self.waiters)[2].set_result(None)
+            else:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class SendScheduler:
+    def __init__(self, global_rate, chat_rate, chat_burst, max_retries, max_chats=100000):
+        """Telegram flood limits ଭିତରେ outbound messages: chat slot, ତାପରେ priority ଅନୁସାରେ global token"""
+        # Small burst: burst + rate must stay under the limit in any 1 s window
+        self.limiter = PriorityLimiter(global_rate, max(1, global_rate / 10))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.chats = OrderedDict()  # chat_id -> (tokens, updated)
+        # Metrics (latency goes to metrics.SEND_LATENCY)
+        self.waiting = Counter()  # priority -> sends queued right now
+        self.stats = Counter()  # sent / retry_after / failed
+
+    @property
+    def depth(self):
+        """ଏବେ queue ରେ ଥିବା sends"""
+        return sum(self.waiting.values())
+
+    def _chat_delay(self, chat_id, now):
+        """Chat ର ପରବର୍ତ୍ତୀ slot ବୁକ୍ କରନ୍ତୁ; କେତେ ସେକେଣ୍ଡ ଅପେକ୍ଷା ଫେରାନ୍ତୁ"""
+        tokens, updated = self.chats.get(chat_id, (self.chat_burst, now))
+        tokens = min(self.chat_burst, tokens + (now - updated) * self.chat_rate) - 1
+        self.chats[chat_id] = (tokens, now)
+        self.chats.move_to_end(chat_id)
+        if len(self.chats) > self.max_chats:
+            self.chats.popitem(last=False)
+        return max(0.0, -tokens / self.chat_rate)
+
+    def _hold_chat(self, chat_id, seconds):
+        """RetryAfter: chat କୁ `seconds` ପର୍ଯ୍ୟନ୍ତ ବନ୍ଦ କରନ୍ତୁ"""
+        self.chats[chat_id] = (-seconds * self.chat_rate, time.monotonic())
+
+    async def send(self, chat_id, call):
+        """`call()` (ନୂଆ coroutine ଫେରାଉଥିବା) କୁ limits ଭିତରେ ଚଲାନ୍ତୁ"""
+        priority = send_priority.get()
+        start = time.monotonic()
+        self.waiting[priority] += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                if chat_id is not None:
+                    delay = self._chat_delay(chat_id, time.monotonic())
+                    if delay:
+                        await asyncio.sleep(delay)
+                await self.limiter.acquire(priority)
+                try:
+                    result = await call()
+                    break
+                except RetryAfter as e:
+                    self.stats["retry_after"] += 1
+                    if attempt == self.max_retries:
+                        self.stats["failed"] += 1
+                        raise
+                    logging.warning(f"Telegram flood control for chat {chat_id}, retrying in {e.timeout}s")
+                    if chat_id is not None:
+                        self._hold_chat(chat_id, e.timeout)
+                    else:
+                        await asyncio.sleep(e.timeout)
+        finally:
+            self.waiting[priority] -= 1
+
+        self.stats["sent"] += 1
+        SEND_LATENCY.observe(time.monotonic() - start, PRIORITY_NAMES[priority])
+        return result
+
+class ScheduledBot(Bot):
+    """Bot whose chat sends and edits go through a SendScheduler"""
+
+    def __init__(self, *args, scheduler=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        if self.scheduler is None or method not in SEND_METHODS:
+            return await super().request(method, data, files, **kwargs)
+
+        request = super().request
+        snapshot = snapshot_files(files) if files else None
+        attempts = 0
+
+        def call():
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1 and files:
+                if snapshot is None:
+                    raise RuntimeError(f"{method} upload cannot be retried")
+                retry_files = {
+                    key: (filename, BytesIO(content))
+                    for key, (filename, content) in snapshot.items()
+                }
+                return request(method, data, retry_files, **kwargs)
+            return request(method, data, files, **kwargs)
+
+        chat_id = (data or {}).get("chat_id")
+        return await self.scheduler.send(chat_id, call)
+
+def create_bot(token):
+    """config ଅନୁସାରେ Bot ତିଆରି କରନ୍ତୁ (API server, send scheduler)"""
+    if config.TELEGRAM_API_URL:
+        server = TelegramAPIServer.from_base(config.TELEGRAM_API_URL)
+    else:
+        server = TELEGRAM_PRODUCTION
+    
+    scheduler = None
+    if config.TELEGRAM_SEND_SCHEDULER:
+        # Bot-wide limit, webhook worker processes ମଧ୍ୟରେ ଭାଗ
+        scheduler = SendScheduler(
+            config.TELEGRAM_GLOBAL_RATE / max(1, config.WEB_WORKERS),
+            config.TELEGRAM_CHAT_RATE,
+            config.TELEGRAM_CHAT_BURST,
+            config.TELEGRAM_SEND_RETRIES
+        )
+    return ScheduledBot(token=token, server=server, scheduler=scheduler)
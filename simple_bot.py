@@ -3,15 +3,22 @@ MongoDB ନଥିଲେ ଏହି ସରଳ ସଂସ୍କରଣ ବ୍ୟବ
 """
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, types
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-import razorpay
-import qrcode
-from io import BytesIO
-from datetime import datetime
 import os
 from dotenv import load_dotenv
 
+from payments import payment_processor
+from sqlite_database import SQLiteDatabase
+from media import send_photo_cached
+from sender import create_bot
+from states import PaymentStates
+from storage import MemoryStateStore
+from router import StateRouter
+from money import parse_amount, format_amount
+import config
+
 load_dotenv()
 
 # Configuration
@@ -19,69 +26,48 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
-# Simple in-memory database
-payments_db = {}
-user_states = {}
+# Embedded database (SQLite file, survives restarts)
+db = SQLiteDatabase(config.SQLITE_PATH)
 
 # Initialize
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(bot)
+bot = create_bot(BOT_TOKEN)
+dp = Dispatcher(bot, storage=MemoryStateStore(config.FSM_STATE_TTL, config.FSM_MAX_STATES))
+router = StateRouter()
 logging.basicConfig(level=logging.INFO)
 
-# Razorpay client
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
-
-def create_order(amount):
+async def create_order(amount_paise):
     """Create Razorpay order"""
-    amount_paise = int(amount * 100)
-    order = razorpay_client.order.create({
-        "amount": amount_paise,
-        "currency": "INR",
-        "payment_capture": 1
-    })
-    return order
+    return await payment_processor.create_order(amount_paise)
 
-def generate_qr(text):
+async def generate_qr(text):
     """Generate QR code"""
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(text)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    bio = BytesIO()
-    img.save(bio, 'PNG')
-    bio.seek(0)
-    return bio
+    return await payment_processor.generate_qr_code(text)
 
-@dp.message_handler(commands=['start'])
+@dp.message_handler(commands=['start'], state='*')
 async def start(msg: types.Message):
     await msg.reply("Welcome! Use /pay to make payment")
 
-@dp.message_handler(commands=['pay'])
+@dp.message_handler(commands=['pay'], state='*')
 async def pay(msg: types.Message):
-    user_states[msg.from_user.id] = "awaiting_amount"
+    await PaymentStates.awaiting_amount.set()
     await msg.reply("Enter amount in INR:")
 
-@dp.message_handler(lambda m: user_states.get(m.from_user.id) == "awaiting_amount")
-async def amount(msg: types.Message):
+@router.handler(PaymentStates.awaiting_amount)
+async def amount(msg: types.Message, state: FSMContext):
     try:
-        amount = float(msg.text)
+        amount_paise = parse_amount(msg.text)
         user_id = msg.from_user.id
         
         # Create order
-        order = create_order(amount)
+        order = await create_order(amount_paise)
         order_id = order['id']
         
-        # Save to memory
-        payments_db[order_id] = {
-            'user_id': user_id,
-            'amount': amount,
-            'status': 'PENDING',
-            'created_at': datetime.now()
-        }
+        # Save order
+        await db.create_payment(user_id, order_id, amount_paise)
         
         # Generate QR
         payment_link = f"https://rzp.io/i/{order_id}"
-        qr = generate_qr(payment_link)
+        qr = await generate_qr(payment_link)
         
         # Keyboard
         keyboard = InlineKeyboardMarkup()
@@ -91,32 +77,35 @@ async def amount(msg: types.Message):
         ))
         
         # Send QR
-        await bot.send_photo(
+        sent = await send_photo_cached(
+            bot,
             user_id,
             qr,
-            caption=f"Amount: ₹{amount}\nOrder: {order_id[:8]}...",
+            cache_key=order_id,
+            caption=f"Amount: ₹{format_amount(amount_paise)}\nOrder: {order_id[:8]}...",
             reply_markup=keyboard
         )
+        await db.set_qr_file_id(order_id, sent.photo[-1].file_id)
         
-        del user_states[user_id]
+        await state.finish()
         
     except ValueError:
         await msg.reply("Please enter a valid number")
 
-@dp.callback_query_handler(lambda c: c.data.startswith('check_'))
+@dp.callback_query_handler(lambda c: c.data.startswith('check_'), state='*')
 async def check(callback: types.CallbackQuery):
     order_id = callback.data.replace('check_', '')
     
-    if order_id in payments_db and payments_db[order_id]['status'] == 'SUCCESS':
+    if await db.is_payment_completed(order_id):
         await callback.answer("Already paid!", show_alert=True)
         return
     
     try:
         # Check with Razorpay
-        order = razorpay_client.order.fetch(order_id)
+        order = await payment_processor.fetch_order(order_id, callback.from_user.id)
         
         if order['status'] == 'paid':
-            payments_db[order_id]['status'] = 'SUCCESS'
+            await db.update_payment_status(order_id, 'SUCCESS', expected_status='PENDING')
             await callback.message.edit_caption("✅ Payment confirmed! Thank you!")
             await callback.answer("Payment successful!", show_alert=True)
         else:
@@ -124,25 +113,33 @@ async def check(callback: types.CallbackQuery):
     except:
         await callback.answer("Error checking payment!", show_alert=True)
 
-@dp.message_handler(commands=['history'])
+@dp.message_handler(commands=['history'], state='*')
 async def history(msg: types.Message):
     user_id = msg.from_user.id
-    user_payments = [p for p in payments_db.values() if p['user_id'] == user_id]
+    user_payments = await db.get_user_payments(user_id, limit=5)
     
     if not user_payments:
         await msg.reply("No payment history")
         return
     
     text = "Your payments:\n"
-    for p in user_payments[-5:]:
+    for p in user_payments:
         status = "✅" if p['status'] == 'SUCCESS' else "⏳"
-        text += f"{status} ₹{p['amount']}\n"
+        text += f"{status} ₹{format_amount(p['amount_paise'])}\n"
     
     await msg.reply(text)
 
+router.setup(dp)
+
 async def main():
     print("Bot starting...")
-    await dp.start_polling()
+    await db.connect()
+    await db.ensure_indexes()
+    try:
+        await dp.start_polling()
+    finally:
+        await payment_processor.close()
+        await db.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
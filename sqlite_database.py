@@ -0,0 +1,418 @@
+import json
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import config
+from rollups import OFFSET, PERIODS, bucket_range
+
+EPOCH = datetime(1970, 1, 1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    order_id TEXT NOT NULL UNIQUE,
+    user_id INTEGER NOT NULL,
+    amount_paise INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    next_check_at INTEGER,
+    reconcile_attempts INTEGER NOT NULL DEFAULT 0,
+    idempotency_key TEXT,
+    update_id INTEGER UNIQUE,
+    qr_file_id TEXT,
+    payment_details TEXT
+);
+CREATE TABLE IF NOT EXISTS order_keys (
+    key TEXT PRIMARY KEY,
+    expires_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at INTEGER NOT NULL
+);
+"""
+
+INDEXES = """
+-- /history: user_id ଦ୍ୱାରା, ନୂଆରୁ ପୁରୁଣା; amount/status ଥିବାରୁ covering
+CREATE INDEX IF NOT EXISTS user_history
+    ON payments (user_id, created_at DESC, id DESC, amount_paise, status);
+-- Reconciliation sweeper: due PENDING orders
+CREATE INDEX IF NOT EXISTS pending_due ON payments (status, next_check_at);
+-- ଏକା (user, amount, window) ପାଇଁ ଗୋଟିଏ ହିଁ PENDING order
+CREATE UNIQUE INDEX IF NOT EXISTS pending_idempotency_key ON payments (idempotency_key)
+    WHERE status = 'PENDING';
+-- /stats: created ଓ paid buckets
+CREATE INDEX IF NOT EXISTS created ON payments (created_at);
+CREATE INDEX IF NOT EXISTS paid ON payments (status, updated_at);
+"""
+
+HISTORY_COLUMNS = "id, created_at, amount_paise, status"
+EXPORT_COLUMNS = "id, order_id, user_id, amount_paise, status, created_at, updated_at, payment_details"
+
+# Datetime ଗୁଡ଼ିକ UTC milliseconds ଭାବେ ରଖାଯାଏ
+DATETIME_COLUMNS = ("created_at", "updated_at", "next_check_at")
+
+def to_millis(value):
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+def from_millis(value):
+    return EPOCH + timedelta(milliseconds=value)
+
+def _document(row):
+    """SQLite row କୁ Mongo document ଭଳି dict (_id, datetime) ରେ"""
+    if row is None:
+        return None
+    document = {key: row[key] for key in row.keys() if row[key] is not None}
+    if "id" in document:
+        document["_id"] = document.pop("id")
+    for key in DATETIME_COLUMNS:
+        if key in document:
+            document[key] = from_millis(document[key])
+    if "payment_details" in document:
+        document["payment_details"] = json.loads(document["payment_details"])
+    return document
+
+class SQLiteDatabase:
+    """
+    MongoDB ବିନା ଚାଲୁଥିବା embedded storage (database.Database ର interface)
+
+    One SQLite file in WAL mode: a commit is an append to the write-ahead
+    log, and after a crash SQLite replays only the log since the last
+    checkpoint. Every query runs on a single dedicated thread, so the
+    event loop never blocks on disk and the connection is never shared.
+    History pages are a seek on the covering user_history index.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.SQLITE_PATH
+        self.conn = None
+        self.executor = None
+        # Write-behind queue ନାହିଁ (ପ୍ରତି write ସିଧା commit)
+        self.writes = None
+
+    def _run(self, func, *args):
+        """Database thread ରେ ଚଲାନ୍ତୁ"""
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _execute(self, sql, params=()):
+        """ଗୋଟିଏ statement; ବଦଳିଥିବା rows ସଂଖ୍ୟା ଫେରାନ୍ତୁ"""
+        return await self._run(lambda: self.conn.execute(sql, params).rowcount)
+
+    async def _fetchone(self, sql, params=()):
+        return _document(await self._run(lambda: self.conn.execute(sql, params).fetchone()))
+
+    async def _fetchall(self, sql, params=()):
+        rows = await self._run(lambda: self.conn.execute(sql, params).fetchall())
+        return [_document(row) for row in rows]
+
+    def _open(self):
+        # isolation_level=None: ପ୍ରତି statement ନିଜେ commit
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: process crash ରେ କିଛି ହଜେ ନାହିଁ, commit ରେ fsync ନାହିଁ
+        conn.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(SCHEMA)
+        return conn
+
+    async def connect(self):
+        """Database file ଖୋଲନ୍ତୁ (ଦରକାର ହେଲେ WAL replay)"""
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.conn = await self._run(self._open)
+        print(f"✅ SQLite database opened: {self.path}")
+
+    async def ensure_indexes(self):
+        """Indexes ତିଆରି କରନ୍ତୁ (ପୂର୍ବରୁ ଥିଲେ କିଛି ହୁଏ ନାହିଁ)"""
+        await self._run(self.conn.executescript, INDEXES)
+        print("✅ SQLite indexes ready!")
+
+    async def migrate_amounts(self):
+        """ଏହି schema ଆରମ୍ଭରୁ paise ରେ, କିଛି କରିବାକୁ ନାହିଁ"""
+
+    async def close(self):
+        """Checkpoint କରି database ବନ୍ଦ କରନ୍ତୁ"""
+        if self.conn is None:
+            return
+
+        def close():
+            # WAL କୁ main file ରେ ମିଶାନ୍ତୁ, ପରବର୍ତ୍ତୀ start ରେ replay ନାହିଁ
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.conn.close()
+
+        await self._run(close)
+        self.conn = None
+        self.executor.shutdown()
+        print("✅ SQLite database closed!")
+
+    async def create_payment(self, user_id, order_id, amount_paise, idempotency_key=None, update_id=None):
+        """ନୂଆ ପେମେଣ୍ଟ ତିଆରି କରନ୍ତୁ (amount ପଇସାରେ); document ଫେରାନ୍ତୁ"""
+        now = datetime.utcnow()
+        # Mongo ଭଳି millisecond precision
+        now -= timedelta(microseconds=now.microsecond % 1000)
+        payment = {
+            "user_id": user_id,
+            "order_id": order_id,
+            "amount_paise": int(amount_paise),
+            "status": "PENDING",
+            "created_at": now,
+            "updated_at": now,
+            "next_check_at": now + timedelta(seconds=config.RECONCILE_INTERVAL),
+            "reconcile_attempts": 0
+        }
+        if idempotency_key:
+            payment["idempotency_key"] = idempotency_key
+        if update_id is not None:
+            payment["update_id"] = update_id
+
+        def insert(document):
+            row = {
+                key: to_millis(value) if key in DATETIME_COLUMNS else value
+                for key, value in document.items()
+            }
+            return self.conn.execute(
+                f"INSERT INTO payments ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values())
+            ).lastrowid
+
+        while True:
+            try:
+                payment["_id"] = await self._run(insert, payment)
+                return payment
+            except sqlite3.IntegrityError as e:
+                keys = [key for key in ("idempotency_key", "update_id")
+                        if key in payment and f"payments.{key}" in str(e)]
+                if not keys:
+                    raise
+                # Razorpay order ପୂର୍ବରୁ ଅଛି - key ବିନା ରଖନ୍ତୁ, ଯେପରି reconcile ହୁଏ
+                logging.error(f"Payment {order_id} clashes with another order on {', '.join(keys)}, "
+                              f"storing it without them: {e}")
+                for key in keys:
+                    del payment[key]
+
+    async def find_idempotent_payment(self, idempotency_key, update_id=None):
+        """ଏହି key ର PENDING payment, ବା ଏହି update ର payment (ନଥିଲେ None)"""
+        return await self._fetchone(
+            "SELECT * FROM payments WHERE (idempotency_key = ? AND status = 'PENDING') "
+            "OR update_id = ? LIMIT 1",
+            (idempotency_key, update_id)
+        )
+
+    async def claim_order_key(self, idempotency_key, ttl):
+        """Order ତିଆରି କରିବା ଅଧିକାର ନିଅନ୍ତୁ; ଅନ୍ୟ ନେଇଥିଲେ False"""
+        now = datetime.utcnow()
+
+        def claim():
+            self.conn.execute(
+                "DELETE FROM order_keys WHERE key = ? AND expires_at < ?",
+                (idempotency_key, to_millis(now))
+            )
+            return self.conn.execute(
+                "INSERT OR IGNORE INTO order_keys (key, expires_at) VALUES (?, ?)",
+                (idempotency_key, to_millis(now + timedelta(seconds=ttl)))
+            ).rowcount == 1
+
+        return await self._run(claim)
+
+    async def release_order_key(self, idempotency_key):
+        """Order ତିଆରି ବିଫଳ ହେଲେ, ବା payment ଲେଖା ହେବା ପରେ key ଛାଡ଼ନ୍ତୁ"""
+        await self._execute("DELETE FROM order_keys WHERE key = ?", (idempotency_key,))
+
+    async def wait_written(self, order_id):
+        """SQLite writes ସିଧା ଲେଖାଯାଏ, ଅପେକ୍ଷା ନାହିଁ"""
+
+    async def get_payment(self, order_id):
+        """order_id ଦ୍ୱାରା ପେମେଣ୍ଟ ଖୋଜନ୍ତୁ"""
+        return await self._fetchone("SELECT * FROM payments WHERE order_id = ?", (order_id,))
+
+    async def update_payment_status(self, order_id, status, payment_details=None, expected_status=None):
+        """ପେମେଣ୍ଟ ସ୍ଥିତି ଅପଡେଟ୍ କରନ୍ତୁ"""
+        sql = "UPDATE payments SET status = ?, updated_at = ?"
+        params = [status, to_millis(datetime.utcnow())]
+        if payment_details:
+            sql += ", payment_details = ?"
+            params.append(json.dumps(payment_details, default=str))
+
+        sql += " WHERE order_id = ?"
+        params.append(order_id)
+        # expected_status ଦେଲେ କେବଳ ସେହି ସ୍ଥିତି(ଗୁଡ଼ିକ)ରୁ ବଦଳାନ୍ତୁ (duplicate webhook ପାଇଁ)
+        if isinstance(expected_status, (list, tuple)):
+            sql += f" AND status IN ({', '.join('?' * len(expected_status))})"
+            params.extend(expected_status)
+        elif expected_status:
+            sql += " AND status = ?"
+            params.append(expected_status)
+
+        return await self._execute(sql, params) > 0
+
+    async def set_qr_file_id(self, order_id, file_id):
+        """QR photo ର Telegram file_id ସେଭ୍ କରନ୍ତୁ"""
+        await self._execute(
+            "UPDATE payments SET qr_file_id = ? WHERE order_id = ?", (file_id, order_id)
+        )
+
+    async def get_payment_status(self, order_id):
+        """କେବଳ status ଆଣନ୍ତୁ (order_id index)"""
+        payment = await self._fetchone("SELECT status FROM payments WHERE order_id = ?", (order_id,))
+        return payment["status"] if payment else None
+
+    async def is_payment_completed(self, order_id):
+        """ପେମେଣ୍ଟ ସଫଳ ହୋଇଛି କି ନାହିଁ ଯାଞ୍ଚ କରନ୍ତୁ"""
+        return await self.get_payment_status(order_id) == "SUCCESS"
+
+    async def get_due_payments(self, now, limit):
+        """Sweeper ପାଇଁ ଯାଞ୍ଚ ସମୟ ହୋଇଥିବା PENDING payments"""
+        return await self._fetchall(
+            "SELECT order_id, user_id, amount_paise, created_at, reconcile_attempts FROM payments "
+            "WHERE status = 'PENDING' AND (next_check_at IS NULL OR next_check_at <= ?) LIMIT ?",
+            (to_millis(now), limit)
+        )
+
+    async def reschedule_payments(self, schedule):
+        """(order_id, next_check_at, attempts) ତାଲିକା ଗୋଟିଏ transaction ରେ ଲେଖନ୍ତୁ"""
+        if not schedule:
+            return
+
+        def reschedule():
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE payments SET next_check_at = ?, reconcile_attempts = ? "
+                    "WHERE order_id = ? AND status = 'PENDING'",
+                    [(to_millis(at), attempts, order_id) for order_id, at, attempts in schedule]
+                )
+
+        await self._run(reschedule)
+
+    async def expire_payments(self, order_ids):
+        """ବହୁତ ପୁରୁଣା PENDING payments କୁ EXPIRED କରନ୍ତୁ"""
+        if not order_ids:
+            return 0
+        now = to_millis(datetime.utcnow())
+
+        def expire():
+            with self.conn:
+                return self.conn.executemany(
+                    "UPDATE payments SET status = 'EXPIRED', updated_at = ? "
+                    "WHERE order_id = ? AND status = 'PENDING'",
+                    [(now, order_id) for order_id in order_ids]
+                ).rowcount
+
+        return await self._run(expire)
+
+    async def get_user_payments(self, user_id, limit=10, before=None):
+        """ବ୍ୟବହାରକାରୀଙ୍କ ପେମେଣ୍ଟ ଦେଖନ୍ତୁ (ନୂଆରୁ ପୁରୁଣା)
+
+        `before` is a (created_at, _id) keyset cursor; each page is one
+        seek on the user_history index, O(log n) at any depth.
+        """
+        sql = f"SELECT {HISTORY_COLUMNS} FROM payments WHERE user_id = ?"
+        params = [user_id]
+        if before:
+            created_at, last_id = before
+            sql += " AND (created_at, id) < (?, ?)"
+            params += [to_millis(created_at), last_id]
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return await self._fetchall(sql, params)
+
+    async def stream_payments(self, query, projection, batch_size):
+        """
+        Export ପାଇଁ id କ୍ରମରେ payments, batch_size ଲେଖାଏଁ (async generator)
+
+        Reads the _id range built by export.export_query(): ObjectId
+        bounds (--since/--until) become created_at bounds and an integer
+        $gt (the resume point) an id bound. All export columns are read,
+        whatever the projection.
+        """
+        where, params = [], []
+        for op, sign in (("$gte", ">="), ("$gt", ">"), ("$lt", "<")):
+            value = query.get("_id", {}).get(op)
+            if value is None:
+                continue
+            if hasattr(value, "generation_time"):
+                where.append(f"created_at {sign} ?")
+                params.append(to_millis(value.generation_time.replace(tzinfo=None)))
+            else:
+                where.append(f"id {sign} ?")
+                params.append(int(value))
+        sql = f"SELECT {EXPORT_COLUMNS} FROM payments WHERE id > ?"
+        sql += "".join(f" AND {clause}" for clause in where)
+        sql += " ORDER BY id LIMIT ?"
+
+        last_id = -1
+        while True:
+            rows = await self._fetchall(sql, [last_id, *params, batch_size])
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]["_id"]
+
+    async def get_rollups(self, bucket_ids):
+        """
+        /stats rollups, payments ରୁ ସିଧା ଗଣନା
+
+        There is no rollup table: the requested hour/day buckets are two
+        GROUP BYs per period over the created_at and (status, updated_at)
+        indexes, limited to the requested range. Same fields as the Mongo
+        rollup documents.
+        """
+        if not bucket_ids:
+            return {}
+        ranges = [bucket_range(key) for key in bucket_ids]
+        since = to_millis(min(start for start, _ in ranges))
+        until = to_millis(max(end for _, end in ranges))
+        offset = int(OFFSET.total_seconds())
+
+        def bucket(period, column):
+            return f"'{period}:' || strftime('{PERIODS[period]}', {column} / 1000 + {offset}, 'unixepoch')"
+
+        def query():
+            rows = []
+            for period in PERIODS:
+                for row in self.conn.execute(
+                    f"SELECT {bucket(period, 'created_at')} AS bucket, count(*), sum(amount_paise), "
+                    "sum(status = 'PENDING'), sum(CASE WHEN status = 'PENDING' THEN amount_paise ELSE 0 END) "
+                    "FROM payments WHERE created_at >= ? AND created_at < ? GROUP BY bucket",
+                    (since, until)
+                ):
+                    rows.append((row[0], dict(zip(
+                        ("created", "created_paise", "pending", "pending_paise"), row[1:]
+                    ))))
+                for row in self.conn.execute(
+                    f"SELECT {bucket(period, 'updated_at')} AS bucket, count(*), sum(amount_paise) "
+                    "FROM payments WHERE status = 'SUCCESS' AND updated_at >= ? AND updated_at < ? "
+                    "GROUP BY bucket",
+                    (since, until)
+                ):
+                    rows.append((row[0], {"success": row[1], "success_paise": row[2]}))
+            return rows
+
+        wanted = set(bucket_ids)
+        rollups = {}
+        for key, fields in await self._run(query):
+            if key in wanted:
+                rollups.setdefault(key, {"_id": key}).update(fields)
+        return rollups
+
+    async def backfill_rollups(self):
+        """Rollups ସବୁବେଳେ payments ରୁ ଗଣନା ହୁଏ, backfill କରିବାକୁ କିଛି ନାହିଁ"""
+        return 0
+
+    async def acquire_lease(self, name, holder, ttl):
+        """Lease ନିଅନ୍ତୁ ବା ନବୀକରଣ କରନ୍ତୁ; ମିଳିଲେ True"""
+        now = datetime.utcnow()
+        return await self._execute(
+            "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+            "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+            (name, holder, to_millis(now + timedelta(seconds=ttl)), to_millis(now))
+        ) > 0
+
+    async def release_lease(self, name, holder):
+        """ନିଜ lease ଛାଡ଼ନ୍ତୁ"""
+        await self._execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
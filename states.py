@@ -0,0 +1,5 @@
+from aiogram.dispatcher.filters.state import State, StatesGroup
+
+class PaymentStates(StatesGroup):
+    """Payment conversation ସ୍ଥିତି"""
+    awaiting_amount = State()
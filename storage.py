@@ -0,0 +1,181 @@
+import copy
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from aiogram.dispatcher.storage import BaseStorage
+import config
+
+class StateStore(BaseStorage):
+    """
+    FSM state store interface
+
+    Backends only implement _load/_save/_delete for one record
+    ({"state", "data", "bucket"}) per chat/user key; all aiogram FSM
+    methods are built on top of those.
+    """
+    
+    async def _load(self, key):
+        raise NotImplementedError
+    
+    async def _save(self, key, record):
+        raise NotImplementedError
+    
+    async def _delete(self, key):
+        raise NotImplementedError
+    
+    async def _get(self, chat, user):
+        chat, user = self.check_address(chat=chat, user=user)
+        key = f"{chat}:{user}"
+        record = await self._load(key)
+        if record is None:
+            record = {"state": None, "data": {}, "bucket": {}}
+        return key, record
+    
+    async def _put(self, key, record):
+        # ଖାଲି record ରଖନ୍ତୁ ନାହିଁ
+        if record["state"] is None and not record["data"] and not record["bucket"]:
+            await self._delete(key)
+        else:
+            await self._save(key, record)
+    
+    async def get_state(self, *, chat=None, user=None, default=None):
+        _, record = await self._get(chat, user)
+        if record["state"] is None:
+            return self.resolve_state(default)
+        return record["state"]
+    
+    async def get_data(self, *, chat=None, user=None, default=None):
+        _, record = await self._get(chat, user)
+        return copy.deepcopy(record["data"])
+    
+    async def set_state(self, *, chat=None, user=None, state=None):
+        key, record = await self._get(chat, user)
+        record["state"] = self.resolve_state(state)
+        await self._put(key, record)
+    
+    async def set_data(self, *, chat=None, user=None, data=None):
+        key, record = await self._get(chat, user)
+        record["data"] = copy.deepcopy(data or {})
+        await self._put(key, record)
+    
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        key, record = await self._get(chat, user)
+        record["data"].update(data or {}, **kwargs)
+        await self._put(key, record)
+    
+    async def reset_state(self, *, chat=None, user=None, with_data=True):
+        key, record = await self._get(chat, user)
+        record["state"] = None
+        if with_data:
+            record["data"] = {}
+        await self._put(key, record)
+    
+    def has_bucket(self):
+        return True
+    
+    async def get_bucket(self, *, chat=None, user=None, default=None):
+        _, record = await self._get(chat, user)
+        return copy.deepcopy(record["bucket"])
+    
+    async def set_bucket(self, *, chat=None, user=None, bucket=None):
+        key, record = await self._get(chat, user)
+        record["bucket"] = copy.deepcopy(bucket or {})
+        await self._put(key, record)
+    
+    async def update_bucket(self, *, chat=None, user=None, bucket=None, **kwargs):
+        key, record = await self._get(chat, user)
+        record["bucket"].update(bucket or {}, **kwargs)
+        await self._put(key, record)
+
+class MemoryStateStore(StateStore):
+    def __init__(self, ttl, max_size):
+        """In-memory store: TTL expiry ଏବଂ LRU size cap"""
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (expires_at, record); oldest write first. TTL is the
+        # same for every record, so this is also expiry order.
+        self.records = OrderedDict()
+    
+    def _evict(self, now):
+        """Expired ଏବଂ cap ବାହାରେ ଥିବା records ହଟାନ୍ତୁ"""
+        records = self.records
+        while records:
+            expires_at, _ = records[next(iter(records))]
+            if expires_at > now and len(records) <= self.max_size:
+                break
+            records.popitem(last=False)
+    
+    async def _load(self, key):
+        item = self.records.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del self.records[key]
+            return None
+        return item[1]
+    
+    async def _save(self, key, record):
+        now = time.monotonic()
+        self.records[key] = (now + self.ttl, record)
+        self.records.move_to_end(key)
+        self._evict(now)
+    
+    async def _delete(self, key):
+        self.records.pop(key, None)
+    
+    async def close(self):
+        self.records.clear()
+    
+    async def wait_closed(self):
+        pass
+
+class MongoStateStore(StateStore):
+    def __init__(self, database, ttl):
+        """MongoDB store: fsm_states collection, expires_at TTL index"""
+        self.database = database
+        self.ttl = ttl
+    
+    @property
+    def collection(self):
+        return self.database.db.fsm_states
+    
+    async def _load(self, key):
+        # TTL monitor ପ୍ରତି 60s ରେ ଚାଲେ, ତେଣୁ expiry ନିଜେ ଯାଞ୍ଚ କରନ୍ତୁ
+        doc = await self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"state": 1, "data": 1, "bucket": 1}
+        )
+        if doc is None:
+            return None
+        return {
+            "state": doc.get("state"),
+            "data": doc.get("data") or {},
+            "bucket": doc.get("bucket") or {}
+        }
+    
+    async def _save(self, key, record):
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                **record,
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)
+            }},
+            upsert=True
+        )
+    
+    async def _delete(self, key):
+        await self.collection.delete_one({"_id": key})
+    
+    async def close(self):
+        # Mongo client ଟି Database.close() ରେ ବନ୍ଦ ହୁଏ
+        pass
+    
+    async def wait_closed(self):
+        pass
+
+def create_storage():
+    """config.FSM_STORAGE ଅନୁସାରେ storage ତିଆରି କରନ୍ତୁ"""
+    if config.FSM_STORAGE == "mongo":
+        from database import db
+        return MongoStateStore(db, config.FSM_STATE_TTL)
+    return MemoryStateStore(config.FSM_STATE_TTL, config.FSM_MAX_STATES)
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+
+# Update fields that carry the sending user
+USER_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query",
+    "chosen_inline_result", "shipping_query", "pre_checkout_query",
+    "my_chat_member", "chat_member", "chat_join_request",
+)
+
+def update_user_id(update):
+    """Update ପଠାଇଥିବା ୟୁଜରଙ୍କ id (ନ ଥିଲେ None)"""
+    for field in USER_FIELDS:
+        event = getattr(update, field, None)
+        if event is not None and getattr(event, "from_user", None):
+            return event.from_user.id
+    return None
+
+class UpdateQueue:
+    """
+    Webhook updates ପାଇଁ bounded queue
+
+    The webhook handler ACKs at once and put()s the update here; `workers`
+    tasks drain it through dispatcher.process_update. Each user has a
+    lane of their own updates, and a lane is on the shared ready queue
+    (or with a worker) at most once, so a user's updates run one at a time
+    and in order while any free worker takes the next user: one slow user
+    holds up only themselves. Update ids already accepted are dropped
+    (Telegram retries), and once max_size updates are waiting
+    on_full(update) is called instead of queueing, e.g. to send a "busy,
+    try again" reply.
+    """
+
+    def __init__(self, dispatcher, ready, workers, max_size, dedupe_size, on_full=None):
+        self.dispatcher = dispatcher
+        # Workers wait for this before processing anything
+        self.ready = ready
+        self.workers = workers
+        self.max_size = max_size
+        self.lanes = {}  # user key -> deque of updates (ଚାଲୁଥିବା lane ସହ)
+        self.runnable = asyncio.Queue()  # ଯେଉଁ lanes ର ପରବର୍ତ୍ତୀ update ଚାଲିପାରେ
+        self.size = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.dedupe_size = dedupe_size
+        self.seen = OrderedDict()
+        self.on_full = on_full
+        self.tasks = []
+        self.background = set()
+        self.duplicates = 0
+        self.shed = 0
+
+    def __len__(self):
+        return self.size
+
+    def start(self):
+        """Worker tasks ଆରମ୍ଭ କରନ୍ତୁ"""
+        if not self.tasks:
+            self.tasks = [
+                asyncio.create_task(self._run()) for _ in range(self.workers)
+            ]
+
+    def put(self, update):
+        """Update queue କରନ୍ତୁ; queue ହେଲେ True"""
+        if update.update_id in self.seen:
+            self.duplicates += 1
+            return False
+
+        if self.size >= self.max_size:
+            self.shed += 1
+            if self.on_full:
+                # Reply off the request path so the ACK is not held up
+                task = asyncio.create_task(self._notify_full(update))
+                self.background.add(task)
+                task.add_done_callback(self.background.discard)
+            return False
+
+        user_id = update_user_id(update)
+        key = user_id if user_id is not None else update.update_id
+        lane = self.lanes.get(key)
+        if lane is None:
+            self.lanes[key] = deque([update])
+            self.runnable.put_nowait(key)
+        else:
+            # Lane ପୂର୍ବରୁ queue ରେ ବା ଚାଲୁଛି - ପଛରେ ଅପେକ୍ଷା
+            lane.append(update)
+        self.size += 1
+        self.idle.clear()
+
+        self.seen[update.update_id] = None
+        if len(self.seen) > self.dedupe_size:
+            self.seen.popitem(last=False)
+        return True
+
+    async def _notify_full(self, update):
+        try:
+            await self.on_full(update)
+        except Exception as e:
+            logging.error(f"Busy reply for update {update.update_id} failed: {e}")
+
+    async def _run(self):
+        await self.ready.wait()
+        while True:
+            key = await self.runnable.get()
+            lane = self.lanes[key]
+            update = lane.popleft()
+            try:
+                await self.dispatcher.process_update(update)
+            except Exception as e:
+                logging.error(f"Update {update.update_id} failed: {e}")
+            finally:
+                self.size -= 1
+                if lane:
+                    # ଅନ୍ୟ users ପଛରେ, ଯେପରି ଜଣେ ବ୍ୟସ୍ତ user workers ନ ଧରେ
+                    self.runnable.put_nowait(key)
+                else:
+                    del self.lanes[key]
+                if not self.size:
+                    self.idle.set()
+
+    async def close(self, timeout=10):
+        """Queue ରେ ଥିବା updates ଶେଷ କରି workers ବନ୍ଦ କରନ୍ତୁ"""
+        if self.tasks and self.ready.is_set():
+            try:
+                await asyncio.wait_for(self.idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"Dropped {len(self)} queued updates on shutdown")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []